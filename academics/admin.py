@@ -1,4 +1,5 @@
 from django.contrib import admin
+from dashboard.search import SUBJECT, IndexedSearchMixin
 from .models import Session, Class, Subject
 
 @admin.register(Session)
@@ -25,7 +26,8 @@ class ClassAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(Subject)
-class SubjectAdmin(admin.ModelAdmin):
+class SubjectAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    search_type = SUBJECT
     list_display = ('name', 'code', 'group', 'category', 'created_at')
     search_fields = ('name', 'code')
     list_filter = ('group', 'category')
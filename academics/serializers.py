@@ -1,15 +1,23 @@
 from rest_framework import serializers
 from .models import Subject, Class, Session
+from college_project.sparse import SparseFieldsMixin
 
-class SessionSerializer(serializers.ModelSerializer):
+class SessionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Session
         fields = ['id', 'name', 'created_at']
 
-class SubjectSerializer(serializers.ModelSerializer):
+class ClassSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Class
+        fields = ['id', 'name', 'code']
+
+class SubjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Subject
         fields = ['id', 'name', 'code', 'class_name', 'group', 'category', 'created_at']
+        # ?expand=class_name nests the class (see college_project.sparse)
+        expandable = {'class_name': (ClassSerializer, ('class_name', 'class_name__name', 'class_name__code'))}
 
 class BulkSubjectImportSerializer(serializers.Serializer):
     subjects = serializers.ListField(
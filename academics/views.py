@@ -3,24 +3,29 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Session, Class, Subject
-from .serializers import SessionSerializer, SubjectSerializer, BulkSubjectImportSerializer
+from .serializers import SessionSerializer, ClassSerializer, SubjectSerializer, BulkSubjectImportSerializer
+from college_project.conditional import conditional_get
+from college_project.sparse import sparse_queryset
 
 class SessionListView(APIView):
+    @conditional_get([Session])
     def get(self, request):
-        sessions = Session.objects.all()
-        serializer = SessionSerializer(sessions, many=True)
+        sessions = sparse_queryset(Session.objects.all(), SessionSerializer, request)
+        serializer = SessionSerializer(sessions, many=True, context={'request': request})
         return Response(serializer.data)
 
 class ClassListView(APIView):
+    @conditional_get([Class])
     def get(self, request):
-        classes = Class.objects.all()
-        data = [{'id': c.id, 'name': c.name, 'code': c.code} for c in classes]
-        return Response(data)
+        classes = sparse_queryset(Class.objects.all(), ClassSerializer, request)
+        serializer = ClassSerializer(classes, many=True, context={'request': request})
+        return Response(serializer.data)
 
 class SubjectListView(APIView):
+    @conditional_get([Subject, Class])
     def get(self, request):
-        subjects = Subject.objects.all()
-        serializer = SubjectSerializer(subjects, many=True)
+        subjects = sparse_queryset(Subject.objects.all(), SubjectSerializer, request)
+        serializer = SubjectSerializer(subjects, many=True, context={'request': request})
         return Response(serializer.data)
 
 class BulkSubjectImportView(APIView):
@@ -0,0 +1,13 @@
+"""Helpers shared by the management commands of the apps"""
+from django.core.management.base import CommandError
+
+
+def lookup(model, value):
+    """Find a row of a named model (Session, ExamType, Class...) by id or by name"""
+    lookup = {'pk': value} if value.isdigit() else {'name': value}
+    try:
+        return model.objects.get(**lookup)
+    except model.DoesNotExist:
+        raise CommandError(f"{model._meta.verbose_name} '{value}' does not exist")
+    except model.MultipleObjectsReturned:
+        raise CommandError(f"More than one {model._meta.verbose_name} is named '{value}'")
@@ -94,6 +94,14 @@ DATABASES = {
     }
 }
 
+# Per-process cache: enough for a single runserver process. Deployments
+# with several processes need a shared one (see settings_production).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -145,4 +153,11 @@ LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'accounts:dashboard'
 LOGOUT_REDIRECT_URL = 'accounts:login'
 
+# Background mark sheet imports: worker processes per web process
+# (0 leaves uploads queued for `manage.py process_mark_imports`)
+MARK_IMPORT_WORKERS = 2
+
+# Columnar files of archived sessions (`manage.py archive_session`)
+MARK_ARCHIVE_ROOT = os.path.join(BASE_DIR, 'archive')
+
 
@@ -118,6 +118,29 @@ if not all([
 ]):
     raise ValueError("Database environment variables are not fully configured!")
 
+# ============================================================================
+# CACHE - shared by every process
+# ============================================================================
+
+# The grading scales, enrollment bitmaps and search index are kept per
+# process and versioned through this cache (college_project.versioned), so
+# all web workers and import processes must share it. Redis when REDIS_URL
+# is set, else a table of the database (`python manage.py createcachetable`).
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
 # ============================================================================
 # PASSWORD VALIDATION
 # ============================================================================
@@ -223,6 +246,14 @@ LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'accounts:dashboard'
 LOGOUT_REDIRECT_URL = 'accounts:login'
 
+# Background mark sheet imports: worker processes per web process. Each
+# gunicorn worker would start its own pool, so by default uploads stay
+# queued for `manage.py process_mark_imports --watch` (or a cron job).
+MARK_IMPORT_WORKERS = int(os.getenv('MARK_IMPORT_WORKERS', '0'))
+
+# Columnar files of archived sessions (`manage.py archive_session`)
+MARK_ARCHIVE_ROOT = os.getenv('MARK_ARCHIVE_ROOT', os.path.join(BASE_DIR, 'archive'))
+
 # ============================================================================
 # EMAIL CONFIGURATION (Optional)
 # ============================================================================
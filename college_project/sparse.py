@@ -0,0 +1,92 @@
+"""
+Sparse fieldsets and relation expansion for the read endpoints.
+
+?fields=a,b keeps only the named fields of each object, and ?expand=x,y
+renders the named relation fields as nested objects instead of ids.
+Names a serializer does not have are ignored. Both apply to the objects
+of a response, not to the objects nested in them.
+
+A serializer opts in with SparseFieldsMixin and describes in its Meta:
+
+- reads: field -> ORM paths it reads ('student__name' joins the
+  student); a field not listed reads the model field of its name
+- prefetch: field -> relations it prefetches
+- expandable: field -> (serializer nesting it, ORM paths it then reads)
+
+sparse_queryset() narrows a view's queryset to what the kept fields
+read: only() their columns, select_related() their joins and
+prefetch_related() their relations, dropping the others.
+"""
+from rest_framework.serializers import ListSerializer
+
+
+def query_list(request, param):
+    """Names of a comma-separated query parameter, None when it is absent"""
+    if request is None:
+        return None
+    value = request.query_params.get(param, None)
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def requested_fields(request):
+    """Field names of ?fields=, None when every field is wanted"""
+    return query_list(request, 'fields')
+
+
+def requested_expansions(request):
+    """Field names of ?expand="""
+    return set(query_list(request, 'expand') or ())
+
+
+class SparseFieldsMixin:
+    """Applies ?fields= and ?expand= of the request in the serializer context"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = getattr(self, 'parent', None)
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        request = self.context.get('request')
+        if parent is not None or request is None:
+            return fields
+
+        expandable = getattr(self.Meta, 'expandable', {})
+        for name in requested_expansions(request):
+            if name in expandable and name in fields:
+                serializer_class, _ = expandable[name]
+                fields[name] = serializer_class(read_only=True)
+        wanted = requested_fields(request)
+        if wanted is not None:
+            fields = {name: field for name, field in fields.items() if name in wanted}
+        return fields
+
+
+def sparse_queryset(queryset, serializer_class, request, keep=()):
+    """
+    queryset reading only what serializer_class renders for the request.
+    keep names columns read whatever the fields, such as those a cursor
+    is taken from. Without ?fields= only the joins of ?expand= are added.
+    """
+    meta = serializer_class.Meta
+    expandable = getattr(meta, 'expandable', {})
+    expand = requested_expansions(request) & set(expandable)
+    wanted = requested_fields(request)
+    if wanted is None:
+        joins = {path.rsplit('__', 1)[0] for name in expand for path in expandable[name][1] if '__' in path}
+        return queryset.select_related(*joins) if joins else queryset
+
+    reads = getattr(meta, 'reads', {})
+    prefetch = getattr(meta, 'prefetch', {})
+    paths = dict.fromkeys(keep)
+    lookups = {}
+    for name in meta.fields:
+        if name not in wanted:
+            continue
+        paths.update(dict.fromkeys(expandable[name][1] if name in expand else reads.get(name, (name,))))
+        lookups.update(dict.fromkeys(prefetch.get(name, ())))
+    queryset = queryset.select_related(None).prefetch_related(None).prefetch_related(*lookups).only(*paths)
+    joins = {path.rsplit('__', 1)[0] for path in paths if '__' in path}
+    # select_related() without names would follow every foreign key
+    return queryset.select_related(*joins) if joins else queryset
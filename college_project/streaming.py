@@ -0,0 +1,108 @@
+"""
+CSV / NDJSON exports shared by the API apps.
+
+`?format=csv` and `?format=ndjson` are DRF format overrides, so views that
+offer exports list EXPORT_RENDERERS in their renderer_classes. Views
+that can stream return streaming_response() for those formats: rows are
+produced by a generator and written as they are read, so memory stays
+flat however large the result is. Other responses fall back to the
+renderers below, which encode an ordinary (already built) payload.
+"""
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# Rows fetched per database round trip while streaming
+CHUNK_SIZE = 2000
+
+LIST_SEPARATOR = ' || '
+
+
+class _Echo:
+    """File-like object whose write() hands back the line csv.writer produced"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    """Flatten list values the way the rest of the API displays them"""
+    if isinstance(value, (list, tuple)):
+        return LIST_SEPARATOR.join(str(item) for item in value)
+    return value
+
+
+def _payload_rows(data):
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return data['results']
+    return [data] if data is not None else []
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return ''.join(csv_lines(_payload_rows(data))).encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return ''.join(ndjson_lines(_payload_rows(data))).encode(self.charset)
+
+
+EXPORT_RENDERERS = [CSVRenderer, NDJSONRenderer]
+
+RENDERER_CLASSES = list(api_settings.DEFAULT_RENDERER_CLASSES) + EXPORT_RENDERERS
+
+
+def csv_lines(rows, fields=None):
+    """CSV text, one line at a time; the header comes from fields or the first row"""
+    writer = csv.writer(_Echo())
+    header_written = False
+    if fields is not None:
+        yield writer.writerow(fields)
+        header_written = True
+    for row in rows:
+        if not header_written:
+            fields = list(row)
+            yield writer.writerow(fields)
+            header_written = True
+        yield writer.writerow([_csv_value(row.get(field)) for field in fields])
+
+
+def ndjson_lines(rows):
+    """One JSON document per line"""
+    for row in rows:
+        yield json.dumps(row, cls=JSONEncoder, ensure_ascii=False) + '\n'
+
+
+def export_format(request):
+    """'csv' or 'ndjson' when the client asked for a streamed export, else None"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    if isinstance(renderer, tuple(EXPORT_RENDERERS)):
+        return renderer.format
+    return None
+
+
+def streaming_response(rows, export_format, filename, fields=None):
+    """StreamingHttpResponse writing rows (an iterable of dicts) as CSV or NDJSON"""
+    if export_format == CSVRenderer.format:
+        content, renderer = csv_lines(rows, fields), CSVRenderer
+    else:
+        content, renderer = ndjson_lines(rows), NDJSONRenderer
+    response = StreamingHttpResponse(content, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{renderer.format}"'
+    return response
@@ -0,0 +1,108 @@
+"""
+Per-process copies of data derived from the database.
+
+A VersionedLocal holds something each process builds once from the
+database and then reads from memory: the grading scales, the enrollment
+bitmaps, the search index. A version number in Django's cache tells the
+other processes when one of them changed the data; they rebuild on
+their next check. The cache must therefore be shared by every process
+(see CACHES in settings_production); with the per-process LocMemCache
+the other processes never hear of a change, which `check --deploy`
+reports.
+
+The version is read once per request (on request_started) and when a
+batch calls recheck(), not on every lookup.
+"""
+import threading
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.core.signals import request_started
+
+PER_PROCESS_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+class VersionedLocal:
+    """A value built by build(), shared by the threads of a process and versioned across processes"""
+
+    instances = []
+
+    def __init__(self, version_key, build, stale=None):
+        """stale(value), if given, tells when changes have left the value better rebuilt"""
+        self.version_key = version_key
+        self.build = build
+        self.stale = stale
+        self._value = None
+        self._version = None
+        self._checked = False
+        self._lock = threading.Lock()
+        VersionedLocal.instances.append(self)
+
+    def get(self):
+        """The value, built on first use or once another process changed it"""
+        with self._lock:
+            if self._value is None or not self._checked:
+                version = cache.get(self.version_key)
+                if self._value is None or version != self._version:
+                    self._value, self._version = self.build(), version
+                self._checked = True
+            return self._value
+
+    def recheck(self):
+        """Have the next get() compare the version in the cache again"""
+        self._checked = False
+
+    def update(self, change):
+        """
+        Apply change(value) to this process's value, if built, and have
+        the other processes rebuild theirs
+        """
+        with self._lock:
+            if self._value is not None:
+                change(self._value)
+                if self.stale is not None and self.stale(self._value):
+                    self._value = None
+            version = self._bump()
+            # Another process changed the data meanwhile: rebuild
+            if self._value is not None and version != (self._version or 0) + 1:
+                self._value = None
+            self._version = version
+
+    def invalidate(self):
+        """Forget the value here and in every process sharing the cache"""
+        with self._lock:
+            self._value = None
+            self._bump()
+
+    def _bump(self):
+        try:
+            return cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, 1, timeout=None)
+            return 1
+
+
+def recheck_all(**kwargs):
+    for local in VersionedLocal.instances:
+        local.recheck()
+
+
+request_started.connect(recheck_all, dispatch_uid='college_project.versioned.recheck_all')
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(**kwargs):
+    """The default cache must be shared by the processes, or their copies go stale"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PER_PROCESS_BACKENDS:
+        return [checks.Warning(
+            f'{backend} is not shared between processes, so they will not reload grading scales, '
+            'enrollments or the search index changed by another one.',
+            hint='Use a shared cache such as Redis or the database cache (see settings_production).',
+            id='college_project.W001',
+        )]
+    return []
@@ -0,0 +1,238 @@
+"""
+In-memory search index over students, teachers and subjects.
+
+Every record becomes a document whose searchable fields are split into
+lowercase words. The index keeps the sorted list of distinct words and,
+for each word, the documents containing it with the weight of the field
+it came from. A query word matches the words it is a prefix of, found
+by bisecting the sorted list, so "phy" finds "Physics" and a partly
+typed roll number finds the student; no leading-wildcard scan is made.
+Every query word must match; a document scores, for each query word,
+the weight of its best field, doubled for a whole-word match.
+
+The index is built once per process, kept current by the handlers of
+dashboard.signals after their transaction commits, and rebuilt when the
+version key in the shared cache shows another process changed it (see
+college_project.versioned), or once removed documents outnumber the live
+ones. Writes that send no signals must call invalidate().
+"""
+import heapq
+import re
+from bisect import bisect_left, insort
+
+from academics.models import Subject
+from college_project.versioned import VersionedLocal
+from students.models import Student
+from teachers.models import Teacher
+
+
+VERSION_CACHE_KEY = 'dashboard:search_index_version'
+
+STUDENT = 'student'
+TEACHER = 'teacher'
+SUBJECT = 'subject'
+TYPES = (STUDENT, TEACHER, SUBJECT)
+
+# Field weights per document type, and the field a hit is labelled with
+FIELDS = {
+    STUDENT: {'roll_number': 4, 'name': 3, 'email': 2, 'user__username': 2},
+    TEACHER: {'name': 3, 'email': 2, 'user__username': 2, 'subject__name': 1, 'department': 1},
+    SUBJECT: {'code': 4, 'name': 3},
+}
+LABELS = {STUDENT: 'name', TEACHER: 'name', SUBJECT: 'name'}
+# Shown with each hit besides its label
+DETAILS = {STUDENT: ('roll_number',), TEACHER: ('post', 'department'), SUBJECT: ('code',)}
+
+MODELS = {STUDENT: Student, TEACHER: Teacher, SUBJECT: Subject}
+
+DEFAULT_LIMIT = 20
+TYPEAHEAD_LIMIT = 8
+MAX_LIMIT = 100
+
+_WORD = re.compile(r'\w+')
+
+
+def words(text):
+    """Lowercase words of a text"""
+    return _WORD.findall(text.lower()) if text else []
+
+
+def tie_order(doc_type, pk, label):
+    """Order of equally scored hits: shortest label first, then type, label and id"""
+    return len(label or ''), TYPES.index(doc_type), label or '', pk
+
+
+class SearchIndex:
+    """Documents and the sorted words pointing at them"""
+
+    # Removed documents kept before sparse() asks for a rebuild
+    MIN_DEAD = 1000
+
+    def __init__(self):
+        self.docs = []  # document id -> (type, pk, label, details), None once removed
+        self.keys = {}  # (type, pk) -> document id
+        self.words = []  # sorted distinct words
+        self.postings = {}  # word -> [(document id, weight)]
+
+    def load(self):
+        """Read every student, teacher and subject, one query per type"""
+        for doc_type, model in MODELS.items():
+            for row in model.objects.order_by().values('pk', *self.columns(doc_type)):
+                self.put(doc_type, row, sort=False)
+        self.words.sort()
+
+    @staticmethod
+    def columns(doc_type):
+        return dict.fromkeys([*FIELDS[doc_type], LABELS[doc_type], *DETAILS[doc_type]])
+
+    def put(self, doc_type, row, sort=True):
+        """Index a record (a values() dict of columns()), replacing its previous document"""
+        self.remove(doc_type, row['pk'])
+        doc = len(self.docs)
+        self.docs.append((doc_type, row['pk'], row[LABELS[doc_type]], {name: row[name] for name in DETAILS[doc_type]}))
+        self.keys[doc_type, row['pk']] = doc
+        weights = {}
+        for field, weight in FIELDS[doc_type].items():
+            for word in words(str(row[field]) if row[field] is not None else ''):
+                weights[word] = max(weights.get(word, 0), weight)
+        for word, weight in weights.items():
+            postings = self.postings.get(word)
+            if postings is None:
+                postings = self.postings[word] = {}
+                if sort:
+                    insort(self.words, word)
+                else:
+                    self.words.append(word)
+            postings.setdefault(weight, []).append(doc)
+
+    def remove(self, doc_type, pk):
+        """Forget a record; its postings are skipped until the index is rebuilt"""
+        doc = self.keys.pop((doc_type, pk), None)
+        if doc is not None:
+            self.docs[doc] = None
+
+    def sparse(self):
+        """Whether removed documents (and their postings) outnumber the live ones, and the index is better rebuilt"""
+        return len(self.docs) - len(self.keys) > max(len(self.keys), self.MIN_DEAD)
+
+    def refresh(self, doc_type, pks):
+        """Index the records of pks again from the database (removing those that are gone)"""
+        pks = set(pks)
+        rows = MODELS[doc_type].objects.filter(pk__in=pks).values('pk', *self.columns(doc_type))
+        for row in rows:
+            pks.discard(row['pk'])
+            self.put(doc_type, row)
+        for pk in pks:
+            self.remove(doc_type, pk)
+
+    def matches(self, term):
+        """{document id: score} of the documents with a word starting with term"""
+        groups = []
+        position = bisect_left(self.words, term)
+        while position < len(self.words) and self.words[position].startswith(term):
+            word = self.words[position]
+            boost = 2 if word == term else 1
+            groups.extend((weight * boost, docs) for weight, docs in self.postings[word].items())
+            position += 1
+        # Lowest scores first, so that a document keeps its best one
+        groups.sort(key=lambda group: group[0])
+        found = {}
+        for score, docs in groups:
+            found.update(dict.fromkeys(docs, score))
+        return found
+
+    def scores(self, query, types=TYPES):
+        """{document id: score} of the documents of types matching every word of query"""
+        scores = {}
+        for number, term in enumerate(set(words(query))):
+            found = self.matches(term)
+            if number == 0:
+                scores = found
+            else:
+                if len(found) < len(scores):
+                    scores, found = found, scores
+                scores = {doc: score + found[doc] for doc, score in scores.items() if doc in found}
+            if not scores:
+                return {}
+        docs = self.docs
+        return {doc: score for doc, score in scores.items() if docs[doc] is not None and docs[doc][0] in types}
+
+    def rank(self, scores, limit):
+        """[(score, document)] of the limit best scores, ties in tie_order()"""
+        buckets = {}
+        for doc, score in scores.items():
+            buckets.setdefault(score, []).append(self.docs[doc])
+        best = []
+        for score in sorted(buckets, reverse=True):
+            tied = heapq.nsmallest(limit - len(best), buckets[score], key=lambda document: tie_order(*document[:3]))
+            best.extend((score, document) for document in tied)
+            if len(best) >= limit:
+                break
+        return best
+
+
+def _build():
+    index = SearchIndex()
+    index.load()
+    return index
+
+
+_index = VersionedLocal(VERSION_CACHE_KEY, _build, stale=SearchIndex.sparse)
+
+
+def get_index():
+    """The search index of this process, built on first use or after another process changed it"""
+    return _index.get()
+
+
+def update(change):
+    """
+    Apply change(index) here, if the index is built, and have the other
+    processes rebuild theirs; an index left sparse is rebuilt on next use
+    """
+    _index.update(change)
+
+
+def invalidate():
+    """Forget the index here and in every process sharing the cache"""
+    _index.invalidate()
+
+
+def search(query, types=TYPES, limit=DEFAULT_LIMIT, typeahead=False):
+    """Search results for the search endpoint: the total and the best limit hits"""
+    index = get_index()
+    scores = index.scores(query, types)
+    results = []
+    for score, (doc_type, pk, label, details) in index.rank(scores, limit):
+        result = {'type': doc_type, 'id': pk, 'label': label}
+        if not typeahead:
+            result.update(details, score=score)
+        results.append(result)
+    return {'query': query, 'count': len(scores), 'results': results}
+
+
+def matching_ids(doc_type, query, limit=None):
+    """Ids of the records of one type matching query, None when more than limit match"""
+    index = get_index()
+    scores = index.scores(query, (doc_type,))
+    if limit is not None and len(scores) > limit:
+        return None
+    return [index.docs[doc][1] for doc in scores]
+
+
+class IndexedSearchMixin:
+    """
+    ModelAdmin mixin answering the changelist search from the index.
+    Searches matching more than MAX_IDS records fall back to the
+    search_fields lookups, which read better than a huge IN list.
+    """
+    search_type = None
+    MAX_IDS = 2000
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        pks = matching_ids(self.search_type, search_term, limit=self.MAX_IDS)
+        if pks is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=pks), False
@@ -0,0 +1,67 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from academics.models import Subject
+from students.models import Student
+from teachers.models import Teacher
+from . import search
+
+
+DOC_TYPES = {model: doc_type for doc_type, model in search.MODELS.items()}
+
+
+def _on_commit(change):
+    """Apply a change to the search index once the transaction commits"""
+    transaction.on_commit(partial(search.update, change))
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Subject)
+def record_saved(sender, instance, raw=False, **kwargs):
+    """Index the record again; teachers are also found by their subject's name"""
+    if raw:
+        return
+    doc_type = DOC_TYPES[sender]
+    pk = instance.pk
+
+    def change(index):
+        index.refresh(doc_type, [pk])
+        if sender is Subject:
+            index.refresh(search.TEACHER, Teacher.objects.filter(subject_id=pk).values_list('pk', flat=True))
+    _on_commit(change)
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=Subject)
+def record_deleted(sender, instance, **kwargs):
+    doc_type = DOC_TYPES[sender]
+    pk = instance.pk
+    _on_commit(lambda index: index.remove(doc_type, pk))
+
+
+@receiver(pre_delete, sender=Subject)
+def subject_deleting(sender, instance, **kwargs):
+    """The subject's teachers lose it without a signal of their own"""
+    teachers = list(instance.teachers.values_list('pk', flat=True))
+    if teachers:
+        _on_commit(lambda index: index.refresh(search.TEACHER, teachers))
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Students and teachers are also found by their username"""
+    # Logging in only saves last_login
+    if raw or (update_fields is not None and 'username' not in update_fields):
+        return
+    pk = instance.pk
+
+    def change(index):
+        index.refresh(search.STUDENT, Student.objects.filter(user_id=pk).values_list('pk', flat=True))
+        index.refresh(search.TEACHER, Teacher.objects.filter(user_id=pk).values_list('pk', flat=True))
+    _on_commit(change)
@@ -1,3 +1,90 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from academics.models import Class, Session, Subject
+from students.models import Student
+from teachers.models import Teacher
+from . import search
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Find', code='find')
+        session = Session.objects.create(name='Find 2025')
+        cls.physics = Subject.objects.create(name='Physics', code='174')
+        cls.math = Subject.objects.create(name='Higher Math', code='265')
+        cls.rahim = Student.objects.create(
+            name='Rahim Uddin', roll_number='2025101', email='rahim@college.edu', class_name=class_obj, session=session,
+        )
+        cls.rahima = Student.objects.create(
+            name='Rahima Akter Physicsfan', roll_number='2025102', class_name=class_obj, session=session,
+        )
+        cls.teacher = Teacher.objects.create(name='Karim Rahman', subject=cls.physics, department='Science')
+
+    def setUp(self):
+        search.invalidate()
+        self.addCleanup(search.invalidate)
+
+    def get(self, **params):
+        response = self.client.get('/api/v1/dashboard/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def hits(self, **params):
+        return [(hit['type'], hit['id']) for hit in self.get(**params)['results']]
+
+    def test_ranked_hits(self):
+        # Whole words before prefixes, then the field weights
+        self.assertEqual(self.hits(q='rahim'), [('student', self.rahim.pk), ('student', self.rahima.pk)])
+        self.assertEqual(self.hits(q='phys'), [
+            ('subject', self.physics.pk), ('student', self.rahima.pk), ('teacher', self.teacher.pk),
+        ])
+        self.assertEqual(self.hits(q='2025 102'), [])
+        self.assertEqual(self.hits(q='20251'), [('student', self.rahim.pk), ('student', self.rahima.pk)])
+        self.assertEqual(self.hits(q='rah', type='teacher'), [('teacher', self.teacher.pk)])
+        body = self.get(q='rah', typeahead='true', limit=1)
+        self.assertEqual(body, {'query': 'rah', 'count': 3, 'results': [
+            {'type': 'student', 'id': self.rahim.pk, 'label': 'Rahim Uddin'},
+        ]})
+        self.assertEqual(self.client.get('/api/v1/dashboard/search/', {'q': 'x', 'type': 'class'}).status_code, 400)
+
+    def test_follows_changes(self):
+        search.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.physics.name = 'Applied Physics'
+            self.physics.save()
+            self.rahim.delete()
+            self.teacher.user = get_user_model().objects.create(username='kr')
+            self.teacher.save()
+        self.assertEqual(self.hits(q='applied'), [('subject', self.physics.pk), ('teacher', self.teacher.pk)])
+        self.assertEqual(self.hits(q='rahim'), [('student', self.rahima.pk)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.user.username = 'krahman'
+            self.teacher.user.save()
+        self.assertEqual(self.hits(q='krahm'), [('teacher', self.teacher.pk)])
+
+    def test_edits_neither_reorder_ties_nor_pile_up(self):
+        index = search.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rahim.email = 'uddin@college.edu'
+            self.rahim.save()
+        # Still before the longer name it ties with
+        self.assertEqual(self.hits(q='2025'), [('student', self.rahim.pk), ('student', self.rahima.pk)])
+        with mock.patch.object(search.SearchIndex, 'MIN_DEAD', 1):
+            for _ in range(5):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.rahima.save()
+            self.assertIsNot(search.get_index(), index)
+            self.assertFalse(search.get_index().sparse())
+        self.assertEqual(self.hits(q='2025'), [('student', self.rahim.pk), ('student', self.rahima.pk)])
+
+    def test_admin_changelist(self):
+        admin = get_user_model().objects.create_superuser('find', 'find@college.edu', 'pw')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/students/student/', {'q': 'physicsf'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.rahima])
+        response = self.client.get('/admin/teachers/teacher/', {'q': 'physics'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.teacher])
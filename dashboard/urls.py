@@ -3,4 +3,5 @@ from . import views
 
 urlpatterns = [
     path('', views.DashboardView.as_view(), name='dashboard'),
+    path('search/', views.SearchView.as_view(), name='search'),
 ]
@@ -1,18 +1,25 @@
 from django.shortcuts import render
-from django.db.models import Count, Avg, Q
+from django.db.models import Count, Avg, Sum
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from students.models import Student
 from teachers.models import Teacher
-from exams.models import ExamMark, ExamType
+from exams.models import ExamSummary, ExamType
+from exams.rollups import combine_summaries
 from academics.models import Class, Session, Subject
+from college_project.conditional import conditional_get
+from . import search
 
 class DashboardView(APIView):
+    @conditional_get([Student, Teacher, ExamSummary, ExamType, Class, Session, Subject])
     def get(self, request):
         # Basic Counts
         total_students = Student.objects.count()
         total_teachers = Teacher.objects.count()
-        total_exam_marks = ExamMark.objects.count()
+        # Mark statistics come from the per-exam rollups, not the marks table
+        summaries = list(ExamSummary.objects.all())
+        mark_stats = combine_summaries(summaries)
+        total_exam_marks = mark_stats['total_records']
         total_exam_types = ExamType.objects.count()
         total_classes = Class.objects.count()
         total_sessions = Session.objects.count()
@@ -29,9 +36,9 @@ class DashboardView(APIView):
         ).filter(department__isnull=False)
 
         # Exam Marks by Type
-        marks_by_exam_type = ExamMark.objects.values('exam_type__name').annotate(
-            count=Count('id')
-        )
+        marks_by_exam_type = ExamSummary.objects.values('exam_type__name').annotate(
+            count=Sum('mark_count')
+        ).order_by('exam_type__name')
 
         # Average Class Size
         avg_class_size = Student.objects.values('class_name').annotate(
@@ -44,23 +51,19 @@ class DashboardView(APIView):
         ).values('name', 'student_count')
 
         # Grade Distribution from ExamMarks
-        grade_distribution = ExamMark.objects.values('grade').annotate(
-            count=Count('id')
-        ).order_by('grade').filter(grade__isnull=False)
+        grade_distribution = [row for row in mark_stats['grade_distribution'] if row['grade'] is not None]
+        grade_counts = {row['grade']: row['count'] for row in grade_distribution}
 
         # Overall Statistics
-        total_marks_with_grade = ExamMark.objects.filter(grade__isnull=False).count()
-        excellent_grades = ExamMark.objects.filter(grade__in=['A+', 'A']).count()
-        good_grades = ExamMark.objects.filter(grade__in=['A-', 'B']).count()
+        total_marks_with_grade = sum(grade_counts.values())
+        excellent_grades = grade_counts.get('A+', 0) + grade_counts.get('A', 0)
+        good_grades = grade_counts.get('A-', 0) + grade_counts.get('B', 0)
         pass_percentage = (excellent_grades / total_marks_with_grade * 100) if total_marks_with_grade > 0 else 0
         
-        # Average marks and attendance
-        avg_marks = ExamMark.objects.filter(total_marks__isnull=False).aggregate(
-            avg=Avg('total_marks')
-        )['avg'] or 0
-        avg_attendance = ExamMark.objects.filter(total_class__gt=0).aggregate(
-            avg=Avg((Count('present') * 100 / Count('total_class')))
-        )['avg'] or 0
+        # Average marks and attendance (mean attendance percentage of the
+        # marks with classes held), from the same rollups
+        avg_marks = mark_stats['average_marks'] or 0
+        avg_attendance = mark_stats['average_attendance'] or 0
 
         data = {
             # Basic Counts
@@ -90,6 +93,29 @@ class DashboardView(APIView):
                 'good_grades_count': good_grades,
                 'excellent_pass_percentage': round(pass_percentage, 2),
                 'average_marks': round(avg_marks, 2),
+                'average_attendance': round(avg_attendance, 2),
             }
         }
         return Response(data)
+
+
+class SearchView(APIView):
+    """
+    Ranked search of students, teachers and subjects from the in-memory
+    index of dashboard.search. ?q= is the text, ?type= a comma-separated
+    subset of student, teacher and subject, ?limit= the hits returned.
+    ?typeahead=true returns labels only, 8 by default, for suggestions
+    while typing.
+    """
+    
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        typeahead = request.query_params.get('typeahead') in ('1', 'true')
+        types = [name.strip() for name in request.query_params.get('type', '').split(',') if name.strip()]
+        if any(name not in search.TYPES for name in types):
+            return Response({'error': f"type must be one of {', '.join(search.TYPES)}"}, status=400)
+        limit = request.query_params.get('limit', None)
+        if limit is not None and (not limit.isdigit() or not 1 <= int(limit) <= search.MAX_LIMIT):
+            return Response({'error': f'limit must be between 1 and {search.MAX_LIMIT}'}, status=400)
+        limit = int(limit) if limit else (search.TYPEAHEAD_LIMIT if typeahead else search.DEFAULT_LIMIT)
+        return Response(search.search(query, tuple(types) or search.TYPES, limit, typeahead))
@@ -164,6 +164,7 @@ echo "3️⃣  Run migrations on the new database:"
 echo "   source venv/bin/activate"
 echo "   export DJANGO_SETTINGS_MODULE=college_project.settings_production"
 echo "   python manage.py migrate"
+echo "   python manage.py createcachetable"
 echo ""
 echo "4️⃣  Create superuser:"
 echo "   python manage.py createsuperuser"
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import ExamType, ExamMark
+from .models import ArchivedSession, ExamType, ExamMark, GradingScale, MarkImport, StudentResult
 
 @admin.register(ExamType)
 class ExamTypeAdmin(admin.ModelAdmin):
@@ -39,6 +39,36 @@ class ExamTypeAdmin(admin.ModelAdmin):
     get_active_status.short_description = 'Status'
 
 
+@admin.register(GradingScale)
+class GradingScaleAdmin(admin.ModelAdmin):
+    """
+    Grade bands per session, optionally per exam type.
+    After changing a scale run `manage.py regrade_marks` to update stored grades.
+    """
+    list_display = ('session', 'get_exam_type', 'grade', 'min_marks', 'grade_point')
+    list_filter = ('session', 'exam_type')
+    ordering = ('session', 'exam_type', '-min_marks')
+    readonly_fields = ('created_at', 'updated_at')
+    
+    fieldsets = (
+        ('Scope', {
+            'fields': ('session', 'exam_type')
+        }),
+        ('Grade Band', {
+            'fields': ('grade', 'min_marks', 'grade_point'),
+            'description': 'Totals at or above Min marks (and below the next band) receive this grade and grade point.'
+        }),
+        ('Timestamps', {
+            'fields': ('created_at', 'updated_at')
+        }),
+    )
+    
+    def get_exam_type(self, obj):
+        """Show which exams the band applies to"""
+        return obj.exam_type.name if obj.exam_type else 'All exams'
+    get_exam_type.short_description = 'Exam Type'
+
+
 @admin.register(ExamMark)
 class ExamMarkAdmin(admin.ModelAdmin):
     """
@@ -50,8 +80,8 @@ class ExamMarkAdmin(admin.ModelAdmin):
     """
     list_display = ('get_exam_type', 'exam_date', 'student', 'subject', 'get_marks_display', 'grade', 'attendance_display')
     search_fields = ('student__name', 'student__roll_number', 'subject__name', 'exam_type__name')
-    list_filter = ('exam_type', 'subject', 'session', 'student__group', 'grade')
-    ordering = ('-exam_date', 'student__roll_number')
+    list_filter = ('exam_type', 'subject', 'session', 'student_group', 'student_class', 'grade')
+    ordering = ('-exam_date', 'student_roll', 'id')
     readonly_fields = ('total_marks', 'grade', 'created_at', 'updated_at')
     date_hierarchy = 'exam_date'
     
@@ -122,3 +152,42 @@ class ExamMarkAdmin(admin.ModelAdmin):
     def get_readonly_fields(self, request, obj=None):
         """Make calculated fields always read-only"""
         return self.readonly_fields
+
+
+@admin.register(StudentResult)
+class StudentResultAdmin(admin.ModelAdmin):
+    """
+    Computed results; recompute with `manage.py compute_results` or
+    POST /api/v1/exams/results/compute/.
+    """
+    list_display = ('student', 'exam_type', 'session', 'gpa', 'gpa_without_optional', 'grade', 'failed_subjects', 'merit_rank', 'class_rank', 'group_rank', 'computed_at')
+    list_filter = ('session', 'exam_type', 'grade', 'student_group', 'student_class')
+    search_fields = ('student__name', 'student__roll_number')
+    readonly_fields = [field.name for field in StudentResult._meta.fields]
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(MarkImport)
+class MarkImportAdmin(admin.ModelAdmin):
+    """Uploaded mark sheets; upload through POST /api/v1/exams/imports/"""
+    list_display = ('file', 'session', 'exam_type', 'status', 'progress', 'saved_rows', 'failed_rows', 'uploaded_by', 'created_at')
+    list_filter = ('status', 'session', 'exam_type')
+    readonly_fields = [field.name for field in MarkImport._meta.fields]
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ArchivedSession)
+class ArchivedSessionAdmin(admin.ModelAdmin):
+    """Archived sessions; archive and restore with `manage.py archive_session`"""
+    list_display = ('session', 'mark_count', 'size', 'file', 'archived_at')
+    readonly_fields = [field.name for field in ArchivedSession._meta.fields]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,339 @@
+"""
+In-memory statistics of a session's marks.
+
+A session's marks are loaded once per process into a SessionFrame: one
+typed array per column (struct of arrays), the dimensions as integer
+codes and the measures as floats with NaN for a missing value. Every
+request brings the frame up to date from the rows written since it was
+last refreshed, read on exams_mark_session_changes_idx, and the marks
+deleted since, from the tombstones of the change feed (exams.changes);
+changed rows are overwritten in place and new ones appended. The
+statistics of a request are then computed over the arrays, without
+another query on ExamMark.
+
+Archived sessions are loaded from their archive file and need no
+refreshing. Each web process keeps the frames of its MAX_FRAMES most
+recently used sessions.
+"""
+import bisect
+import itertools
+import math
+import operator
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from academics.models import Class, Subject
+from students.models import Student
+from .archive import open_session_archive
+from .models import ExamMark, ExamMarkTombstone, ExamType
+
+
+MAX_FRAMES = 8
+
+# A refresh reads the rows written since this long before the previous
+# one, so that writes still committing then are not missed (the same
+# allowance as exams.changes.SETTLE); rows read twice are overwritten
+OVERLAP = timedelta(seconds=5)
+
+NAN = float('nan')
+
+GROUPS = [value for value, _ in Student.GROUP_CHOICES]
+
+# Query parameter -> frame column of the dimensions
+DIMENSIONS = {
+    'exam_type': 'exam_type',
+    'subject': 'subject',
+    'class_name': 'student_class',
+    'group': 'group',
+    'student': 'student',
+}
+
+# Query parameter -> frame column of the measures
+METRICS = {
+    'total': 'total',
+    'cq': 'cq',
+    'mct': 'mct',
+    'lab': 'lab',
+    'attendance': 'attendance',
+}
+
+DEFAULT_PERCENTILES = (25, 50, 75, 90)
+
+DEFAULT_BINS = 10
+MAX_BINS = 100
+
+# ExamMark columns read into a frame
+FIELDS = (
+    'id', 'exam_type_id', 'subject_id', 'student_id', 'student_class_id', 'student_group',
+    'cq_marks', 'mct_marks', 'lab_marks', 'total_marks', 'present', 'total_class', 'updated_at',
+)
+
+_frames = OrderedDict()
+_lock = threading.Lock()
+
+
+class StatsError(ValueError):
+    """The parameters of a stats request are not usable"""
+
+
+def _measure(value):
+    return NAN if value is None else float(value)
+
+
+class SessionFrame:
+    """The marks of one session as parallel arrays, indexed by row"""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.ids = array('q')
+        self.exam_type = array('q')
+        self.subject = array('q')
+        self.student = array('q')
+        self.student_class = array('q')  # 0 for none
+        self.group = array('b')  # index in GROUPS, -1 for none
+        self.cq = array('d')
+        self.mct = array('d')
+        self.lab = array('d')
+        self.total = array('d')
+        self.attendance = array('d')  # percentage, NaN when no classes were held
+        self.alive = bytearray()
+        self.rows = {}
+        self.lock = threading.Lock()
+        self.archived = False
+        self.marks_since = None
+        self.deleted_since = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def put(self, pk, exam_type_id, subject_id, student_id, student_class_id, student_group,
+            cq_marks, mct_marks, lab_marks, total_marks, present, total_class, *rest):
+        """Insert or overwrite the row of a mark"""
+        values = (
+            (self.exam_type, exam_type_id),
+            (self.subject, subject_id),
+            (self.student, student_id),
+            (self.student_class, student_class_id or 0),
+            (self.group, GROUPS.index(student_group) if student_group in GROUPS else -1),
+            (self.cq, _measure(cq_marks)),
+            (self.mct, _measure(mct_marks)),
+            (self.lab, _measure(lab_marks)),
+            (self.total, _measure(total_marks)),
+            (self.attendance, present * 100 / total_class if total_class > 0 else NAN),
+        )
+        row = self.rows.get(pk)
+        if row is None:
+            self.rows[pk] = len(self.ids)
+            self.ids.append(pk)
+            self.alive.append(1)
+            for column, value in values:
+                column.append(value)
+        else:
+            for column, value in values:
+                column[row] = value
+
+    def drop(self, pk):
+        row = self.rows.pop(pk, None)
+        if row is not None:
+            self.alive[row] = 0
+
+    def sparse(self):
+        """Whether deleted rows outnumber the live ones, and the frame is better rebuilt"""
+        return len(self.ids) - len(self.rows) > max(len(self.rows), 1000)
+
+    def load(self):
+        """Read every mark of the session (from its archive file when it has one)"""
+        session_archive = open_session_archive(self.session_id)
+        if session_archive is not None:
+            columns = [session_archive.columns[name] for name in FIELDS[:-1]]
+            for position in range(len(session_archive)):
+                self.put(*(column[position] for column in columns))
+            self.archived = True
+            return
+        started = timezone.now()
+        for row in ExamMark.objects.filter(session_id=self.session_id).order_by().values_list(*FIELDS).iterator(chunk_size=5000):
+            self.put(*row)
+        self.marks_since = self.deleted_since = started - OVERLAP
+
+    def refresh(self):
+        """Apply the marks written and deleted since the last refresh"""
+        if self.archived:
+            return
+        started = timezone.now()
+        changed = ExamMark.objects.filter(session_id=self.session_id, updated_at__gte=self.marks_since)
+        for row in changed.order_by().values_list(*FIELDS):
+            self.put(*row)
+        deleted = ExamMarkTombstone.objects.filter(session_id=self.session_id, deleted_at__gte=self.deleted_since).filter(
+            # Tombstones of marks that only changed class or group
+            ~Exists(ExamMark.objects.filter(pk=OuterRef('mark_id'), session_id=self.session_id))
+        )
+        for pk in deleted.values_list('mark_id', flat=True):
+            self.drop(pk)
+        self.marks_since = self.deleted_since = started - OVERLAP
+
+    def collect(self, measure, dimension, filters):
+        """
+        {dimension code: [measure values]} of the live rows matching
+        filters ({frame column: code}), skipping missing values; all the
+        values under None when dimension is None. One pass over the arrays.
+        """
+        names = list(filters)
+        wanted = tuple(filters[name] for name in names)
+        columns = zip(*(getattr(self, name) for name in names)) if names else itertools.repeat(())
+        keys = getattr(self, dimension) if dimension else itertools.repeat(None)
+        grouped = {}
+        for alive, value, key, codes in zip(self.alive, getattr(self, measure), keys, columns):
+            # value != value for NaN
+            if alive and value == value and codes == wanted:
+                values = grouped.get(key)
+                if values is None:
+                    values = grouped[key] = []
+                values.append(value)
+        return grouped
+
+
+def get_frame(session_id):
+    """The up-to-date frame of a session, loading it on first use"""
+    with _lock:
+        frame = _frames.get(session_id)
+        if frame is not None:
+            _frames.move_to_end(session_id)
+    if frame is None:
+        frame = SessionFrame(session_id)
+        with frame.lock:
+            frame.load()
+        with _lock:
+            frame = _frames.setdefault(session_id, frame)
+            while len(_frames) > MAX_FRAMES:
+                _frames.popitem(last=False)
+    else:
+        if frame.archived != (open_session_archive(session_id) is not None) or frame.sparse():
+            # Archived or restored since it was loaded, or mostly deleted rows
+            with _lock:
+                _frames.pop(session_id, None)
+            return get_frame(session_id)
+        with frame.lock:
+            frame.refresh()
+    return frame
+
+
+def reset():
+    """Forget every loaded frame"""
+    with _lock:
+        _frames.clear()
+
+
+def percentile(ordered, q):
+    """q-th percentile of sorted values, interpolating linearly between ranks"""
+    rank = (len(ordered) - 1) * q / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def describe(ordered, percentiles, edges):
+    """Summary statistics of a sorted list of floats"""
+    if not ordered:
+        return {'count': 0}
+    count = len(ordered)
+    mean = math.fsum(ordered) / count
+    # Bins are counted by bisecting the sorted values at each edge; the
+    # last bin is closed on the right
+    bounds = [bisect.bisect_left(ordered, edge) for edge in edges[:-1]] + [count] if edges else []
+    counts = [end - start for start, end in zip(bounds, bounds[1:])]
+    return {
+        'count': count,
+        'mean': round(mean, 2),
+        'median': round(percentile(ordered, 50), 2),
+        'stddev': round(math.sqrt(max(math.fsum(map(operator.mul, ordered, ordered)) / count - mean * mean, 0)), 2),
+        'min': ordered[0],
+        'max': ordered[-1],
+        'percentiles': {str(q): round(percentile(ordered, q), 2) for q in percentiles},
+        'histogram': counts,
+    }
+
+
+def _labels(dimension, codes):
+    """Display names of dimension codes"""
+    if dimension == 'group':
+        names = dict(Student.GROUP_CHOICES)
+        return {code: names[GROUPS[code]] if code >= 0 else None for code in codes}
+    if dimension == 'subject':
+        return {pk: f'{code} {name}' for pk, code, name in Subject.objects.filter(pk__in=codes).values_list('pk', 'code', 'name')}
+    if dimension == 'student':
+        return {pk: f'{roll} {name}' for pk, roll, name in Student.objects.filter(pk__in=codes).values_list('pk', 'roll_number', 'name')}
+    model = ExamType if dimension == 'exam_type' else Class
+    return dict(model.objects.filter(pk__in=codes).values_list('pk', 'name'))
+
+
+def _code(param, value):
+    """Frame code of a filter value"""
+    if param == 'group':
+        if value not in GROUPS:
+            raise StatsError(f"group must be one of {', '.join(GROUPS)}")
+        return GROUPS.index(value)
+    if not str(value).isdigit():
+        raise StatsError(f'{param} must be an id')
+    return int(value)
+
+
+def session_stats(session_id, params):
+    """
+    Statistics of a session's marks for the stats endpoint. params are
+    the query parameters: metric, by, percentiles, bins and the
+    DIMENSIONS as filters.
+    """
+    metric = params.get('metric') or 'total'
+    if metric not in METRICS:
+        raise StatsError(f"metric must be one of {', '.join(METRICS)}")
+    by = params.get('by') or None
+    if by is not None and by not in DIMENSIONS:
+        raise StatsError(f"by must be one of {', '.join(DIMENSIONS)}")
+    try:
+        percentiles = [float(q) for q in params['percentiles'].split(',')] if params.get('percentiles') else DEFAULT_PERCENTILES
+        bins = int(params.get('bins') or DEFAULT_BINS)
+    except ValueError:
+        raise StatsError('percentiles must be numbers and bins an integer')
+    if not all(0 <= q <= 100 for q in percentiles):
+        raise StatsError('percentiles must be between 0 and 100')
+    if not 0 <= bins <= MAX_BINS:
+        raise StatsError(f'bins must be between 0 and {MAX_BINS}')
+    percentiles = [int(q) if float(q).is_integer() else q for q in percentiles]
+    filters = {DIMENSIONS[param]: _code(param, params[param]) for param in DIMENSIONS if params.get(param)}
+
+    frame = get_frame(session_id)
+    with frame.lock:
+        grouped = frame.collect(METRICS[metric], DIMENSIONS[by] if by else None, filters)
+    for values in grouped.values():
+        values.sort()
+    values = sorted(itertools.chain.from_iterable(grouped.values())) if by else grouped.get(None, [])
+
+    # Histogram bins span the values of every group, so groups compare bin by bin
+    low, high = (values[0], values[-1]) if values else (0, 0)
+    width = (high - low) / bins if bins and high > low else 0
+    # The outer edges are the values themselves, so rounding never leaves the lowest out of the first bin
+    edges = [low] + [round(low + width * step, 2) for step in range(1, bins)] + [high] if width else (
+        [low, high] if bins else []
+    )
+
+    result = {
+        'session': session_id,
+        'metric': metric,
+        'by': by,
+        'filters': {param: params[param] for param in DIMENSIONS if params.get(param)},
+        'histogram_edges': edges,
+        'overall': describe(values, percentiles, edges),
+    }
+    if by is not None:
+        labels = _labels(by, list(grouped))
+        result['groups'] = [
+            {'key': key if by != 'group' else (GROUPS[key] if key >= 0 else None), 'label': labels.get(key),
+             **describe(grouped[key], percentiles, edges)}
+            for key in sorted(grouped)
+        ]
+    return result
@@ -0,0 +1,492 @@
+"""
+Archived sessions: the marks of a closed session moved out of ExamMark
+into one columnar file on local disk (manage.py archive_session).
+
+A file holds the marks in list order (exam date descending, roll
+number, id; see exams.pagination), one column after the other:
+
+    MAGIC | header length (uint64) | JSON header | column blocks
+
+Every column is stored as integers: ids and counts as they are, dates
+as ordinals, marks in hundredths, timestamps in microseconds and text
+as positions in a sorted dictionary (zlib-compressed JSON). Each
+integer column is frame-of-reference encoded, i.e. stored minus its
+minimum in the narrowest unsigned type that fits (a class of 60
+students with ids in the hundred thousands takes one byte per row), and
+a column holding a single value is kept in the header alone. A by_id
+column gives the rows in id order, for lookups by primary key.
+
+Files are read through mmap: a column is a memoryview cast over its
+block, so opening an archive reads the header only, and the pages of
+the columns a request touches are loaded by the OS and shared between
+processes. Filters compare encoded integers without decoding a value;
+only the rows of the requested page are decoded.
+
+The rollups (ExamSummary, StudentAttendance) and StudentResults of an
+archived session stay in the database, so the dashboard, reports,
+results and attendance read them as before. Marks of an archived
+session cannot be written (ARCHIVED_SESSION); restore them first.
+"""
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+
+from academics.models import Subject
+from students.models import Student
+from .models import ArchivedSession, ExamMark, ExamType
+
+
+MAGIC = b'CMARKS1\n'
+
+ALIGNMENT = 8
+
+# Unsigned array typecodes, narrowest first
+TYPECODES = [(typecode, 2 ** (8 * array(typecode).itemsize) - 1) for typecode in 'BHIQ']
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+MICROSECOND = timedelta(microseconds=1)
+
+HUNDREDTHS = Decimal('0.01')
+
+# ExamMark columns kept in an archive (attnames), and how each is encoded
+COLUMNS = {
+    'id': 'int',
+    'exam_type_id': 'int',
+    'exam_date': 'date',
+    'student_id': 'int',
+    'student_roll': 'text',
+    'student_group': 'text',
+    'student_class_id': 'int',
+    'subject_id': 'int',
+    'session_id': 'int',
+    'cq_marks': 'decimal',
+    'mct_marks': 'decimal',
+    'lab_marks': 'decimal',
+    'total_marks': 'decimal',
+    'grade': 'text',
+    'total_class': 'int',
+    'present': 'int',
+    'absent': 'int',
+    'remarks': 'text',
+    'created_at': 'datetime',
+    'updated_at': 'datetime',
+}
+
+ENCODERS = {
+    'int': int,
+    'date': lambda value: value.toordinal(),
+    'decimal': lambda value: int(value / HUNDREDTHS),
+    'datetime': lambda value: (value - EPOCH) // MICROSECOND,
+}
+
+DECODERS = {
+    'int': lambda raw: raw,
+    'date': date.fromordinal,
+    'decimal': lambda raw: Decimal(raw).scaleb(-2),
+    'datetime': lambda raw: EPOCH + raw * MICROSECOND,
+}
+
+# Query parameters of the marks list (see ExamMarkViewSet.get_queryset)
+# and the archive column they filter
+FILTERS = {
+    'exam_type': 'exam_type_id',
+    'subject': 'subject_id',
+    'session': 'session_id',
+    'group': 'student_group',
+    'class_name': 'student_class_id',
+    'student': 'student_id',
+    'start_date': 'exam_date__gte',
+    'end_date': 'exam_date__lte',
+}
+
+CHUNK_SIZE = 2000
+
+_open = {}
+
+
+class ArchiveError(Exception):
+    """An archive file is missing or is not one"""
+
+
+def archive_root():
+    return getattr(settings, 'MARK_ARCHIVE_ROOT', os.path.join(settings.BASE_DIR, 'archive'))
+
+
+def archive_path(name):
+    return os.path.join(archive_root(), name)
+
+
+def sort_key(exam_date, student_roll, pk):
+    """Position of a mark in list order, comparable as a tuple"""
+    return -exam_date.toordinal(), student_roll, pk
+
+
+# Writing
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _encode_integers(values, blocks):
+    """Header entry of an integer column (None for missing values); its block is appended to blocks"""
+    present = [value for value in values if value is not None]
+    if len(set(values)) == 1:
+        return {'encoding': 'const', 'value': values[0]}
+    base = min(present) if present else 0
+    span = (max(present) - base) if present else 0
+    null = span + 1 if len(present) < len(values) else None
+    typecode = next(typecode for typecode, largest in TYPECODES if largest >= span + 1)
+    codes = array(typecode, (null if value is None else value - base for value in values))
+    blocks.append(codes.tobytes())
+    return {'encoding': 'for', 'base': base, 'null': null, 'typecode': typecode, 'block': len(blocks) - 1}
+
+
+def _encode_column(kind, values, blocks):
+    if kind == 'text':
+        dictionary = sorted({value for value in values if value is not None})
+        index = {value: position for position, value in enumerate(dictionary)}
+        meta = _encode_integers([index.get(value) for value in values], blocks)
+        blocks.append(zlib.compress(json.dumps(dictionary).encode(), 9))
+        meta['dictionary'] = len(blocks) - 1
+    else:
+        encode = ENCODERS[kind]
+        meta = _encode_integers([None if value is None else encode(value) for value in values], blocks)
+    meta['kind'] = kind
+    return meta
+
+
+def write_archive(path, rows):
+    """
+    Write marks, as dicts of the COLUMNS attnames, to an archive file at
+    path. The file is written next to it and renamed into place, so a
+    reader never sees it half written. Returns the size of the file.
+    """
+    rows = sorted(rows, key=lambda row: sort_key(row['exam_date'], row['student_roll'], row['id']))
+    blocks = []
+    columns = {name: _encode_column(kind, [row[name] for row in rows], blocks) for name, kind in COLUMNS.items()}
+    by_id = sorted(range(len(rows)), key=lambda position: rows[position]['id'])
+    columns['by_id'] = {'kind': 'int', **_encode_integers(by_id, blocks)}
+
+    # Blocks are laid out 8-byte aligned after the header; the header
+    # gives each one as (offset from the first block, length)
+    layout = []
+    offset = 0
+    for block in blocks:
+        layout.append((offset, len(block)))
+        offset = _aligned(offset + len(block))
+    for meta in columns.values():
+        for key in ('block', 'dictionary'):
+            if key in meta:
+                meta[key] = layout[meta[key]]
+
+    header = json.dumps({'rows': len(rows), 'byteorder': sys.byteorder, 'columns': columns}).encode()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f'{path}.partial'
+    with open(partial, 'wb') as stream:
+        start = len(MAGIC) + 8 + len(header)
+        stream.write(MAGIC + struct.pack('<Q', len(header)) + header + bytes(_aligned(start) - start))
+        for block in blocks:
+            stream.write(block + bytes(_aligned(len(block)) - len(block)))
+        stream.flush()
+        os.fsync(stream.fileno())
+    os.replace(partial, path)
+    return os.path.getsize(path)
+
+
+# Reading
+
+class Column:
+    """
+    One column of an archive. Values are compared in their raw (encoded)
+    form; only __getitem__ decodes.
+    """
+
+    def __init__(self, data, meta, byteorder):
+        self.kind = meta['kind']
+        self.dictionary = None
+        if 'dictionary' in meta:
+            offset, length = meta['dictionary']
+            self.dictionary = json.loads(zlib.decompress(data[offset:offset + length]))
+        if meta['encoding'] == 'const':
+            self.codes = None
+            self.constant = meta['value']
+            return
+        offset, length = meta['block']
+        self.base = meta['base']
+        self.null = meta['null']
+        if byteorder == sys.byteorder:
+            self.codes = data[offset:offset + length].cast(meta['typecode'])
+        else:
+            # Written on a machine of the other byte order: read a swapped copy
+            self.codes = array(meta['typecode'], data[offset:offset + length])
+            self.codes.byteswap()
+
+    def raw(self, position):
+        if self.codes is None:
+            return self.constant
+        code = self.codes[position]
+        return None if code == self.null else code + self.base
+
+    def __getitem__(self, position):
+        raw = self.raw(position)
+        if raw is None:
+            return None
+        if self.dictionary is not None:
+            return self.dictionary[raw]
+        return DECODERS[self.kind](raw)
+
+    def encode(self, value):
+        """Raw form of a filter value (as a query parameter gives it); None when no row can hold it"""
+        try:
+            if self.dictionary is not None:
+                position = bisect.bisect_left(self.dictionary, value)
+                return position if self.dictionary[position:position + 1] == [value] else None
+            if self.kind == 'date':
+                return date.fromisoformat(value).toordinal() if isinstance(value, str) else ENCODERS['date'](value)
+            return ENCODERS[self.kind](value)
+        except (TypeError, ValueError, ArithmeticError):
+            return None
+
+    def select(self, positions, low, high):
+        """The positions whose raw value lies between low and high (inclusive)"""
+        if self.codes is None:
+            return positions if self.constant is not None and low <= self.constant <= high else []
+        codes = self.codes
+        low, high = low - self.base, high - self.base
+        if self.null is not None and high >= self.null:
+            high = self.null - 1
+        if low == high:
+            return [position for position in positions if codes[position] == low]
+        return [position for position in positions if low <= codes[position] <= high]
+
+
+class MarkArchive:
+    """An archive file, memory-mapped read-only"""
+
+    def __init__(self, path):
+        try:
+            with open(path, 'rb') as stream:
+                self._map = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as exc:
+            raise ArchiveError(f"Cannot open mark archive {path}: {exc}")
+        buffer = memoryview(self._map)
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ArchiveError(f"{path} is not a mark archive")
+        (length,) = struct.unpack_from('<Q', buffer, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(bytes(buffer[start:start + length]))
+        data = buffer[_aligned(start + length):]
+
+        self.path = path
+        self.rows = header['rows']
+        self.columns = {
+            name: Column(data, meta, header['byteorder']) for name, meta in header['columns'].items()
+        }
+
+    def __len__(self):
+        return self.rows
+
+    def marks(self):
+        return ArchivedMarks(self, range(self.rows))
+
+    def position_of(self, pk):
+        """Row position of a mark id, found by bisecting the by_id column; None if absent"""
+        ids, by_id = self.columns['id'], self.columns['by_id']
+        position = bisect.bisect_left(range(self.rows), pk, key=lambda rank: ids.raw(by_id.raw(rank)))
+        if position < self.rows and ids.raw(by_id.raw(position)) == pk:
+            return by_id.raw(position)
+        return None
+
+    def record(self, position):
+        """A row as a dict of the COLUMNS attnames"""
+        return {name: self.columns[name][position] for name in COLUMNS}
+
+    def instance(self, position):
+        """A row as an (unsaved, read-only) ExamMark, for the detail serializer"""
+        return ExamMark(**self.record(position))
+
+
+def open_archive(path):
+    """MarkArchive of a file, kept open while the file is unchanged"""
+    try:
+        modified = os.stat(path).st_mtime_ns
+    except OSError as exc:
+        raise ArchiveError(f"Cannot open mark archive {path}: {exc}")
+    cached = _open.get(path)
+    if cached is None or cached[0] != modified:
+        cached = _open[path] = (modified, MarkArchive(path))
+    return cached[1]
+
+
+def open_session_archive(session_id):
+    """MarkArchive of a session, None while its marks are in ExamMark"""
+    try:
+        name = ArchivedSession.objects.exclude(file='').filter(session_id=session_id).values_list('file', flat=True).first()
+    except (TypeError, ValueError):
+        return None
+    return open_archive(archive_path(name)) if name else None
+
+
+def find_archived_mark(pk):
+    """Archived mark with this id as an ExamMark instance, or None"""
+    for name in ArchivedSession.objects.exclude(file='').values_list('file', flat=True):
+        archive = open_archive(archive_path(name))
+        position = archive.position_of(pk)
+        if position is not None:
+            return archive.instance(position)
+    return None
+
+
+def archived_session_ids(session_ids):
+    """The sessions among session_ids that are archived, or being archived"""
+    return set(ArchivedSession.objects.filter(session_id__in=session_ids).values_list('session_id', flat=True))
+
+
+class ArchivedMarks:
+    """
+    Some marks of an archive, in list order: a row position list that
+    filter()s narrow. Indexing and iteration give the marks as
+    ExamMarkListSerializer.values_queryset() dicts, so the list, export
+    and pagination code serve them as they serve a queryset.
+    """
+
+    def __init__(self, archive, positions):
+        self.archive = archive
+        self.positions = positions
+
+    def filter(self, **lookups):
+        """Narrow by column=value, or exam_date__gte/__lte=date, lookups"""
+        positions = self.positions
+        for lookup, value in lookups.items():
+            name, _, operator = lookup.partition('__')
+            column = self.archive.columns[name]
+            raw = column.encode(value)
+            if raw is None:
+                return ArchivedMarks(self.archive, [])
+            low = raw if operator != 'lte' else -sys.maxsize
+            high = raw if operator != 'gte' else sys.maxsize
+            positions = column.select(positions, low, high)
+        return ArchivedMarks(self.archive, positions)
+
+    def filter_params(self, params):
+        """Narrow by the marks list query parameters (FILTERS) present in params"""
+        return self.filter(**{lookup: params[param] for param, lookup in FILTERS.items() if params.get(param)})
+
+    def after(self, position):
+        """The marks listed after position, an (exam_date, student_roll, id) tuple"""
+        columns = self.archive.columns
+        start = bisect.bisect_right(
+            self.positions, sort_key(*position),
+            key=lambda row: sort_key(columns['exam_date'][row], columns['student_roll'][row], columns['id'].raw(row)),
+        )
+        return ArchivedMarks(self.archive, self.positions[start:])
+
+    def before(self, position):
+        """The marks listed before position, an (exam_date, student_roll, id) tuple"""
+        columns = self.archive.columns
+        end = bisect.bisect_left(
+            self.positions, sort_key(*position),
+            key=lambda row: sort_key(columns['exam_date'][row], columns['student_roll'][row], columns['id'].raw(row)),
+        )
+        return ArchivedMarks(self.archive, self.positions[:end])
+
+    def __len__(self):
+        return len(self.positions)
+
+    def count(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.values(self.positions[index])
+        return self.values([self.positions[index]])[0]
+
+    def __iter__(self):
+        for start in range(0, len(self.positions), CHUNK_SIZE):
+            yield from self[start:start + CHUNK_SIZE]
+
+    def values(self, positions):
+        """
+        The marks at positions as values_queryset() dicts. Names come from
+        the current exam type, student and subject rows, three IN queries
+        per call, as the joins of the live list would give them.
+        """
+        records = [self.archive.record(position) for position in positions]
+        exam_types = ExamType.objects.in_bulk({record['exam_type_id'] for record in records})
+        students = Student.objects.only('name', 'roll_number', 'group').in_bulk({record['student_id'] for record in records})
+        subjects = Subject.objects.only('name', 'code').in_bulk({record['subject_id'] for record in records})
+
+        rows = []
+        for record in records:
+            exam_type = exam_types.get(record['exam_type_id'])
+            student = students.get(record['student_id'])
+            subject = subjects.get(record['subject_id'])
+            rows.append({
+                'id': record['id'],
+                'exam_type': record['exam_type_id'],
+                'exam_type__name': getattr(exam_type, 'name', None),
+                'exam_date': record['exam_date'],
+                'student': record['student_id'],
+                'student__name': getattr(student, 'name', None),
+                'student__roll_number': getattr(student, 'roll_number', None),
+                'student__group': getattr(student, 'group', None),
+                'student_roll': record['student_roll'],
+                'subject': record['subject_id'],
+                'subject__name': getattr(subject, 'name', None),
+                'subject__code': getattr(subject, 'code', None),
+                'cq_marks': record['cq_marks'],
+                'mct_marks': record['mct_marks'],
+                'lab_marks': record['lab_marks'],
+                'total_marks': record['total_marks'],
+                'grade': record['grade'],
+                'total_class': record['total_class'],
+                'present': record['present'],
+                'absent': record['absent'],
+                'session': record['session_id'],
+                'attendance_ratio': record['present'] / record['total_class'] if record['total_class'] > 0 else None,
+            })
+        return rows
+
+    def column(self, name):
+        """Decoded values of one column for these marks"""
+        column = self.archive.columns[name]
+        return [column[position] for position in self.positions]
+
+    def statistics(self):
+        """The figures of ExamMarkViewSet.report_statistics(), computed over these marks"""
+        totals = [total for total in self.column('total_marks') if total is not None]
+        attendance = [
+            present * 100 / total_class
+            for present, total_class in zip(self.column('present'), self.column('total_class'))
+            if total_class > 0
+        ]
+        grades = {}
+        for grade in self.column('grade'):
+            grades[grade] = grades.get(grade, 0) + (grade is not None)
+        return {
+            'total_records': len(self.positions),
+            'average_marks': sum(totals) / len(totals) if totals else None,
+            'average_attendance': sum(attendance) / len(attendance) if attendance else None,
+            'grade_distribution': [
+                {'grade': grade, 'count': grades[grade]}
+                for grade in sorted(grades, key=lambda grade: (grade is not None, grade or ''))
+            ],
+        }
+
+    def subject_totals(self):
+        """(student_id, subject_id, average total) of the marks with a total, by student and subject"""
+        totals = {}
+        for student_id, subject_id, total in zip(self.column('student_id'), self.column('subject_id'), self.column('total_marks')):
+            if total is not None:
+                totals.setdefault((student_id, subject_id), []).append(total)
+        return [(student_id, subject_id, sum(marks) / len(marks)) for (student_id, subject_id), marks in sorted(totals.items())]
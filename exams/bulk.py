@@ -0,0 +1,298 @@
+"""
+Set-based write path for mark sheets.
+
+A sheet is validated row by row in memory, every referenced id is
+resolved with one IN query per table, grades are computed in Python
+(total_marks is a generated column) and the rows are written in
+chunks, each chunk being a single INSERT ... ON CONFLICT DO UPDATE on
+the ExamMark unique key inside its own transaction, together with the
+refresh of the rollups and student results of the exams it touched.
+"""
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+
+from academics.models import Subject, Session
+from students.models import Student
+from . import grading, results, rollups
+from .models import (
+    MARK_KEY_FIELDS, STUDENT_COPIES, ExamMark, ExamMarkTombstone, ExamType, calculate_total_marks, existing_mark_keys,
+    scope_values,
+)
+from .archive import archived_session_ids
+from .serializers import (
+    ARCHIVED_SESSION, DUPLICATE_IN_PAYLOAD, DUPLICATE_MARK, ExamMarkBulkRowSerializer, validate_attendance,
+)
+
+
+CHUNK_SIZE = 500
+
+# Columns of the unique_together key, in the order the database index uses
+UNIQUE_FIELDS = list(MARK_KEY_FIELDS)
+
+# Columns overwritten when an incoming row hits an existing key
+UPDATE_FIELDS = [
+    'student_roll', 'student_group', 'student_class', 'cq_marks', 'mct_marks', 'lab_marks', 'grade',
+    'total_class', 'present', 'absent', 'remarks', 'updated_at',
+]
+
+RELATED_MODELS = {
+    'exam_type': ExamType,
+    'student': Student,
+    'subject': Subject,
+    'session': Session,
+}
+
+# Fields copied from an existing row before a partial update is applied
+MERGE_FIELDS = UNIQUE_FIELDS + [
+    'cq_marks', 'mct_marks', 'lab_marks', 'total_class', 'present', 'absent', 'remarks',
+]
+
+DOES_NOT_EXIST = PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+
+
+def mark_key(values):
+    """Unique key tuple of a row dict holding plain ids"""
+    return tuple(values[field] for field in UNIQUE_FIELDS)
+
+
+def row_error(mark_data, errors):
+    """Error entry in the shape the bulk_update endpoint has always returned"""
+    error = {
+        'student_id': mark_data.get('student'),
+        'errors': errors
+    }
+    if 'row' in mark_data:
+        # Sheet imports number their rows so errors can point at them
+        error['row'] = mark_data['row']
+    return error
+
+
+def bulk_upsert_marks(marks_data, chunk_size=CHUNK_SIZE):
+    """
+    Create or update a list of mark rows.
+
+    Rows carrying an ``id`` are partial updates of that mark; all other
+    rows are upserted on the unique key. Returns ``(saved, errors)``
+    where errors use the per-row shape of the bulk_update response.
+    """
+    # Imports run outside any request
+    grading.recheck()
+    errors = []
+    pending = []
+
+    for mark_data in marks_data:
+        if not isinstance(mark_data, dict):
+            errors.append(row_error({}, {'non_field_errors': ['Invalid data. Expected a dictionary.']}))
+            continue
+        serializer = ExamMarkBulkRowSerializer(data=mark_data, partial='id' in mark_data)
+        if serializer.is_valid():
+            pending.append((mark_data, serializer.validated_data))
+        else:
+            errors.append(row_error(mark_data, serializer.errors))
+
+    # Partial updates start from the stored values of their mark
+    ids = [data['id'] for _, data in pending if 'id' in data]
+    existing = ExamMark.objects.in_bulk(ids) if ids else {}
+
+    rows = []
+    for mark_data, data in pending:
+        if 'id' in data:
+            mark_id = data['id']
+            mark = existing.get(mark_id)
+            if mark is None:
+                errors.append({
+                    'id': mark_id,
+                    'error': 'ExamMark not found'
+                })
+                continue
+            values = {field: getattr(mark, mark._meta.get_field(field).attname) for field in MERGE_FIELDS}
+            values['original_key'] = mark_key(values)
+            values['original_scope'] = scope_values(mark)
+            values.update(data)
+        else:
+            values = {
+                'total_class': 10,
+                'present': 0,
+                'absent': 0,
+                **data,
+                'original_key': None,
+                'original_scope': None,
+            }
+        try:
+            validate_attendance(values['total_class'], values['present'], values['absent'])
+        except serializers.ValidationError as exc:
+            errors.append(row_error(mark_data, {'non_field_errors': exc.detail}))
+            continue
+        rows.append((mark_data, values))
+
+    rows = _drop_unknown_references(rows, errors)
+    rows = _drop_duplicate_keys(rows, errors)
+
+    saved = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            saved += _write_chunk(chunk)
+        except DatabaseError as exc:
+            for mark_data, _ in chunk:
+                errors.append(row_error(mark_data, {'non_field_errors': [str(exc)]}))
+
+    return saved, errors
+
+
+def _drop_unknown_references(rows, errors):
+    """
+    Resolve every referenced id with one IN query per related table. The
+    student query also fetches the columns copied onto each mark. Rows of
+    archived sessions are refused.
+    """
+    known = {}
+    for field, model in RELATED_MODELS.items():
+        wanted = {values[field] for _, values in rows}
+        if not wanted:
+            known[field] = {}
+        elif field == 'student':
+            known[field] = {
+                pk: dict(zip(STUDENT_COPIES, copies))
+                for pk, *copies in model.objects.filter(pk__in=wanted).values_list('pk', *STUDENT_COPIES.values())
+            }
+        else:
+            known[field] = dict.fromkeys(model.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+    archived = archived_session_ids(known['session']) if known['session'] else set()
+
+    kept = []
+    for mark_data, values in rows:
+        row_errors = {
+            field: [DOES_NOT_EXIST.format(pk_value=values[field])]
+            for field in RELATED_MODELS
+            if values[field] not in known[field]
+        }
+        if values['session'] in archived:
+            row_errors['session'] = [ARCHIVED_SESSION]
+        if row_errors:
+            errors.append(row_error(mark_data, row_errors))
+        else:
+            values.update(known['student'][values['student']])
+            kept.append((mark_data, values))
+    return kept
+
+
+def _drop_duplicate_keys(rows, errors):
+    """
+    A key may only appear once per sheet, otherwise the upsert is
+    ambiguous. An update moving a mark to another key may not take the
+    key of a stored mark (so two marks swapping keys are both refused, as
+    one at a time they would be), and no other row may use the key it
+    leaves.
+    """
+    moves = [mark_key(values) for _, values in rows if _moves(values)]
+    taken = existing_mark_keys(moves) if moves else set()
+    vacated = {values['original_key'] for _, values in rows if _moves(values) and mark_key(values) not in taken}
+    seen = set()
+    kept = []
+    for mark_data, values in rows:
+        key = mark_key(values)
+        if _moves(values) and key in taken:
+            errors.append(row_error(mark_data, {
+                'non_field_errors': [DUPLICATE_MARK]
+            }))
+            continue
+        if key in seen or key in vacated:
+            errors.append(row_error(mark_data, {
+                'non_field_errors': [DUPLICATE_IN_PAYLOAD]
+            }))
+            continue
+        seen.add(key)
+        kept.append((mark_data, values))
+    return kept
+
+
+def _moves(values):
+    """Whether a row updates a mark onto another unique key"""
+    return values['original_key'] is not None and values['original_key'] != mark_key(values)
+
+
+def _build_mark(values, scale):
+    """
+    Unsaved ExamMark with its grade filled in. total_marks is computed by
+    the database; the Python total is only needed to pick the grade.
+    """
+    total_marks = calculate_total_marks(values.get('cq_marks'), values.get('mct_marks'), values.get('lab_marks'))
+    return ExamMark(
+        exam_type_id=values['exam_type'],
+        exam_date=values['exam_date'],
+        student_id=values['student'],
+        **{field: values[field] for field in STUDENT_COPIES},
+        subject_id=values['subject'],
+        session_id=values['session'],
+        cq_marks=values.get('cq_marks'),
+        mct_marks=values.get('mct_marks'),
+        lab_marks=values.get('lab_marks'),
+        grade=scale.grade_for(total_marks),
+        total_class=values['total_class'],
+        present=values['present'],
+        absent=values['absent'],
+        remarks=values.get('remarks'),
+    )
+
+
+def _write_chunk(chunk):
+    """Write one chunk atomically; returns the number of rows written"""
+    upserts = []
+    moved = []
+    scales = {}
+    for _, values in chunk:
+        scale_key = (values['session'], values['exam_type'])
+        if scale_key not in scales:
+            scales[scale_key] = grading.get_scale(*scale_key)
+        mark = _build_mark(values, scales[scale_key])
+        if _moves(values):
+            # The update changes the unique key itself, so it has to be
+            # matched by primary key rather than by the key it is leaving
+            mark.pk = values['id']
+            moved.append(mark)
+        else:
+            upserts.append(mark)
+
+    touched = set()
+    attendance = set()
+    students = set()
+    tombstones = []
+    for _, values in chunk:
+        touched.add((values['exam_type'], values['subject'], values['session']))
+        attendance.add((values['student'], values['subject'], values['session']))
+        students.add((values['session'], values['exam_type'], values['student']))
+        if values['original_key'] is not None:
+            exam_type, _, student, subject, session = values['original_key']
+            touched.add((exam_type, subject, session))
+            attendance.add((student, subject, session))
+            students.add((session, exam_type, student))
+            # Leaving an exam, student or session: tombstone the old key (see exams.changes)
+            if (exam_type, student, subject, session) != (
+                values['exam_type'], values['student'], values['subject'], values['session']
+            ):
+                tombstones.append(ExamMarkTombstone(
+                    mark_id=values['id'], exam_type_id=exam_type, student_id=student, subject_id=subject,
+                    session_id=session, **values['original_scope'],
+                ))
+
+    with transaction.atomic():
+        if upserts:
+            ExamMark.objects.bulk_create(
+                upserts,
+                update_conflicts=True,
+                unique_fields=UNIQUE_FIELDS,
+                update_fields=UPDATE_FIELDS,
+            )
+        if moved:
+            now = timezone.now()
+            for mark in moved:
+                mark.updated_at = now
+            ExamMark.objects.bulk_update(moved, UNIQUE_FIELDS + UPDATE_FIELDS)
+        if tombstones:
+            ExamMarkTombstone.objects.bulk_create(tombstones)
+        rollups.refresh(touched, attendance)
+        results.refresh(students)
+    return len(upserts) + len(moved)
@@ -0,0 +1,144 @@
+"""
+Change feed of exam marks, for clients that sync incrementally.
+
+A client keeps an opaque cursor holding two watermarks: the
+(updated_at, id) of the last mark it was sent and the (deleted_at, id)
+of the last ExamMarkTombstone. A batch is the marks written after the
+first watermark, read forward on exams_mark_changes_idx, and the ids of
+the marks deleted after the second, read on exams_tombstone_changes_idx.
+A missing cursor starts from the beginning, which is the initial sync.
+
+A mark can also leave a scoped feed without being deleted, when its
+student moves to another class or group. The Student signal leaves a
+tombstone with the old class and group for those marks too. A
+tombstone is only served while its mark is outside the client's scope,
+so unscoped clients never drop a mark that merely moved. A mark that
+moves back in is sent again as a change.
+
+updated_at is set when a row is written, not when its transaction
+commits, so a row can become visible with a timestamp behind rows
+already sent. Only rows older than SETTLE are served, which leaves the
+write transactions (a bulk chunk takes well under a second) time to
+commit before the watermark passes them.
+
+Rows are sent as lists in FIELDS order, with ids rather than names.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import ExamMark, ExamMarkTombstone
+
+
+SETTLE = timedelta(seconds=5)
+
+BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+
+FIELDS = [
+    'id', 'exam_type_id', 'exam_date', 'student_id', 'subject_id', 'session_id', 'student_class_id',
+    'student_group', 'cq_marks', 'mct_marks', 'lab_marks', 'total_marks', 'grade',
+    'total_class', 'present', 'absent', 'remarks', 'updated_at',
+]
+
+# Query parameters narrowing the feed, and the column they filter in
+# both ExamMark and ExamMarkTombstone
+SCOPE_FILTERS = {
+    'exam_type': 'exam_type_id',
+    'subject': 'subject_id',
+    'session': 'session_id',
+    'student': 'student_id',
+    'class_name': 'student_class_id',
+    'group': 'student_group',
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class InvalidScope(ValueError):
+    pass
+
+
+def encode_cursor(marks_position, deleted_position):
+    positions = [
+        [moment.isoformat(), pk] if moment else None
+        for moment, pk in (marks_position, deleted_position)
+    ]
+    return base64.urlsafe_b64encode(json.dumps(positions).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """((updated_at, id), (deleted_at, id)) of a cursor; (None, 0) pairs for the beginning"""
+    if not cursor:
+        return (None, 0), (None, 0)
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(positions, list) or len(positions) != 2:
+            raise ValueError(positions)
+        return tuple(
+            (datetime.fromisoformat(position[0]), int(position[1])) if position else (None, 0)
+            for position in positions
+        )
+    except (binascii.Error, UnicodeError, TypeError, ValueError, IndexError, KeyError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def scope_filters(params):
+    """{column: value} of the SCOPE_FILTERS among params; all but group take ids"""
+    scope = {}
+    for param, column in SCOPE_FILTERS.items():
+        value = params.get(param)
+        if value:
+            if param != 'group' and not value.isdigit():
+                raise InvalidScope(f'{param} must be an id')
+            scope[column] = value
+    return scope
+
+
+def _after(queryset, field, position):
+    """Rows after position in (field, id) order, bounded to rows older than SETTLE"""
+    moment, pk = position
+    queryset = queryset.filter(**{f'{field}__lt': timezone.now() - SETTLE})
+    if moment is not None:
+        # The range bound reads the index; the OR skips the rows of that moment up to pk
+        queryset = queryset.filter(**{f'{field}__gte': moment}).filter(
+            Q(**{f'{field}__gt': moment}) | Q(id__gt=pk)
+        )
+    return queryset.order_by(field, 'id')
+
+
+def read_changes(params, cursor=None, limit=BATCH_SIZE):
+    """
+    One batch of the feed. params are the request's query parameters;
+    SCOPE_FILTERS among them narrow both marks and deletions.
+    """
+    marks_position, deleted_position = decode_cursor(cursor)
+    scope = scope_filters(params)
+
+    marks = list(_after(ExamMark.objects.filter(**scope), 'updated_at', marks_position).values_list(*FIELDS)[:limit + 1])
+    # Moved marks still in scope are not gone for this client
+    in_scope = ExamMark.objects.filter(pk=OuterRef('mark_id'), **scope)
+    deleted = list(
+        _after(ExamMarkTombstone.objects.filter(~Exists(in_scope), **scope), 'deleted_at', deleted_position)
+        .values_list('deleted_at', 'id', 'mark_id')[:limit + 1]
+    )
+    has_more = len(marks) > limit or len(deleted) > limit
+    marks, deleted = marks[:limit], deleted[:limit]
+
+    if marks:
+        marks_position = (marks[-1][-1], marks[-1][0])
+    if deleted:
+        deleted_position = deleted[-1][:2]
+    return {
+        'fields': FIELDS,
+        'changes': marks,
+        'deleted': [mark_id for _, _, mark_id in deleted],
+        'cursor': encode_cursor(marks_position, deleted_position),
+        'has_more': has_more,
+    }
@@ -0,0 +1,117 @@
+"""
+Grading scales, loaded once per process.
+
+The whole GradingScale table is read in a single query and turned into
+one sorted breakpoint array per (session, exam type), so grading a mark
+is a bisect instead of a query. Saving or deleting a GradingScale row
+drops the local copy and bumps a version key in the shared cache, which
+makes the other processes reload on their next request or batch (see
+college_project.versioned).
+"""
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.db.models import Case, Q, Value, When
+
+from college_project.versioned import VersionedLocal
+
+
+VERSION_CACHE_KEY = 'exams:grading_scale_version'
+
+# Used for sessions that have no GradingScale rows: (min_marks, grade)
+DEFAULT_SCALE = (
+    (Decimal('80'), 'A+'),
+    (Decimal('70'), 'A'),
+    (Decimal('60'), 'A-'),
+    (Decimal('50'), 'B'),
+    (Decimal('40'), 'C'),
+    (Decimal('0'), 'F'),
+)
+
+# Grade points for GPA of bands that do not set their own
+GRADE_POINTS = {
+    'A+': Decimal('5.00'),
+    'A': Decimal('4.00'),
+    'A-': Decimal('3.50'),
+    'B': Decimal('3.00'),
+    'C': Decimal('2.00'),
+    'D': Decimal('1.00'),
+    'F': Decimal('0.00'),
+}
+
+
+class Scale:
+    """Grade bands of one scale as parallel arrays sorted by min_marks"""
+
+    def __init__(self, bands):
+        """bands are (min_marks, grade) or (min_marks, grade, grade_point) tuples"""
+        bands = sorted(bands, key=lambda band: band[0])
+        self.breakpoints = [band[0] for band in bands]
+        self.grades = [band[1] for band in bands]
+        self.points = [
+            band[2] if len(band) > 2 and band[2] is not None else GRADE_POINTS.get(band[1], Decimal('0'))
+            for band in bands
+        ]
+
+    def band_for(self, total_marks):
+        """Index of the band a total falls in; None for no total (or a zero total)"""
+        if not total_marks:
+            return None
+        # Totals below the lowest band still get the lowest grade
+        return max(bisect_right(self.breakpoints, total_marks) - 1, 0)
+
+    def grade_for(self, total_marks):
+        """Letter grade for a total; no total (or a zero total) has no grade"""
+        index = self.band_for(total_marks)
+        return None if index is None else self.grades[index]
+
+    def grade_for_point(self, grade_point):
+        """Letter grade of a GPA: the best grade whose point it reaches"""
+        reached = [(point, grade) for point, grade in zip(self.points, self.grades) if point <= grade_point]
+        return max(reached)[1] if reached else self.grades[0]
+
+    def case_expression(self, field='total_marks'):
+        """SQL CASE computing the same grade as grade_for() from a column"""
+        whens = [When(Q(**{f'{field}__isnull': True}) | Q(**{field: 0}), then=Value(None))]
+        for min_marks, grade in zip(reversed(self.breakpoints[1:]), reversed(self.grades[1:])):
+            whens.append(When(**{f'{field}__gte': min_marks}, then=Value(grade)))
+        return Case(*whens, default=Value(self.grades[0]))
+
+
+DEFAULT = Scale(DEFAULT_SCALE)
+
+
+def _load():
+    """Read every grading band in one query"""
+    from .models import GradingScale
+
+    bands = {}
+    for session_id, exam_type_id, grade, min_marks, grade_point in GradingScale.objects.values_list(
+        'session_id', 'exam_type_id', 'grade', 'min_marks', 'grade_point'
+    ):
+        bands.setdefault((session_id, exam_type_id), []).append((min_marks, grade, grade_point))
+    return {key: Scale(value) for key, value in bands.items()}
+
+
+_scales = VersionedLocal(VERSION_CACHE_KEY, _load)
+
+
+def get_scale(session_id, exam_type_id=None):
+    """Scale for an exam: exam type specific, else session wide, else the default"""
+    scales = _scales.get()
+    return scales.get((session_id, exam_type_id)) or scales.get((session_id, None)) or DEFAULT
+
+
+def grade_for(total_marks, session_id=None, exam_type_id=None):
+    """Letter grade for a total under the scale of the given session/exam type"""
+    return get_scale(session_id, exam_type_id).grade_for(total_marks)
+
+
+def recheck():
+    """Have the next lookup see scales changed by other processes (batches outside requests)"""
+    _scales.recheck()
+
+
+def invalidate():
+    """Forget the loaded scales here and in every process sharing the cache"""
+    _scales.invalidate()
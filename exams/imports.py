@@ -0,0 +1,237 @@
+"""
+Background import of uploaded mark sheets.
+
+The upload endpoint saves the file as a MarkImport and answers at once;
+the sheet is then read by run_import() in a worker process. Rows are
+taken in chunks of bulk.CHUNK_SIZE: the roll numbers and subject codes
+of a chunk are resolved with one IN query each, and the chunk is written
+by bulk.bulk_upsert_marks() as one INSERT ... ON CONFLICT DO UPDATE.
+The job's counters and the errors of its rows are saved after every
+chunk, so the job can be polled while it runs.
+
+There is no broker: the MarkImport table is the queue. Saved jobs are
+handed to a process pool started on first use (MARK_IMPORT_WORKERS
+processes per web process; spawned, so each worker sets Django up with
+its own database connections). With MARK_IMPORT_WORKERS = 0 jobs stay
+pending until `manage.py process_mark_imports` runs them.
+"""
+import csv
+import io
+import itertools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from academics.models import Subject
+from students.models import Student
+from .bulk import CHUNK_SIZE, bulk_upsert_marks
+from .models import MarkImport, MarkImportError
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+
+# Columns identifying the mark of a row; the exam and session come from the job
+KEY_COLUMNS = ('roll_number', 'subject_code')
+
+# Optional columns passed on to the mark rows as they are
+MARK_COLUMNS = (
+    'exam_date', 'cq_marks', 'mct_marks', 'lab_marks', 'total_class', 'present', 'absent', 'remarks',
+)
+
+_pool = None
+
+
+class SheetError(Exception):
+    """The uploaded file cannot be read as a mark sheet"""
+
+
+def enqueue(job):
+    """Hand a saved job to the worker pool once the current transaction commits"""
+    if workers() > 0:
+        transaction.on_commit(lambda: _submit(job.pk))
+
+
+def workers():
+    return getattr(settings, 'MARK_IMPORT_WORKERS', DEFAULT_WORKERS)
+
+
+def _submit(job_id):
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=workers(),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+    try:
+        _pool.submit(run_import, job_id)
+    except BrokenProcessPool:
+        # A worker died (killed, out of memory); start a fresh pool
+        _pool = None
+        _submit(job_id)
+
+
+def run_import(job_id):
+    """
+    Claim and process one pending job. This is what the worker processes
+    run; two workers handed the same job cannot both claim it.
+    """
+    close_old_connections()
+    try:
+        claimed = MarkImport.objects.filter(pk=job_id, status=MarkImport.PENDING).update(
+            status=MarkImport.RUNNING, started_at=timezone.now()
+        )
+        if not claimed:
+            return
+        job = MarkImport.objects.get(pk=job_id)
+        try:
+            process_import(job)
+        except SheetError as exc:
+            _finish(job, MarkImport.FAILED, str(exc))
+        except Exception as exc:
+            logger.exception("Mark import %s failed", job_id)
+            _finish(job, MarkImport.FAILED, f"{type(exc).__name__}: {exc}")
+        else:
+            _finish(job, MarkImport.DONE)
+    finally:
+        close_old_connections()
+
+
+def _finish(job, status, message=''):
+    MarkImport.objects.filter(pk=job.pk).update(status=status, message=message, finished_at=timezone.now())
+
+
+def process_import(job):
+    """Import the job's sheet chunk by chunk, saving progress after each one"""
+    subjects = {}
+    with job.file.open('rb') as stream:
+        total, records = read_sheet(stream, job.file.name)
+        MarkImport.objects.filter(pk=job.pk).update(total_rows=total)
+        for chunk in iter(lambda: list(itertools.islice(records, CHUNK_SIZE)), []):
+            marks, errors = _resolve_chunk(job, chunk, subjects)
+            saved, upsert_errors = bulk_upsert_marks(marks) if marks else (0, [])
+            errors += [
+                MarkImportError(mark_import=job, row=error['row'], field=field, message=str(message))
+                for error in upsert_errors
+                for field, messages in error['errors'].items()
+                for message in messages
+            ]
+            with transaction.atomic():
+                MarkImportError.objects.bulk_create(errors)
+                MarkImport.objects.filter(pk=job.pk).update(
+                    processed_rows=F('processed_rows') + len(chunk),
+                    saved_rows=F('saved_rows') + saved,
+                    failed_rows=F('failed_rows') + len({error.row for error in errors}),
+                )
+
+
+def read_sheet(stream, name):
+    """
+    (number of data rows, iterator of (row number, {column: cell})) of a
+    CSV or XLSX sheet. Column names are the header cells in lower case
+    with spaces as underscores.
+    """
+    if name.lower().endswith('.xlsx'):
+        total, rows = _xlsx_rows(stream)
+    else:
+        total, rows = _csv_rows(stream)
+
+    header = [str(cell or '').strip().lower().replace(' ', '_') for cell in next(rows, ())]
+    missing = [column for column in KEY_COLUMNS if column not in header]
+    if missing:
+        raise SheetError(f"Missing column(s): {', '.join(missing)}")
+
+    records = ((number, dict(zip(header, cells))) for number, cells in enumerate(rows, start=2))
+    return total, records
+
+
+def _csv_rows(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        total = max(sum(1 for _ in csv.reader(text)) - 1, 0)
+    except UnicodeDecodeError:
+        raise SheetError("CSV files must be UTF-8 encoded")
+    text.seek(0)
+    return total, csv.reader(text)
+
+
+def _xlsx_rows(stream):
+    try:
+        import openpyxl
+    except ImportError:
+        raise SheetError("Reading .xlsx files requires openpyxl")
+    try:
+        sheet = openpyxl.load_workbook(stream, read_only=True, data_only=True).active
+    except Exception as exc:
+        raise SheetError(f"Not a readable .xlsx file: {exc}")
+    return max((sheet.max_row or 1) - 1, 0), sheet.iter_rows(values_only=True)
+
+
+def _code(value):
+    """Roll number / subject code cell as text (spreadsheets turn 1001 into 1001.0)"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() if value is not None else ''
+
+
+def _cell(value):
+    """Cell value as the mark serializer takes it; blank cells are None"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return value.strip() or None
+    return value
+
+
+def _resolve_chunk(job, chunk, subjects):
+    """
+    Mark rows (ids resolved, numbered by sheet row) and the errors of the
+    rows whose student or subject is unknown. subjects caches code -> id
+    across chunks.
+    """
+    rolls = {_code(values.get('roll_number')) for _, values in chunk}
+    students = dict(Student.objects.filter(roll_number__in=rolls).values_list('roll_number', 'pk'))
+    codes = {_code(values.get('subject_code')) for _, values in chunk} - subjects.keys()
+    if codes:
+        subjects.update(Subject.objects.filter(code__in=codes).values_list('code', 'pk'))
+
+    marks = []
+    errors = []
+    for row, values in chunk:
+        cells = {column: _cell(value) for column, value in values.items()}
+        if not any(value is not None for value in cells.values()):
+            continue
+        roll = _code(values.get('roll_number'))
+        code = _code(values.get('subject_code'))
+        if roll not in students:
+            errors.append(MarkImportError(
+                mark_import=job, row=row, field='roll_number', message=f"No student with roll number '{roll}'"
+            ))
+        if code not in subjects:
+            errors.append(MarkImportError(
+                mark_import=job, row=row, field='subject_code', message=f"No subject with code '{code}'"
+            ))
+        if roll not in students or code not in subjects:
+            continue
+
+        mark = {
+            'row': row,
+            'exam_type': job.exam_type_id,
+            'exam_date': job.exam_date,
+            'student': students[roll],
+            'subject': subjects[code],
+            'session': job.session_id,
+        }
+        mark.update({column: cells[column] for column in MARK_COLUMNS if cells.get(column) is not None})
+        marks.append(mark)
+    return marks, errors
@@ -0,0 +1,102 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from academics.models import Session
+from college_project.commands import lookup
+from exams import archive
+from exams.models import ArchivedSession, ExamMark, MarkImport
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the marks of a closed session out of ExamMark into a columnar file under MARK_ARCHIVE_ROOT "
+        "(--restore moves them back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('session', help="Session (id or name)")
+        parser.add_argument('--restore', action='store_true', help="Put the archived marks back into ExamMark")
+
+    def handle(self, *args, **options):
+        session = lookup(Session, options['session'])
+        started = time.monotonic()
+        if options['restore']:
+            restored = self.restore(session)
+            self.stdout.write(self.style.SUCCESS(
+                f"Restored {restored} marks of {session.name} in {time.monotonic() - started:.2f}s"
+            ))
+            return
+
+        record = self.archive(session)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {record.mark_count} marks of {session.name} to {record.file} "
+            f"({record.size / 1024:.1f} KiB) in {time.monotonic() - started:.2f}s"
+        ))
+
+    def archive(self, session):
+        if MarkImport.objects.filter(session=session, status__in=[MarkImport.PENDING, MarkImport.RUNNING]).exists():
+            raise CommandError(f"{session.name} has mark imports waiting or running")
+        marks = ExamMark.objects.filter(session=session)
+        if not marks.exists():
+            raise CommandError(f"{session.name} has no marks to archive")
+
+        # Committed first: from here on the session refuses mark writes
+        record, created = ArchivedSession.objects.get_or_create(session=session)
+        if not created:
+            raise CommandError(f"{session.name} is already archived")
+
+        name = f'session-{session.pk}.cmarks'
+        path = archive.archive_path(name)
+        try:
+            with transaction.atomic():
+                rows = list(marks.select_for_update().values(*archive.COLUMNS))
+                size = archive.write_archive(path, rows)
+                if len(archive.MarkArchive(path)) != len(rows):
+                    raise CommandError(f"{path} does not read back")
+                # A raw DELETE: no post_delete handlers, so the rollups,
+                # results and change feed keep the archived marks
+                deleted = marks.order_by()._raw_delete(marks.db)
+                if deleted != len(rows):
+                    raise CommandError(f"Marks of {session.name} were written while archiving; run again")
+                ArchivedSession.objects.filter(pk=record.pk).update(
+                    file=name, mark_count=len(rows), size=size, archived_at=timezone.now()
+                )
+        except BaseException:
+            record.delete()
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        record.refresh_from_db()
+        return record
+
+    def restore(self, session):
+        try:
+            record = ArchivedSession.objects.get(session=session)
+        except ArchivedSession.DoesNotExist:
+            raise CommandError(f"{session.name} is not archived")
+        if not record.file:
+            raise CommandError(f"{session.name} is still being archived")
+
+        path = archive.archive_path(record.file)
+        marks = archive.MarkArchive(path)
+        with transaction.atomic():
+            # bulk_create sends no post_save, the rollups are still current.
+            # It stamps created_at/updated_at anew; bulk_update puts the
+            # archived ones back.
+            for start in range(0, len(marks), archive.CHUNK_SIZE):
+                rows = [
+                    ExamMark(**{name: value for name, value in marks.record(position).items() if name != 'total_marks'})
+                    for position in range(start, min(start + archive.CHUNK_SIZE, len(marks)))
+                ]
+                stamps = [(row.created_at, row.updated_at) for row in rows]
+                ExamMark.objects.bulk_create(rows)
+                for row, (created_at, updated_at) in zip(rows, stamps):
+                    row.created_at, row.updated_at = created_at, updated_at
+                ExamMark.objects.bulk_update(rows, ['created_at', 'updated_at'])
+            record.delete()
+        os.remove(path)
+        return len(marks)
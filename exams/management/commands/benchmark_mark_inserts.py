@@ -0,0 +1,102 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from academics.models import Class, Session, Subject
+from exams import grading
+from exams.models import ExamMark, ExamType, calculate_total_marks
+from students.models import Student
+
+
+SUBJECTS = 10
+
+
+def build_marks(rows):
+    """Throwaway session, students and subjects, and the field values of each mark"""
+    session = Session.objects.create(name='benchmark-session')
+    class_obj = Class.objects.create(name='Benchmark', code='benchmark-class')
+    exam_type = ExamType.objects.create(name='benchmark-exam')
+    subjects = Subject.objects.bulk_create(
+        [Subject(name=f'Benchmark {i}', code=f'benchmark-{i}') for i in range(SUBJECTS)]
+    )
+    students = Student.objects.bulk_create(
+        [Student(name=f'Student {i}', roll_number=f'benchmark-{i}', class_name=class_obj, session=session,
+                 group=Student.GROUP_CHOICES[i % len(Student.GROUP_CHOICES)][0])
+         for i in range(rows // SUBJECTS + 1)]
+    )
+    marks = []
+    for i in range(rows):
+        marks.append({
+            'exam_type_id': exam_type.pk,
+            'exam_date': session.created_at.date(),
+            'student': students[i // SUBJECTS],
+            'student_roll': students[i // SUBJECTS].roll_number,
+            'student_group': students[i // SUBJECTS].group,
+            'student_class_id': class_obj.pk,
+            'subject_id': subjects[i % SUBJECTS].pk,
+            'session_id': session.pk,
+            'cq_marks': Decimal(i % 50),
+            'mct_marks': Decimal(i % 25),
+            'lab_marks': Decimal(i % 25) if i % 3 else None,
+            'total_class': 10,
+            'present': i % 11,
+            'absent': 10 - i % 11,
+        })
+    return marks
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare inserting marks one save() at a time (needed while total_marks was "
+        "computed in Python) with bulk_create against the generated total_marks column. "
+        "Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help="Marks to insert per run (default: 100000)")
+        parser.add_argument('--batch-size', type=int, default=1000, help="bulk_create batch size (default: 1000)")
+        parser.add_argument('--skip-save', action='store_true', help="Only time the bulk_create run")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        if rows < SUBJECTS:
+            raise CommandError(f"--rows must be at least {SUBJECTS}")
+
+        with transaction.atomic():
+            marks = build_marks(rows)
+            results = []
+
+            if not options['skip_save']:
+                savepoint = transaction.savepoint()
+                started = time.perf_counter()
+                for values in marks:
+                    ExamMark(**values).save()
+                results.append(('save() per row', time.perf_counter() - started))
+                transaction.savepoint_rollback(savepoint)
+
+            started = time.perf_counter()
+            scale = grading.get_scale(marks[0]['session_id'], marks[0]['exam_type_id'])
+            ExamMark.objects.bulk_create(
+                [
+                    ExamMark(**values, grade=scale.grade_for(
+                        calculate_total_marks(values['cq_marks'], values['mct_marks'], values['lab_marks'])
+                    ))
+                    for values in marks
+                ],
+                batch_size=options['batch_size'],
+            )
+            results.append(('bulk_create, generated total', time.perf_counter() - started))
+
+            stored = ExamMark.objects.filter(session_id=marks[0]['session_id'], total_marks__isnull=False).count()
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{rows} rows")
+        for label, elapsed in results:
+            self.stdout.write(f"  {label:<30} {elapsed:8.2f}s  {rows / elapsed:10.0f} rows/s")
+        if len(results) == 2:
+            self.stdout.write(f"  speed-up: {results[0][1] / results[1][1]:.1f}x")
+        if stored != rows:
+            raise CommandError(f"Expected {rows} totals computed by the database, found {stored}")
+        self.stdout.write(self.style.SUCCESS("Benchmark finished (all data rolled back)"))
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from exams.models import ExamMark
+from exams.serializers import ExamMarkListSerializer
+from .benchmark_mark_inserts import build_marks
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare serializing the marks list one model instance at a time with the "
+        "values() fast path of ExamMarkListSerializer (their JSON is compared by "
+        "ExamMarkListRowsTests). Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help="Marks to serialize (default: 20000)")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+
+        with transaction.atomic():
+            marks = build_marks(rows)
+            ExamMark.objects.bulk_create([ExamMark(**values) for values in marks], batch_size=1000)
+            queryset = ExamMark.objects.filter(session_id=marks[0]['session_id']).order_by('-exam_date', 'student_roll', 'id')
+
+            # How the list was served before: prefetched students/subjects,
+            # exam types loaded lazily, one instance per row
+            before = queryset.prefetch_related('student', 'subject', 'session')
+            joined = queryset.select_related('exam_type', 'student', 'subject', 'session')
+            results = [
+                ('model instances', *self._time(lambda: ExamMarkListSerializer(before, many=True).data)),
+                ('select_related', *self._time(lambda: ExamMarkListSerializer(joined, many=True).data)),
+                ('values() fast path', *self._time(
+                    lambda: list(ExamMarkListSerializer.rows(ExamMarkListSerializer.values_queryset(queryset)))
+                )),
+            ]
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{rows} rows")
+        for label, elapsed, queries in results:
+            self.stdout.write(
+                f"  {label:<20} {elapsed:8.2f}s  {elapsed / rows * 1e6:8.1f} us/row  {queries:6d} queries"
+            )
+        self.stdout.write(f"  speed-up: {results[0][1] / results[-1][1]:.1f}x")
+        self.stdout.write(self.style.SUCCESS("Benchmark finished (all data rolled back)"))
+
+    def _time(self, serialize):
+        """Seconds and queries taken by serialize()"""
+        queries = 0
+
+        def count_query(execute, *args):
+            nonlocal queries
+            queries += 1
+            return execute(*args)
+
+        with connection.execute_wrapper(count_query):
+            started = time.perf_counter()
+            serialize()
+            elapsed = time.perf_counter() - started
+        return elapsed, queries
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from academics.models import Session
+from college_project.commands import lookup
+from exams.models import ExamMark, ExamType
+from exams.results import compute_results
+
+
+class Command(BaseCommand):
+    help = "Compute the GPA results of every student, one whole session/exam type at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session', help="Only this session (id or name)")
+        parser.add_argument('--exam-type', help="Only this exam type (id or name)")
+
+    def handle(self, *args, **options):
+        marks = ExamMark.objects.all()
+        if options['session']:
+            marks = marks.filter(session=lookup(Session, options['session']))
+        if options['exam_type']:
+            marks = marks.filter(exam_type=lookup(ExamType, options['exam_type']))
+
+        started = time.monotonic()
+        total = 0
+        for session_id, exam_type_id in marks.order_by().values_list('session_id', 'exam_type_id').distinct():
+            exam_started = time.monotonic()
+            computed = compute_results(session_id, exam_type_id)
+            total += computed
+            self.stdout.write(
+                f"Session {session_id} / exam type {exam_type_id}: {computed} results "
+                f"in {time.monotonic() - exam_started:.2f}s"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Computed {total} results in {time.monotonic() - started:.2f}s"))
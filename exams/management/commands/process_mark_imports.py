@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from exams.imports import run_import
+from exams.models import MarkImport
+
+
+class Command(BaseCommand):
+    help = "Import the uploaded mark sheets that are waiting (MARK_IMPORT_WORKERS = 0, or after a restart)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requeue', action='store_true',
+            help="First put imports left running by a stopped worker back in the queue",
+        )
+        parser.add_argument(
+            '--watch', type=float, metavar='SECONDS',
+            help="Keep running, looking for new imports every SECONDS",
+        )
+
+    def handle(self, *args, **options):
+        if options['requeue']:
+            requeued = MarkImport.objects.filter(status=MarkImport.RUNNING).update(
+                status=MarkImport.PENDING, started_at=None
+            )
+            self.stdout.write(f"Requeued {requeued} imports")
+
+        while True:
+            self.process_pending()
+            if not options['watch']:
+                break
+            time.sleep(options['watch'])
+
+    def process_pending(self):
+        pending = MarkImport.objects.filter(status=MarkImport.PENDING).order_by('created_at')
+        for job_id in pending.values_list('pk', flat=True):
+            run_import(job_id)
+            job = MarkImport.objects.get(pk=job_id)
+            self.stdout.write(
+                f"Import {job.pk} ({job.file.name}): {job.get_status_display()}, "
+                f"{job.saved_rows} saved, {job.failed_rows} failed {job.message}".rstrip()
+            )
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min, Value
+from django.db.models.functions import Coalesce, Now
+from django.db.models.lookups import Exact
+
+from academics.models import Session
+from college_project.commands import lookup
+from exams import grading, results, rollups
+from exams.models import ExamMark, ExamType
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute ExamMark.grade from the current grading scales with chunked set-based UPDATEs, "
+        "refreshing the summaries and student results they change"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session', help="Only regrade this session (id or name)")
+        parser.add_argument('--exam-type', help="Only regrade this exam type (id or name)")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Primary-key range covered by one UPDATE (default: 5000)")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        marks = ExamMark.objects.all()
+        if options['session']:
+            marks = marks.filter(session=lookup(Session, options['session']))
+        if options['exam_type']:
+            marks = marks.filter(exam_type=lookup(ExamType, options['exam_type']))
+
+        grading.invalidate()
+        exams = marks.order_by().values_list('session_id', 'exam_type_id').distinct()
+        started = time.monotonic()
+        scanned = updated = 0
+
+        for session_id, exam_type_id in exams:
+            scale = grading.get_scale(session_id, exam_type_id)
+            new_grade = scale.case_expression()
+            # NULL-safe "grade differs": no grade and no new grade compare equal
+            unchanged = Exact(Coalesce('grade', Value('')), Coalesce(new_grade, Value('')))
+            exam_marks = marks.filter(session_id=session_id, exam_type_id=exam_type_id)
+            bounds = exam_marks.aggregate(low=Min('pk'), high=Max('pk'))
+            self.stdout.write(f"Session {session_id} / exam type {exam_type_id}: grades {' '.join(reversed(scale.grades))}")
+
+            for low in range(bounds['low'], bounds['high'] + 1, chunk_size):
+                window = exam_marks.filter(pk__gte=low, pk__lt=low + chunk_size)
+                with transaction.atomic():
+                    scanned += window.count()
+                    # Only rows whose grade actually changes are written
+                    changed = window.exclude(unchanged)
+                    keys = set(changed.order_by().values_list('subject_id', 'student_id').distinct())
+                    updated += changed.update(grade=new_grade, updated_at=Now())
+                    rollups.refresh({(exam_type_id, subject_id, session_id) for subject_id, _ in keys})
+                    results.refresh({(session_id, exam_type_id, student_id) for _, student_id in keys})
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"  {scanned} rows scanned, {updated} regraded ({scanned / elapsed if elapsed else 0:.0f} rows/s)"
+                )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Regraded {updated} of {scanned} marks in {elapsed:.2f}s ({scanned / elapsed if elapsed else 0:.0f} rows/s)"
+        ))
@@ -73,10 +73,6 @@ class Migration(migrations.Migration):
         migrations.AlterModelOptions(
             name='exammark',
             options={
-                'indexes': [
-                    models.Index(fields=['student', 'session']),
-                    models.Index(fields=['exam_type', 'subject', 'session']),
-                ],
                 'ordering': ['-exam_date', 'student__roll_number', 'subject__name'],
                 'verbose_name': 'Exam Mark',
                 'verbose_name_plural': 'Exam Marks',
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:35
+#
+# Brings the ExamMark table in line with the model after 0004: drops the
+# legacy exam_name column and creates the two indexes that 0004 only
+# recorded as model options. Marks still identified only by the legacy
+# exam_name choice are linked to the matching ExamType first.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# exam_name choices of 0002 and the ExamType names add_exam_types.py creates
+LEGACY_EXAM_NAMES = {
+    'ct_exam': 'CT-Exam',
+    'midterm': 'Mid-Term',
+    'half_yearly': 'Half Yearly',
+    'test': 'Test',
+    'pretest': 'Pre-test',
+    'year_final': 'Year Final',
+}
+
+
+def link_legacy_exam_types(apps, schema_editor):
+    ExamMark = apps.get_model('exams', 'ExamMark')
+    ExamType = apps.get_model('exams', 'ExamType')
+    for exam_name in ExamMark.objects.filter(exam_type__isnull=True).values_list('exam_name', flat=True).distinct():
+        exam_type, _ = ExamType.objects.get_or_create(name=LEGACY_EXAM_NAMES.get(exam_name, exam_name))
+        ExamMark.objects.filter(exam_type__isnull=True, exam_name=exam_name).update(exam_type=exam_type)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('exams', '0004_consolidate_exam_models'),
+        ('students', '0005_student_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_legacy_exam_types, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='exammark',
+            name='exam_name',
+        ),
+        migrations.AlterField(
+            model_name='exammark',
+            name='exam_type',
+            field=models.ForeignKey(help_text='Exam type (CT-Exam, Mid-Term, etc.)', on_delete=django.db.models.deletion.CASCADE, related_name='exam_marks', to='exams.examtype'),
+        ),
+        migrations.AlterField(
+            model_name='exammark',
+            name='total_marks',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Total marks obtained (auto-calculated)', max_digits=5, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['student', 'session'], name='exams_examm_student_b19776_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['exam_type', 'subject', 'session'], name='exams_examm_exam_ty_0357a2_idx'),
+        ),
+    ]
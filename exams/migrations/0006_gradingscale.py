@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('exams', '0005_repair_exammark_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradingScale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grade', models.CharField(help_text='Letter grade (e.g., A+, A, A-, B, C, F)', max_length=5)),
+                ('min_marks', models.DecimalField(decimal_places=2, help_text='Lowest total marks that earns this grade', max_digits=5)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exam_type', models.ForeignKey(blank=True, help_text='Leave empty to apply to every exam type of the session', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='grading_scales', to='exams.examtype')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grading_scales', to='academics.session')),
+            ],
+            options={
+                'verbose_name': 'Grading Scale',
+                'verbose_name_plural': 'Grading Scales',
+                'ordering': ['session', 'exam_type', '-min_marks'],
+                'unique_together': {('session', 'exam_type', 'grade')},
+            },
+        ),
+    ]
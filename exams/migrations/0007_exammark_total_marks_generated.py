@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:37
+#
+# total_marks becomes a stored generated column. A column cannot be altered
+# into a generated one, so it is dropped and re-added; the database then
+# computes the total of every existing row from cq/mct/lab marks.
+# Stored grades are unaffected (run `manage.py regrade_marks` to rebuild them).
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class AddStoredGeneratedField(migrations.AddField):
+    """
+    SQLite refuses ALTER TABLE ... ADD COLUMN for a STORED generated column
+    once the table has rows, so there the table is rebuilt instead.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'sqlite':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        from_model = from_state.apps.get_model(app_label, self.model_name)
+        to_model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, to_model):
+            schema_editor._remake_table(from_model, create_field=to_model._meta.get_field(self.name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0006_gradingscale'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='exammark',
+            name='total_marks',
+        ),
+        AddStoredGeneratedField(
+            model_name='exammark',
+            name='total_marks',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(cq_marks__isnull=True, lab_marks__isnull=True, mct_marks__isnull=True, then=None), default=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('cq_marks', models.Value(Decimal('0'))), '+', django.db.models.functions.comparison.Coalesce('mct_marks', models.Value(Decimal('0')))), '+', django.db.models.functions.comparison.Coalesce('lab_marks', models.Value(Decimal('0')))), output_field=models.DecimalField(decimal_places=2, max_digits=5)), help_text='Total marks obtained (auto-calculated)', null=True, output_field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Cast
+
+
+def build_summaries(apps, schema_editor):
+    """Summaries for the marks that already exist (later writes keep them current)"""
+    ExamMark = apps.get_model('exams', 'ExamMark')
+    ExamSummary = apps.get_model('exams', 'ExamSummary')
+    has_classes = models.Q(total_class__gt=0)
+    rows = ExamMark.objects.order_by().values('exam_type_id', 'subject_id', 'session_id', 'grade').annotate(
+        marks=models.Count('id'),
+        graded=models.Count('total_marks'),
+        marks_sum=models.Sum('total_marks'),
+        attendance=models.Count('id', filter=has_classes),
+        attendance_percentage_sum=models.Sum(models.Case(
+            models.When(has_classes, then=Cast('present', models.FloatField()) * 100 / models.F('total_class')),
+            output_field=models.FloatField(),
+        )),
+        present_sum=models.Sum('present'),
+        absent_sum=models.Sum('absent'),
+        total_class_sum=models.Sum('total_class'),
+    )
+    summaries = {}
+    for row in rows:
+        key = (row['exam_type_id'], row['subject_id'], row['session_id'])
+        summary = summaries.setdefault(key, ExamSummary(
+            exam_type_id=key[0], subject_id=key[1], session_id=key[2], marks_sum=0, grade_counts={},
+        ))
+        summary.mark_count += row['marks']
+        summary.graded_count += row['graded']
+        summary.marks_sum += row['marks_sum'] or 0
+        summary.attendance_count += row['attendance']
+        summary.attendance_percentage_sum += row['attendance_percentage_sum'] or 0
+        summary.present_sum += row['present_sum']
+        summary.absent_sum += row['absent_sum']
+        summary.total_class_sum += row['total_class_sum']
+        if row['grade'] is None:
+            summary.ungraded_count += row['marks']
+        else:
+            summary.grade_counts[row['grade']] = row['marks']
+    ExamSummary.objects.bulk_create(summaries.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('exams', '0007_exammark_total_marks_generated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mark_count', models.PositiveIntegerField(default=0, help_text='Number of marks')),
+                ('graded_count', models.PositiveIntegerField(default=0, help_text='Marks with a total')),
+                ('marks_sum', models.DecimalField(decimal_places=2, default=0, help_text='Sum of total marks', max_digits=14)),
+                ('attendance_count', models.PositiveIntegerField(default=0, help_text='Marks with classes held')),
+                ('attendance_percentage_sum', models.FloatField(default=0, help_text='Sum of present * 100 / total_class')),
+                ('present_sum', models.PositiveBigIntegerField(default=0)),
+                ('absent_sum', models.PositiveBigIntegerField(default=0)),
+                ('total_class_sum', models.PositiveBigIntegerField(default=0)),
+                ('grade_counts', models.JSONField(default=dict, help_text='Number of marks per letter grade')),
+                ('ungraded_count', models.PositiveIntegerField(default=0, help_text='Marks without a grade')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exam_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='exams.examtype')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_summaries', to='academics.session')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_summaries', to='academics.subject')),
+            ],
+            options={
+                'verbose_name': 'Exam Summary',
+                'verbose_name_plural': 'Exam Summaries',
+                'unique_together': {('exam_type', 'subject', 'session')},
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:49
+
+from django.db import migrations, models
+
+
+def copy_roll_numbers(apps, schema_editor):
+    """Fill student_roll of the existing marks in one UPDATE"""
+    ExamMark = apps.get_model('exams', 'ExamMark')
+    Student = apps.get_model('students', 'Student')
+    ExamMark.objects.update(student_roll=models.Subquery(
+        Student.objects.filter(pk=models.OuterRef('student_id')).values('roll_number')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('exams', '0008_examsummary'),
+        ('students', '0005_student_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exammark',
+            name='student_roll',
+            field=models.CharField(blank=True, default='', editable=False, help_text="Copy of the student's roll number, used to order and page through marks", max_length=50),
+        ),
+        migrations.RunPython(copy_roll_numbers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['-exam_date', 'student_roll', 'id'], name='exams_mark_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['session', '-exam_date', 'student_roll', 'id'], name='exams_mark_session_list_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('exams', '0009_exammark_student_roll'),
+        ('students', '0005_student_user'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='exammark',
+            name='exams_examm_student_b19776_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='exammark',
+            name='exams_examm_exam_ty_0357a2_idx',
+        ),
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['subject', '-exam_date', 'student_roll', 'id'], name='exams_mark_subject_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['student', '-exam_date', 'student_roll', 'id'], name='exams_mark_student_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['exam_type', '-exam_date', 'student_roll', 'id'], name='exams_mark_exam_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['exam_type', 'subject', 'session', '-exam_date', 'student_roll', 'id'], name='exams_mark_sheet_list_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_group_and_class(apps, schema_editor):
+    """Fill student_group and student_class of the existing marks in one UPDATE"""
+    ExamMark = apps.get_model('exams', 'ExamMark')
+    Student = apps.get_model('students', 'Student')
+    student = Student.objects.filter(pk=models.OuterRef('student_id'))
+    ExamMark.objects.update(
+        student_group=models.Subquery(student.values('group')[:1]),
+        student_class=models.Subquery(student.values('class_name_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('exams', '0010_exammark_list_indexes'),
+        ('students', '0005_student_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exammark',
+            name='student_class',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, help_text="Copy of the student's class", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='exam_marks', to='academics.class'),
+        ),
+        migrations.AddField(
+            model_name='exammark',
+            name='student_group',
+            field=models.CharField(blank=True, choices=[('science', 'Science'), ('business', 'Business Studies'), ('humanities', 'Humanities')], editable=False, help_text="Copy of the student's group", max_length=20, null=True),
+        ),
+        migrations.RunPython(copy_group_and_class, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['student_group', '-exam_date', 'student_roll', 'id'], name='exams_mark_group_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['student_class', '-exam_date', 'student_roll', 'id'], name='exams_mark_class_list_idx'),
+        ),
+    ]
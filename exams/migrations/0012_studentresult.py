@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('exams', '0011_exammark_student_group_class'),
+        ('students', '0005_student_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gradingscale',
+            name='grade_point',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Grade point for GPA; empty uses the standard point of the letter grade', max_digits=3, null=True),
+        ),
+        migrations.CreateModel(
+            name='StudentResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gpa', models.DecimalField(decimal_places=2, help_text='GPA including the optional subject bonus', max_digits=3)),
+                ('gpa_without_optional', models.DecimalField(decimal_places=2, help_text='GPA of the compulsory and group subjects alone', max_digits=3)),
+                ('grade', models.CharField(help_text='Letter grade of the GPA', max_length=5)),
+                ('total_marks', models.DecimalField(decimal_places=2, help_text='Sum of the subject totals', max_digits=7)),
+                ('subject_count', models.PositiveSmallIntegerField(default=0)),
+                ('failed_subjects', models.PositiveSmallIntegerField(default=0, help_text='Compulsory and group subjects without a pass')),
+                ('subjects', models.JSONField(default=list, help_text='Total marks, grade and grade point per subject')),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('exam_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_results', to='exams.examtype')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_results', to='academics.session')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='students.student')),
+            ],
+            options={
+                'verbose_name': 'Student Result',
+                'verbose_name_plural': 'Student Results',
+                'ordering': ['session', 'exam_type', '-gpa', '-total_marks'],
+                'indexes': [models.Index(fields=['session', 'exam_type', '-gpa', '-total_marks'], name='exams_result_gpa_idx'), models.Index(fields=['student', 'session'], name='exams_result_student_idx')],
+                'unique_together': {('session', 'exam_type', 'student')},
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import DenseRank
+
+
+def copy_partitions_and_rank(apps, schema_editor):
+    """Fill the class/group copies of the existing results and rank every computed exam"""
+    StudentResult = apps.get_model('exams', 'StudentResult')
+    Student = apps.get_model('students', 'Student')
+    student = Student.objects.filter(pk=models.OuterRef('student_id'))
+    StudentResult.objects.update(
+        student_group=models.Subquery(student.values('group')[:1]),
+        student_class=models.Subquery(student.values('class_name_id')[:1]),
+    )
+
+    order = [models.F('gpa').desc(), models.F('total_marks').desc()]
+    exams = StudentResult.objects.order_by().values_list('session_id', 'exam_type_id').distinct()
+    for session_id, exam_type_id in list(exams):
+        ranked = StudentResult.objects.filter(session_id=session_id, exam_type_id=exam_type_id).order_by().annotate(
+            merit=models.Window(DenseRank(), order_by=order),
+            in_class=models.Window(DenseRank(), partition_by=[models.F('student_class')], order_by=order),
+            in_group=models.Window(DenseRank(), partition_by=[models.F('student_group')], order_by=order),
+        )
+        StudentResult.objects.bulk_update(
+            [
+                StudentResult(
+                    pk=result.pk, merit_rank=result.merit,
+                    class_rank=result.in_class if result.student_class_id is not None else None,
+                    group_rank=result.in_group if result.student_group is not None else None,
+                )
+                for result in ranked
+            ],
+            ['merit_rank', 'class_rank', 'group_rank'],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('exams', '0012_studentresult'),
+        ('students', '0005_student_user'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='studentresult',
+            options={'ordering': ['session_id', 'exam_type_id', 'merit_rank', 'student_id'], 'verbose_name': 'Student Result', 'verbose_name_plural': 'Student Results'},
+        ),
+        migrations.AddField(
+            model_name='studentresult',
+            name='class_rank',
+            field=models.PositiveIntegerField(editable=False, help_text="Position in the student's class", null=True),
+        ),
+        migrations.AddField(
+            model_name='studentresult',
+            name='group_rank',
+            field=models.PositiveIntegerField(editable=False, help_text="Position in the student's group", null=True),
+        ),
+        migrations.AddField(
+            model_name='studentresult',
+            name='merit_rank',
+            field=models.PositiveIntegerField(editable=False, help_text='Position in the session', null=True),
+        ),
+        migrations.AddField(
+            model_name='studentresult',
+            name='student_class',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, help_text="Copy of the student's class", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='student_results', to='academics.class'),
+        ),
+        migrations.AddField(
+            model_name='studentresult',
+            name='student_group',
+            field=models.CharField(blank=True, choices=[('science', 'Science'), ('business', 'Business Studies'), ('humanities', 'Humanities')], editable=False, help_text="Copy of the student's group", max_length=20, null=True),
+        ),
+        migrations.RunPython(copy_partitions_and_rank, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='studentresult',
+            index=models.Index(fields=['session', 'exam_type', 'merit_rank', 'student'], name='exams_result_merit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentresult',
+            index=models.Index(fields=['session', 'exam_type', 'student_class', 'class_rank', 'student'], name='exams_result_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentresult',
+            index=models.Index(fields=['session', 'exam_type', 'student_group', 'group_rank', 'student'], name='exams_result_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['session', 'exam_type', 'student', 'subject'], name='exams_mark_result_idx'),
+        ),
+    ]
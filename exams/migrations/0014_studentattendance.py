@@ -0,0 +1,69 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Cast
+
+
+def build_student_attendance(apps, schema_editor):
+    """Attendance rollups for the marks that already exist (later writes keep them current)"""
+    ExamMark = apps.get_model('exams', 'ExamMark')
+    StudentAttendance = apps.get_model('exams', 'StudentAttendance')
+    has_classes = models.Q(total_class__gt=0)
+    rows = ExamMark.objects.order_by().values('student_id', 'subject_id', 'session_id').annotate(
+        marks=models.Count('id'),
+        attendance=models.Count('id', filter=has_classes),
+        attendance_percentage_sum=models.Sum(models.Case(
+            models.When(has_classes, then=Cast('present', models.FloatField()) * 100 / models.F('total_class')),
+            output_field=models.FloatField(),
+        )),
+        present_sum=models.Sum('present'),
+        absent_sum=models.Sum('absent'),
+        total_class_sum=models.Sum('total_class'),
+    )
+    StudentAttendance.objects.bulk_create(
+        (
+            StudentAttendance(
+                student_id=row['student_id'], subject_id=row['subject_id'], session_id=row['session_id'],
+                mark_count=row['marks'], attendance_count=row['attendance'],
+                attendance_percentage_sum=row['attendance_percentage_sum'] or 0,
+                present_sum=row['present_sum'], absent_sum=row['absent_sum'], total_class_sum=row['total_class_sum'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('exams', '0013_studentresult_ranks'),
+        ('students', '0005_student_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mark_count', models.PositiveIntegerField(default=0, help_text='Number of marks')),
+                ('attendance_count', models.PositiveIntegerField(default=0, help_text='Marks with classes held')),
+                ('attendance_percentage_sum', models.FloatField(default=0, help_text='Sum of present * 100 / total_class')),
+                ('present_sum', models.PositiveBigIntegerField(default=0)),
+                ('absent_sum', models.PositiveBigIntegerField(default=0)),
+                ('total_class_sum', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_attendance', to='academics.session')),
+                ('student', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='students.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_attendance', to='academics.subject')),
+            ],
+            options={
+                'verbose_name': 'Student Attendance',
+                'verbose_name_plural': 'Student Attendance',
+                'unique_together': {('student', 'subject', 'session')},
+            },
+        ),
+        migrations.RunPython(build_student_attendance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('exams', '0014_studentattendance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarkImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='mark_imports/%Y/%m/')),
+                ('exam_date', models.DateField(blank=True, help_text='Exam date of rows without an exam_date column', null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('total_rows', models.PositiveIntegerField(default=0, help_text='Data rows in the sheet')),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('saved_rows', models.PositiveIntegerField(default=0)),
+                ('failed_rows', models.PositiveIntegerField(default=0)),
+                ('message', models.TextField(blank=True, help_text='Why the import failed')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('exam_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mark_imports', to='exams.examtype')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mark_imports', to='academics.session')),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mark_imports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Mark Import',
+                'verbose_name_plural': 'Mark Imports',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MarkImportError',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row', models.PositiveIntegerField(help_text='Sheet row number (the header is row 1)')),
+                ('field', models.CharField(max_length=50)),
+                ('message', models.TextField()),
+                ('mark_import', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='row_errors', to='exams.markimport')),
+            ],
+            options={
+                'ordering': ['mark_import_id', 'row', 'id'],
+                'indexes': [models.Index(fields=['mark_import', 'row'], name='exams_import_error_row_idx')],
+            },
+        ),
+    ]
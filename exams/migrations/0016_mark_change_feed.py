@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('exams', '0015_mark_imports'),
+        ('students', '0005_student_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamMarkTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mark_id', models.BigIntegerField(help_text='Primary key of the deleted mark')),
+                ('exam_type_id', models.BigIntegerField()),
+                ('subject_id', models.BigIntegerField()),
+                ('session_id', models.BigIntegerField()),
+                ('student_id', models.BigIntegerField()),
+                ('student_class_id', models.BigIntegerField(blank=True, null=True)),
+                ('student_group', models.CharField(blank=True, max_length=20, null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Exam Mark Tombstone',
+                'verbose_name_plural': 'Exam Mark Tombstones',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['updated_at', 'id'], name='exams_mark_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['student_class', 'updated_at', 'id'], name='exams_mark_class_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exammarktombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='exams_tombstone_changes_idx'),
+        ),
+    ]
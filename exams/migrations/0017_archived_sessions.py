@@ -0,0 +1,30 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('exams', '0016_mark_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.CharField(blank=True, help_text='Archive file, relative to MARK_ARCHIVE_ROOT (empty while archiving)', max_length=255)),
+                ('mark_count', models.PositiveIntegerField(default=0)),
+                ('size', models.PositiveBigIntegerField(default=0, help_text='File size in bytes')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='mark_archive', to='academics.session')),
+            ],
+            options={
+                'verbose_name': 'Archived Session',
+                'verbose_name_plural': 'Archived Sessions',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('exams', '0017_archived_sessions'),
+        ('students', '0005_student_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exammark',
+            index=models.Index(fields=['session', 'updated_at'], name='exams_mark_session_changes_idx'),
+        ),
+    ]
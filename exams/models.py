@@ -1,6 +1,49 @@
-from django.db import models
-from academics.models import Subject, Session
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from academics.models import Class, Subject, Session
+from accounts.models import User
 from students.models import Student
+from . import grading
+
+
+# Sum of the mark components that were entered, or NULL if none were.
+# Computed by the database (ExamMark.total_marks is a generated column),
+# calculate_total_marks() below is the Python equivalent.
+TOTAL_MARKS = models.Case(
+    models.When(cq_marks__isnull=True, mct_marks__isnull=True, lab_marks__isnull=True, then=None),
+    default=(
+        Coalesce('cq_marks', Value(Decimal('0'))) +
+        Coalesce('mct_marks', Value(Decimal('0'))) +
+        Coalesce('lab_marks', Value(Decimal('0')))
+    ),
+    output_field=models.DecimalField(max_digits=5, decimal_places=2),
+)
+
+
+# The unique key of a mark, in the column order of its database index
+MARK_KEY_FIELDS = ('exam_type', 'exam_date', 'student', 'subject', 'session')
+
+# Keys looked up per query by existing_mark_keys()
+KEY_LOOKUP_BATCH = 500
+
+# Student columns copied onto each of their marks (ExamMark attribute:
+# Student attribute), so marks can be filtered and ordered without a join
+STUDENT_COPIES = {
+    'student_roll': 'roll_number',
+    'student_group': 'group',
+    'student_class_id': 'class_name_id',
+}
+
+
+def calculate_total_marks(cq_marks, mct_marks, lab_marks):
+    """Sum of the mark components that were entered, or None if none were"""
+    marks_list = [m for m in [cq_marks, mct_marks, lab_marks] if m is not None]
+    if marks_list:
+        return sum(marks_list)
+    return None
 
 
 class ExamType(models.Model):
@@ -20,6 +63,61 @@ class ExamType(models.Model):
         return self.name
 
 
+# Columns of a mark that decide which rollup rows it counts towards
+ROLLUP_KEY_FIELDS = ('exam_type_id', 'subject_id', 'session_id', 'student_id')
+
+
+def key_values(mark):
+    """The ROLLUP_KEY_FIELDS of a mark, as currently set on the instance"""
+    return {field: mark.__dict__.get(field) for field in ROLLUP_KEY_FIELDS}
+
+
+def scope_values(mark):
+    """The class and group copies of a mark, as currently set on the instance"""
+    return {field: mark.__dict__.get(field) for field in ('student_class_id', 'student_group')}
+
+
+def rollup_key(values):
+    """(exam_type_id, subject_id, session_id) of the ExamSummary a mark's key_values() count towards"""
+    return (values.get('exam_type_id'), values.get('subject_id'), values.get('session_id'))
+
+
+def result_key(values):
+    """(session_id, exam_type_id, student_id) of the StudentResult a mark's key_values() count towards"""
+    return (values.get('session_id'), values.get('exam_type_id'), values.get('student_id'))
+
+
+def attendance_key(values):
+    """(student_id, subject_id, session_id) of the StudentAttendance a mark's key_values() count towards"""
+    return (values.get('student_id'), values.get('subject_id'), values.get('session_id'))
+
+
+class GradingScale(models.Model):
+    """
+    One grade band of a session's grading policy.
+    Bands without an exam type apply to every exam of the session; bands
+    for a specific exam type override them. Sessions without any bands
+    use grading.DEFAULT_SCALE.
+    """
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='grading_scales')
+    exam_type = models.ForeignKey(ExamType, on_delete=models.CASCADE, related_name='grading_scales', blank=True, null=True, help_text="Leave empty to apply to every exam type of the session")
+    grade = models.CharField(max_length=5, help_text="Letter grade (e.g., A+, A, A-, B, C, F)")
+    min_marks = models.DecimalField(max_digits=5, decimal_places=2, help_text="Lowest total marks that earns this grade")
+    grade_point = models.DecimalField(max_digits=3, decimal_places=2, blank=True, null=True, help_text="Grade point for GPA; empty uses the standard point of the letter grade")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('session', 'exam_type', 'grade')
+        ordering = ['session', 'exam_type', '-min_marks']
+        verbose_name = 'Grading Scale'
+        verbose_name_plural = 'Grading Scales'
+    
+    def __str__(self):
+        scope = self.exam_type.name if self.exam_type else 'All exams'
+        return f"{self.session.name} / {scope}: {self.grade} >= {self.min_marks}"
+
+
 class ExamMark(models.Model):
     """
     Unified model to track all student marks with:
@@ -35,6 +133,9 @@ class ExamMark(models.Model):
     exam_type = models.ForeignKey(ExamType, on_delete=models.CASCADE, related_name='exam_marks', help_text="Exam type (CT-Exam, Mid-Term, etc.)")
     exam_date = models.DateField(help_text="Date of the exam")
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='exam_marks')
+    student_roll = models.CharField(max_length=50, blank=True, default='', editable=False, help_text="Copy of the student's roll number, used to order and page through marks")
+    student_group = models.CharField(max_length=20, choices=Student.GROUP_CHOICES, blank=True, null=True, editable=False, help_text="Copy of the student's group")
+    student_class = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='exam_marks', blank=True, null=True, editable=False, db_index=False, help_text="Copy of the student's class")
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='exam_marks')
     session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='exam_marks')
     
@@ -44,7 +145,13 @@ class ExamMark(models.Model):
     lab_marks = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True, help_text="Laboratory marks")
     
     # Total marks and grade
-    total_marks = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True, help_text="Total marks obtained (auto-calculated)")
+    total_marks = models.GeneratedField(
+        expression=TOTAL_MARKS,
+        output_field=models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True),
+        db_persist=True,
+        null=True,
+        help_text="Total marks obtained (auto-calculated)",
+    )
     grade = models.CharField(max_length=5, blank=True, null=True, help_text="Letter grade (auto-calculated)")
     
     # Attendance tracking
@@ -62,41 +169,322 @@ class ExamMark(models.Model):
     def __str__(self):
         return f"{self.student.name} - {self.exam_type.name} - {self.subject.name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember which exam the row belonged to, so moving it to another
+        # subject/exam also refreshes the rollups it leaves (and leaves a
+        # tombstone in the scope it left)
+        instance._loaded_keys = key_values(instance)
+        instance._loaded_scope = scope_values(instance)
+        return instance
+    
     def save(self, *args, **kwargs):
-        """Auto-calculate total_marks and grade"""
-        # Calculate total marks from components
-        marks_list = [m for m in [self.cq_marks, self.mct_marks, self.lab_marks] if m is not None]
-        if marks_list:
-            self.total_marks = sum(marks_list)
-        else:
-            self.total_marks = None
-        
-        # Auto-calculate grade based on percentage (assuming 100 total from components)
-        if self.total_marks:
-            percentage = self.total_marks  # Since components add up to total
-            if percentage >= 80:
-                self.grade = 'A+'
-            elif percentage >= 70:
-                self.grade = 'A'
-            elif percentage >= 60:
-                self.grade = 'A-'
-            elif percentage >= 50:
-                self.grade = 'B'
-            elif percentage >= 40:
-                self.grade = 'C'
-            else:
-                self.grade = 'F'
-        else:
-            self.grade = None
-        
-        super().save(*args, **kwargs)
+        """
+        Auto-calculate grade. total_marks is computed by the database; it is
+        mirrored here so the instance stays current after an UPDATE.
+        Saved atomically with the rollups refreshed by the post_save handler.
+        """
+        self.total_marks = calculate_total_marks(self.cq_marks, self.mct_marks, self.lab_marks)
+        if self.student_id:
+            for field, source in STUDENT_COPIES.items():
+                setattr(self, field, getattr(self.student, source))
+        self.grade = grading.grade_for(self.total_marks, self.session_id, self.exam_type_id)
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+        self._loaded_keys = key_values(self)
+        self._loaded_scope = scope_values(self)
     
     class Meta:
         unique_together = ('exam_type', 'exam_date', 'student', 'subject', 'session')
         ordering = ['-exam_date', 'student__roll_number', 'subject__name']
         verbose_name = 'Exam Mark'
         verbose_name_plural = 'Exam Marks'
+        # Built around the filters of the marks list: each index starts with
+        # the equality filters it serves and ends with the list order
+        # (exam_date descending, roll number, id), so date ranges, the
+        # ORDER BY and keyset pages (see exams.pagination) need no sort.
+        # Covered by the query plan tests in exams/tests.py.
         indexes = [
-            models.Index(fields=['student', 'session']),
-            models.Index(fields=['exam_type', 'subject', 'session']),
-        ]
\ No newline at end of file
+            models.Index(fields=['-exam_date', 'student_roll', 'id'], name='exams_mark_list_idx'),
+            models.Index(fields=['session', '-exam_date', 'student_roll', 'id'], name='exams_mark_session_list_idx'),
+            models.Index(fields=['subject', '-exam_date', 'student_roll', 'id'], name='exams_mark_subject_list_idx'),
+            models.Index(fields=['student', '-exam_date', 'student_roll', 'id'], name='exams_mark_student_list_idx'),
+            models.Index(fields=['exam_type', '-exam_date', 'student_roll', 'id'], name='exams_mark_exam_list_idx'),
+            models.Index(fields=['student_group', '-exam_date', 'student_roll', 'id'], name='exams_mark_group_list_idx'),
+            models.Index(fields=['student_class', '-exam_date', 'student_roll', 'id'], name='exams_mark_class_list_idx'),
+            models.Index(
+                fields=['exam_type', 'subject', 'session', '-exam_date', 'student_roll', 'id'],
+                name='exams_mark_sheet_list_idx',
+            ),
+            # Subject totals per student of an exam, in the order
+            # exams.results groups them
+            models.Index(fields=['session', 'exam_type', 'student', 'subject'], name='exams_mark_result_idx'),
+            # The change feed (exams.changes) reads forward from a
+            # (updated_at, id) watermark, of all marks or of a class
+            models.Index(fields=['updated_at', 'id'], name='exams_mark_changes_idx'),
+            models.Index(fields=['student_class', 'updated_at', 'id'], name='exams_mark_class_changes_idx'),
+            # Refreshes of the in-memory statistics of a session (exams.analytics)
+            models.Index(fields=['session', 'updated_at'], name='exams_mark_session_changes_idx'),
+        ]
+
+
+def existing_mark_keys(keys, exclude_pk=None):
+    """
+    The subset of keys (tuples of plain ids and the date, in MARK_KEY_FIELDS
+    order) already taken by a mark, found with one query per batch of keys
+    """
+    keys = list(set(keys))
+    columns = [ExamMark._meta.get_field(field).attname for field in MARK_KEY_FIELDS]
+    existing = set()
+    for start in range(0, len(keys), KEY_LOOKUP_BATCH):
+        batch = keys[start:start + KEY_LOOKUP_BATCH]
+        # IN lists per column select a superset of the batch; the exact
+        # keys are matched in memory
+        marks = ExamMark.objects.filter(**{
+            f'{column}__in': {key[position] for key in batch}
+            for position, column in enumerate(columns)
+        })
+        if exclude_pk is not None:
+            marks = marks.exclude(pk=exclude_pk)
+        existing.update(set(batch) & set(marks.values_list(*columns)))
+    return existing
+
+
+class ExamMarkTombstone(models.Model):
+    """
+    A deleted ExamMark, kept so that the change feed (exams.changes) can
+    tell syncing clients to drop it. The scope columns are plain ids, as
+    the rows they pointed at may be gone too.
+    """
+    
+    mark_id = models.BigIntegerField(help_text="Primary key of the deleted mark")
+    exam_type_id = models.BigIntegerField()
+    subject_id = models.BigIntegerField()
+    session_id = models.BigIntegerField()
+    student_id = models.BigIntegerField()
+    student_class_id = models.BigIntegerField(blank=True, null=True)
+    student_group = models.CharField(max_length=20, blank=True, null=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Exam Mark Tombstone'
+        verbose_name_plural = 'Exam Mark Tombstones'
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='exams_tombstone_changes_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Mark {self.mark_id} deleted at {self.deleted_at}"
+
+
+class ExamSummary(models.Model):
+    """
+    Running statistics of one exam (exam type + subject + session).
+    Maintained by exams.rollups in the same transaction as every ExamMark
+    write, so reports read one row instead of aggregating the marks.
+    """
+    exam_type = models.ForeignKey(ExamType, on_delete=models.CASCADE, related_name='summaries')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='exam_summaries')
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='exam_summaries')
+    
+    mark_count = models.PositiveIntegerField(default=0, help_text="Number of marks")
+    graded_count = models.PositiveIntegerField(default=0, help_text="Marks with a total")
+    marks_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Sum of total marks")
+    
+    # Attendance: percentage sums cover marks with total_class > 0 only
+    attendance_count = models.PositiveIntegerField(default=0, help_text="Marks with classes held")
+    attendance_percentage_sum = models.FloatField(default=0, help_text="Sum of present * 100 / total_class")
+    present_sum = models.PositiveBigIntegerField(default=0)
+    absent_sum = models.PositiveBigIntegerField(default=0)
+    total_class_sum = models.PositiveBigIntegerField(default=0)
+    
+    grade_counts = models.JSONField(default=dict, help_text="Number of marks per letter grade")
+    ungraded_count = models.PositiveIntegerField(default=0, help_text="Marks without a grade")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('exam_type', 'subject', 'session')
+        verbose_name = 'Exam Summary'
+        verbose_name_plural = 'Exam Summaries'
+    
+    def __str__(self):
+        return f"{self.exam_type.name} - {self.subject.name} - {self.session.name}"
+
+
+class StudentAttendance(models.Model):
+    """
+    Running attendance of one student in one subject of a session, over
+    all of its exams. Maintained by exams.rollups alongside ExamSummary.
+    """
+    # Indexed by unique_together, which leads with the student
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_rollups', db_index=False)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='student_attendance')
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='student_attendance')
+    
+    mark_count = models.PositiveIntegerField(default=0, help_text="Number of marks")
+    
+    # Same meaning as the ExamSummary attendance fields
+    attendance_count = models.PositiveIntegerField(default=0, help_text="Marks with classes held")
+    attendance_percentage_sum = models.FloatField(default=0, help_text="Sum of present * 100 / total_class")
+    present_sum = models.PositiveBigIntegerField(default=0)
+    absent_sum = models.PositiveBigIntegerField(default=0)
+    total_class_sum = models.PositiveBigIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('student', 'subject', 'session')
+        verbose_name = 'Student Attendance'
+        verbose_name_plural = 'Student Attendance'
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.subject.name} - {self.session.name}"
+
+
+class StudentResult(models.Model):
+    """
+    Final result of a student for one exam of a session: grade point per
+    subject, GPA and merit positions. Computed for a whole session/exam at
+    a time by exams.results.compute_results(), then kept current for the
+    students whose marks are written.
+    """
+    
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='student_results')
+    exam_type = models.ForeignKey(ExamType, on_delete=models.CASCADE, related_name='student_results')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='results')
+    # The partitions of the class and group merit lists
+    student_class = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='student_results', blank=True, null=True, editable=False, db_index=False, help_text="Copy of the student's class")
+    student_group = models.CharField(max_length=20, choices=Student.GROUP_CHOICES, blank=True, null=True, editable=False, help_text="Copy of the student's group")
+    
+    gpa = models.DecimalField(max_digits=3, decimal_places=2, help_text="GPA including the optional subject bonus")
+    gpa_without_optional = models.DecimalField(max_digits=3, decimal_places=2, help_text="GPA of the compulsory and group subjects alone")
+    grade = models.CharField(max_length=5, help_text="Letter grade of the GPA")
+    total_marks = models.DecimalField(max_digits=7, decimal_places=2, help_text="Sum of the subject totals")
+    subject_count = models.PositiveSmallIntegerField(default=0)
+    failed_subjects = models.PositiveSmallIntegerField(default=0, help_text="Compulsory and group subjects without a pass")
+    subjects = models.JSONField(default=list, help_text="Total marks, grade and grade point per subject")
+    
+    # Dense ranks by GPA, then total marks
+    merit_rank = models.PositiveIntegerField(null=True, editable=False, help_text="Position in the session")
+    class_rank = models.PositiveIntegerField(null=True, editable=False, help_text="Position in the student's class")
+    group_rank = models.PositiveIntegerField(null=True, editable=False, help_text="Position in the student's group")
+    
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('session', 'exam_type', 'student')
+        ordering = ['session_id', 'exam_type_id', 'merit_rank', 'student_id']
+        verbose_name = 'Student Result'
+        verbose_name_plural = 'Student Results'
+        indexes = [
+            # Read in order by the rank window functions
+            models.Index(fields=['session', 'exam_type', '-gpa', '-total_marks'], name='exams_result_gpa_idx'),
+            models.Index(fields=['student', 'session'], name='exams_result_student_idx'),
+            # Merit lists: top-N is a range read in list order
+            models.Index(fields=['session', 'exam_type', 'merit_rank', 'student'], name='exams_result_merit_idx'),
+            models.Index(fields=['session', 'exam_type', 'student_class', 'class_rank', 'student'], name='exams_result_class_idx'),
+            models.Index(fields=['session', 'exam_type', 'student_group', 'group_rank', 'student'], name='exams_result_group_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.exam_type.name} - {self.session.name}: {self.gpa}"
+
+
+# File types exams.imports can read
+SHEET_EXTENSIONS = ('.csv', '.xlsx')
+
+
+class MarkImport(models.Model):
+    """
+    An uploaded mark sheet (CSV or XLSX) for one exam of a session, and
+    the progress of its import. The rows are written in the background
+    by exams.imports; the counters are updated after every chunk.
+    """
+    
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    
+    file = models.FileField(upload_to='mark_imports/%Y/%m/')
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='mark_imports')
+    exam_type = models.ForeignKey(ExamType, on_delete=models.CASCADE, related_name='mark_imports')
+    exam_date = models.DateField(blank=True, null=True, help_text="Exam date of rows without an exam_date column")
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='mark_imports', blank=True, null=True)
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    total_rows = models.PositiveIntegerField(default=0, help_text="Data rows in the sheet")
+    processed_rows = models.PositiveIntegerField(default=0)
+    saved_rows = models.PositiveIntegerField(default=0)
+    failed_rows = models.PositiveIntegerField(default=0)
+    message = models.TextField(blank=True, help_text="Why the import failed")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Mark Import'
+        verbose_name_plural = 'Mark Imports'
+    
+    def __str__(self):
+        return f"{self.file.name} ({self.get_status_display()})"
+    
+    @property
+    def progress(self):
+        """Percentage of the rows processed so far"""
+        if self.status == self.DONE:
+            return 100.0
+        if not self.total_rows:
+            return 0.0
+        return round(min(self.processed_rows / self.total_rows, 1) * 100, 1)
+
+
+class MarkImportError(models.Model):
+    """One problem with one row of an imported mark sheet"""
+    
+    mark_import = models.ForeignKey(MarkImport, on_delete=models.CASCADE, related_name='row_errors', db_index=False)
+    row = models.PositiveIntegerField(help_text="Sheet row number (the header is row 1)")
+    field = models.CharField(max_length=50)
+    message = models.TextField()
+    
+    class Meta:
+        ordering = ['mark_import_id', 'row', 'id']
+        indexes = [
+            # The error report is read in row order
+            models.Index(fields=['mark_import', 'row'], name='exams_import_error_row_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Row {self.row} {self.field}: {self.message}"
+
+
+class ArchivedSession(models.Model):
+    """
+    A session whose marks were moved out of ExamMark into a columnar file
+    by `manage.py archive_session` (see exams.archive). The row exists
+    from the start of the move, which makes the session read-only; file
+    is set once the marks have been written and removed from ExamMark.
+    """
+    
+    session = models.OneToOneField(Session, on_delete=models.CASCADE, related_name='mark_archive')
+    file = models.CharField(max_length=255, blank=True, help_text="Archive file, relative to MARK_ARCHIVE_ROOT (empty while archiving)")
+    mark_count = models.PositiveIntegerField(default=0)
+    size = models.PositiveBigIntegerField(default=0, help_text="File size in bytes")
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Archived Session'
+        verbose_name_plural = 'Archived Sessions'
+    
+    def __str__(self):
+        return f"{self.session.name}: {self.mark_count} marks archived"
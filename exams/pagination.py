@@ -0,0 +1,205 @@
+"""
+Pagination of the exam marks list.
+
+Page numbers (?page=) keep working as before, but every page costs a
+COUNT(*) and deep pages an ever longer OFFSET scan. Passing ?cursor=
+(empty for the first page) switches to keyset pagination on the list
+order (exam date descending, roll number, id): each page is a range
+read on the matching ExamMark index, however deep it is. A page links
+the next one and, unless it is the first, the previous one, which is
+read backwards along the same index.
+
+?count= chooses how the total is obtained:
+
+- exact: COUNT(*) of the filtered marks
+- estimate: from the ExamSummary rollups when the view can answer the
+  filters with them, otherwise a COUNT(*) cached for COUNT_CACHE_TIMEOUT
+  seconds, so it may lag behind recent writes
+- none: no total (cursor pages only, page numbers need one)
+
+Page numbers default to exact, cursors to estimate.
+
+The marks of an archived session come as an exams.archive.ArchivedMarks
+instead of a queryset; it is already in list order and counts exactly.
+"""
+import base64
+import binascii
+import hashlib
+import json
+from datetime import date
+from functools import partial
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# The list order; the cursor is the position of a row in it
+ORDERING = ('-exam_date', 'student_roll', 'id')
+
+# Cursor page size when neither settings nor ?page_size= give one
+CURSOR_PAGE_SIZE = 50
+
+COUNT_CACHE_TIMEOUT = 60
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_NONE = 'none'
+
+# First element of the cursor of a previous page
+BACKWARDS = 'before'
+
+
+def position_of(row):
+    """Ordering key of a listed mark, given as an instance or a values() dict"""
+    if isinstance(row, dict):
+        return row['exam_date'], row['student_roll'], row['id']
+    return row.exam_date, row.student_roll, row.pk
+
+
+class CountedPaginator(Paginator):
+    """Django paginator that is handed its total instead of counting"""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            self.count = count
+
+
+def cached_count(queryset):
+    """COUNT(*) of a queryset, shared for COUNT_CACHE_TIMEOUT seconds"""
+    queryset = queryset.order_by()
+    key = 'exams:mark_count:' + hashlib.md5(str(queryset.query).encode()).hexdigest()
+    return cache.get_or_set(key, queryset.count, COUNT_CACHE_TIMEOUT)
+
+
+class ExamMarkPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor_page = self.cursor_query_param in request.query_params
+        if self.cursor_page:
+            return self.paginate_cursor(queryset, request, view)
+        if self.get_page_size(request) is None:
+            return None
+        count = self.get_count(queryset, request, view, default=COUNT_EXACT)
+        self.django_paginator_class = partial(CountedPaginator, count=count)
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_cursor(self, queryset, request, view):
+        """One page after the position in ?cursor=, read from the list index"""
+        page_size = self.get_page_size(request) or CURSOR_PAGE_SIZE
+        if isinstance(queryset, QuerySet):
+            queryset = queryset.order_by(*ORDERING)
+        self.count = self.get_count(queryset, request, view, default=COUNT_ESTIMATE)
+
+        position, backwards = self.decode_cursor(request.query_params[self.cursor_query_param])
+        if backwards:
+            marks = self.filter_before(queryset, position)
+            if isinstance(marks, QuerySet):
+                rows = list(marks.reverse()[:page_size + 1])[::-1]
+            else:
+                rows = marks[max(len(marks) - page_size - 1, 0):]
+            if len(rows) > page_size:
+                rows = rows[1:]
+                self.previous_position = position_of(rows[0])
+            else:
+                self.previous_position = None
+            self.next_position = position_of(rows[-1]) if rows else None
+            return rows
+
+        if position:
+            queryset = self.filter_after(queryset, position)
+        rows = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_position = position_of(rows[-1])
+        # Only the first page (no position) has nothing before it
+        self.previous_position = (position_of(rows[0]) if rows else position) if position else None
+        return rows
+
+    def filter_after(self, queryset, position):
+        """The marks listed after position, an (exam_date, student_roll, id) tuple"""
+        if not isinstance(queryset, QuerySet):
+            return queryset.after(position)
+        exam_date, student_roll, pk = position
+        # The exam_date bound alone is an index range; the OR only skips
+        # the rows of that date up to the position
+        return queryset.filter(exam_date__lte=exam_date).filter(
+            Q(exam_date__lt=exam_date)
+            | Q(student_roll__gt=student_roll)
+            | Q(student_roll=student_roll, id__gt=pk)
+        )
+
+    def filter_before(self, queryset, position):
+        """The marks listed before position, still in list order"""
+        if not isinstance(queryset, QuerySet):
+            return queryset.before(position)
+        exam_date, student_roll, pk = position
+        return queryset.filter(exam_date__gte=exam_date).filter(
+            Q(exam_date__gt=exam_date)
+            | Q(student_roll__lt=student_roll)
+            | Q(student_roll=student_roll, id__lt=pk)
+        )
+
+    def get_count(self, queryset, request, view, default):
+        if not isinstance(queryset, QuerySet):
+            return len(queryset)
+        mode = request.query_params.get(self.count_query_param, default)
+        if mode not in (COUNT_EXACT, COUNT_ESTIMATE, COUNT_NONE):
+            mode = default
+        if mode == COUNT_NONE:
+            return None if self.cursor_page else cached_count(queryset)
+        if mode == COUNT_ESTIMATE:
+            estimate = getattr(view, 'estimate_count', None)
+            count = estimate() if estimate else None
+            return cached_count(queryset) if count is None else count
+        return queryset.count()
+
+    def encode_cursor(self, position, backwards=False):
+        exam_date, student_roll, pk = position
+        value = [exam_date.isoformat(), student_roll, pk]
+        # Cursors of previous pages are marked as such
+        if backwards:
+            value.insert(0, BACKWARDS)
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """
+        ((exam_date, student_roll, id), backwards) of a cursor; the
+        position is None for the first page
+        """
+        if not cursor:
+            return None, False
+        try:
+            value = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            backwards = isinstance(value, list) and value[:1] == [BACKWARDS]
+            exam_date, student_roll, pk = value[1:] if backwards else value
+            return (date.fromisoformat(exam_date), str(student_roll), int(pk)), backwards
+        except (binascii.Error, UnicodeError, TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+
+    def get_cursor_link(self, position, backwards=False):
+        if position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, backwards))
+
+    def get_paginated_response(self, data):
+        if not self.cursor_page:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'next': self.get_cursor_link(self.next_position),
+            'previous': self.get_cursor_link(self.previous_position, backwards=True),
+            'results': data,
+        })
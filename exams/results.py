@@ -0,0 +1,260 @@
+"""
+Final results (GPA) for a whole session and exam type in one batch.
+
+One grouped query returns every student's total per subject (averaged
+when a subject was examined on more than one date) and one more query
+the optional subjects. Everything else runs over those in-memory rows:
+grade points from the exam's grading scale, the optional subject bonus
+and the GPA, followed by a single bulk write that replaces the stored
+StudentResult rows of that exam.
+
+Mark writes report the (session_id, exam_type_id, student_id) keys they
+touched to refresh(): bulk writes inside their transaction, single mark
+saves through refresh_on_commit(), which gathers the keys of a whole
+transaction and refreshes them once it commits. Exams whose results
+were computed get those students' results recomputed and are ranked
+again; other exams are left alone until compute_results().
+
+Merit positions are dense ranks by GPA, with total marks breaking ties,
+over the session/exam and within each class and group. rank_results()
+computes them with window functions in a single query and writes back
+only the ranks that changed.
+
+GPA rules:
+
+- a subject's grade point is that of the band its total falls in;
+  subjects without a total (or with a zero total) have no grade and do
+  not count, as for ExamMark.grade
+- failing (a zero grade point in) any compulsory or group subject fails
+  the result: GPA 0 and the lowest grade
+- the best optional (4th) subject adds its points above
+  OPTIONAL_BONUS_BASE; the GPA is the sum of the other subjects' points
+  plus that bonus divided by their number, capped at the scale's best
+  point
+- a student graded in optional subjects only has them counted as
+  ordinary subjects
+"""
+import threading
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Avg, F, Max, Window
+from django.db.models.functions import DenseRank
+
+from academics.models import Subject
+from . import grading
+from .models import ExamMark, StudentResult
+
+
+OPTIONAL_CATEGORY = 'optional'
+
+# Optional subject points up to this are not added to the GPA
+OPTIONAL_BONUS_BASE = Decimal('2.00')
+
+TWO_PLACES = Decimal('0.01')
+
+BATCH_SIZE = 1000
+
+# Written again when a student's result is recomputed
+RESULT_FIELDS = [
+    'student_class', 'student_group', 'gpa', 'gpa_without_optional', 'grade', 'total_marks',
+    'subject_count', 'failed_subjects', 'subjects', 'computed_at',
+]
+
+RANK_FIELDS = ['merit_rank', 'class_rank', 'group_rank']
+
+# Best result first; equal GPAs are told apart by total marks
+MERIT_ORDER = [F('gpa').desc(), F('total_marks').desc()]
+
+
+def compute_results(session_id, exam_type_id, batch_size=BATCH_SIZE):
+    """Compute, store and rank the results of one session/exam; returns how many were stored"""
+    results = build_results(session_id, exam_type_id)
+    with transaction.atomic():
+        StudentResult.objects.filter(session_id=session_id, exam_type_id=exam_type_id).delete()
+        StudentResult.objects.bulk_create(results, batch_size=batch_size)
+        rank_results(session_id, exam_type_id, batch_size)
+    return len(results)
+
+
+def build_results(session_id, exam_type_id, student_ids=None):
+    """Unsaved StudentResults of a session/exam, for every student or only the given ones"""
+    scale = grading.get_scale(session_id, exam_type_id)
+    optional_subjects = set(Subject.objects.filter(category=OPTIONAL_CATEGORY).values_list('pk', flat=True))
+    marks = ExamMark.objects.filter(session_id=session_id, exam_type_id=exam_type_id, total_marks__isnull=False)
+    if student_ids is not None:
+        marks = marks.filter(student_id__in=student_ids)
+    # The class and group copies depend on the student only; taking them
+    # with Max() keeps the grouping in the order of exams_mark_result_idx
+    rows = (
+        marks
+        .order_by('student_id', 'subject_id')
+        .values_list('student_id', 'subject_id')
+        .annotate(total=Avg('total_marks'), class_id=Max('student_class_id'), group=Max('student_group'))
+    )
+
+    results = []
+    for student_id, subjects in groupby(rows, key=lambda row: row[0]):
+        subjects = list(subjects)
+        result = student_result(scale, optional_subjects, [(subject_id, total) for _, subject_id, total, _, _ in subjects])
+        if result is not None:
+            _, _, _, class_id, group = subjects[0]
+            results.append(StudentResult(
+                session_id=session_id, exam_type_id=exam_type_id, student_id=student_id,
+                student_class_id=class_id, student_group=group, **result
+            ))
+    return results
+
+
+def refresh(keys, batch_size=BATCH_SIZE):
+    """Recompute the results of the given students and rank their exams; call inside the write's transaction"""
+    students = defaultdict(set)
+    for session_id, exam_type_id, student_id in keys:
+        if None not in (session_id, exam_type_id, student_id):
+            students[(session_id, exam_type_id)].add(student_id)
+
+    for (session_id, exam_type_id), student_ids in students.items():
+        exam_results = StudentResult.objects.filter(session_id=session_id, exam_type_id=exam_type_id)
+        if not exam_results.exists():
+            continue
+        previous = {
+            student_id: (gpa, total_marks)
+            for student_id, gpa, total_marks in exam_results.filter(student_id__in=student_ids).order_by().values_list(
+                'student_id', 'gpa', 'total_marks'
+            )
+        }
+        results = build_results(session_id, exam_type_id, student_ids)
+        exam_results.filter(student_id__in=student_ids).exclude(
+            student_id__in=[result.student_id for result in results]
+        ).delete()
+        StudentResult.objects.bulk_create(
+            results,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['session', 'exam_type', 'student'],
+            update_fields=RESULT_FIELDS,
+        )
+        # Most writes (attendance, a mark within the same grade band...)
+        # leave every standing as it was
+        if previous != {result.student_id: (result.gpa, result.total_marks) for result in results}:
+            rank_results(session_id, exam_type_id, batch_size)
+
+
+_pending = threading.local()
+
+
+def refresh_on_commit(keys):
+    """
+    refresh() the keys after the current transaction commits, together
+    with the keys of the other writes of that transaction
+    """
+    pending = getattr(_pending, 'keys', None)
+    if pending is None:
+        pending = _pending.keys = set()
+    pending.update(keys)
+    # Only the first callback of a transaction finds keys left to refresh
+    transaction.on_commit(_refresh_pending)
+
+
+def _refresh_pending():
+    keys, _pending.keys = getattr(_pending, 'keys', None), None
+    if keys:
+        with transaction.atomic():
+            refresh(keys)
+
+
+def rank_results(session_id, exam_type_id, batch_size=BATCH_SIZE):
+    """Rank the results of one session/exam; returns how many results changed position"""
+    ranked = (
+        StudentResult.objects
+        .filter(session_id=session_id, exam_type_id=exam_type_id)
+        .order_by()
+        .annotate(
+            new_merit_rank=Window(DenseRank(), order_by=MERIT_ORDER),
+            new_class_rank=Window(DenseRank(), partition_by=[F('student_class')], order_by=MERIT_ORDER),
+            new_group_rank=Window(DenseRank(), partition_by=[F('student_group')], order_by=MERIT_ORDER),
+        )
+        .values_list(
+            'pk', 'student_class_id', 'student_group', *RANK_FIELDS,
+            'new_merit_rank', 'new_class_rank', 'new_group_rank',
+        )
+    )
+
+    # Ranks mostly move by the same amount (everybody below a student
+    # who moved up goes down one place), so the changes are written as
+    # one UPDATE per field and shift, or per value for unranked rows
+    updates = defaultdict(list)
+    changed = 0
+    for pk, class_id, group, *ranks in ranked:
+        old = ranks[:3]
+        # Students without a class or group are not listed in one
+        new = (ranks[3], ranks[4] if class_id is not None else None, ranks[5] if group is not None else None)
+        changed += tuple(old) != new
+        for field, old_rank, new_rank in zip(RANK_FIELDS, old, new):
+            if old_rank == new_rank:
+                continue
+            if old_rank is None or new_rank is None:
+                updates[(field, new_rank, False)].append(pk)
+            else:
+                updates[(field, new_rank - old_rank, True)].append(pk)
+
+    for (field, value, is_shift), pks in updates.items():
+        for start in range(0, len(pks), batch_size):
+            StudentResult.objects.filter(pk__in=pks[start:start + batch_size]).update(
+                **{field: F(field) + value if is_shift else value}
+            )
+    return changed
+
+
+def student_result(scale, optional_subjects, subject_totals):
+    """
+    StudentResult field values from one student's (subject_id, total)
+    pairs, or None when none of the subjects has a grade
+    """
+    regular = []
+    optional = []
+    subjects = []
+    total_marks = Decimal('0')
+    for subject_id, total in subject_totals:
+        total = Decimal(total).quantize(TWO_PLACES, ROUND_HALF_UP)
+        band = scale.band_for(total)
+        if band is None:
+            continue
+        point = scale.points[band]
+        is_optional = subject_id in optional_subjects
+        (optional if is_optional else regular).append(point)
+        total_marks += total
+        subjects.append({
+            'subject': subject_id,
+            'total_marks': str(total),
+            'grade': scale.grades[band],
+            'grade_point': str(point),
+            'optional': is_optional,
+        })
+    if not subjects:
+        return None
+    if not regular:
+        regular, optional = optional, []
+
+    failed = sum(1 for point in regular if point == 0)
+    if failed:
+        gpa = gpa_without_optional = Decimal('0')
+        grade = scale.grades[0]
+    else:
+        best = max(scale.points)
+        bonus = max(max(optional, default=OPTIONAL_BONUS_BASE) - OPTIONAL_BONUS_BASE, Decimal('0'))
+        gpa_without_optional = (sum(regular) / len(regular)).quantize(TWO_PLACES, ROUND_HALF_UP)
+        gpa = min((sum(regular) + bonus) / len(regular), best).quantize(TWO_PLACES, ROUND_HALF_UP)
+        grade = scale.grade_for_point(gpa)
+
+    return {
+        'gpa': gpa,
+        'gpa_without_optional': gpa_without_optional,
+        'grade': grade,
+        'total_marks': total_marks,
+        'subject_count': len(subjects),
+        'failed_subjects': failed,
+        'subjects': subjects,
+    }
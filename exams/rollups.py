@@ -0,0 +1,219 @@
+"""
+Rollup tables derived from ExamMark.
+
+Every write path reports the exams it touched (as
+(exam_type_id, subject_id, session_id) keys) and the students' subjects
+it touched (as (student_id, subject_id, session_id) keys) to refresh(),
+inside the transaction of the write. The rollup rows of those keys are
+locked and recomputed with one grouped query restricted to the touched
+keys, which is an index range and never a scan of the whole table.
+
+ExamSummary holds the statistics of an exam, StudentAttendance the
+attendance of a student in a subject of a session.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Case, Count, F, FloatField, Q, Sum, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import ExamMark, ExamSummary, StudentAttendance
+
+
+# Marks that count towards attendance figures
+HAS_CLASSES = Q(total_class__gt=0)
+
+ATTENDANCE_FIELDS = ['attendance_count', 'attendance_percentage_sum', 'present_sum', 'absent_sum', 'total_class_sum']
+
+
+def attendance_aggregates():
+    """Aggregates of a group of marks for the ATTENDANCE_FIELDS of a rollup row"""
+    return {
+        'attendance_count': Count('id', filter=HAS_CLASSES),
+        'attendance_percentage_sum': Sum(Case(
+            When(HAS_CLASSES, then=Cast('present', FloatField()) * 100 / F('total_class')),
+            output_field=FloatField(),
+        )),
+        'present_sum': Sum('present'),
+        'absent_sum': Sum('absent'),
+        'total_class_sum': Sum('total_class'),
+    }
+
+
+def average_attendance(rollups):
+    """Mean attendance percentage of the marks with classes held, over rollup rows"""
+    count = sum(rollup.attendance_count for rollup in rollups)
+    return sum(rollup.attendance_percentage_sum for rollup in rollups) / count if count else None
+
+
+def attendance_figures(rollups):
+    """Attendance of a group of rollup rows, as the API returns it"""
+    rollups = list(rollups)
+    classes = sum(rollup.total_class_sum for rollup in rollups)
+    present = sum(rollup.present_sum for rollup in rollups)
+    average = average_attendance(rollups)
+    return {
+        'marks': sum(rollup.mark_count for rollup in rollups),
+        'classes_held': classes,
+        'present': present,
+        'absent': sum(rollup.absent_sum for rollup in rollups),
+        'attendance_percentage': round(present * 100 / classes, 2) if classes else None,
+        'average_attendance': round(average, 2) if average is not None else None,
+    }
+
+
+def _keys_filter(keys, prefix=''):
+    """Q matching the given (exam_type_id, subject_id, session_id) keys"""
+    subjects = defaultdict(set)
+    for exam_type_id, subject_id, session_id in keys:
+        subjects[(exam_type_id, session_id)].add(subject_id)
+    condition = Q()
+    for (exam_type_id, session_id), subject_ids in subjects.items():
+        condition |= Q(**{
+            f'{prefix}exam_type_id': exam_type_id,
+            f'{prefix}session_id': session_id,
+            f'{prefix}subject_id__in': subject_ids,
+        })
+    return condition
+
+
+def refresh(keys, student_keys=()):
+    """Recompute the rollups of the given exams and students' subjects; call inside the write's transaction"""
+    keys = {key for key in keys if None not in key}
+    if keys:
+        refresh_exam_summaries(keys)
+    student_keys = {key for key in student_keys if None not in key}
+    if student_keys:
+        refresh_student_attendance(student_keys)
+
+
+def refresh_exam_summaries(keys):
+    # Make sure every row exists, then lock them: a concurrent writer of
+    # the same exam waits here and aggregates after this transaction commits
+    ExamSummary.objects.bulk_create(
+        [ExamSummary(exam_type_id=e, subject_id=s, session_id=ss) for e, s, ss in keys],
+        ignore_conflicts=True,
+    )
+    summaries = {
+        (summary.exam_type_id, summary.subject_id, summary.session_id): summary
+        for summary in ExamSummary.objects.select_for_update().filter(_keys_filter(keys))
+    }
+
+    for summary in summaries.values():
+        summary.mark_count = summary.graded_count = summary.attendance_count = 0
+        summary.ungraded_count = summary.present_sum = summary.absent_sum = summary.total_class_sum = 0
+        summary.marks_sum = Decimal('0')
+        summary.attendance_percentage_sum = 0.0
+        summary.grade_counts = {}
+
+    rows = ExamMark.objects.filter(_keys_filter(keys)).order_by().values(
+        'exam_type_id', 'subject_id', 'session_id', 'grade'
+    ).annotate(
+        marks=Count('id'),
+        graded=Count('total_marks'),
+        marks_sum=Sum('total_marks'),
+        **attendance_aggregates(),
+    )
+    for row in rows:
+        summary = summaries[(row['exam_type_id'], row['subject_id'], row['session_id'])]
+        summary.mark_count += row['marks']
+        summary.graded_count += row['graded']
+        summary.marks_sum += row['marks_sum'] or 0
+        summary.attendance_count += row['attendance_count']
+        summary.attendance_percentage_sum += row['attendance_percentage_sum'] or 0
+        summary.present_sum += row['present_sum']
+        summary.absent_sum += row['absent_sum']
+        summary.total_class_sum += row['total_class_sum']
+        if row['grade'] is None:
+            summary.ungraded_count += row['marks']
+        else:
+            summary.grade_counts[row['grade']] = row['marks']
+
+    now = timezone.now()
+    for summary in summaries.values():
+        summary.updated_at = now
+
+    empty = [summary.pk for summary in summaries.values() if not summary.mark_count]
+    if empty:
+        ExamSummary.objects.filter(pk__in=empty).delete()
+    ExamSummary.objects.bulk_update(
+        [summary for summary in summaries.values() if summary.mark_count],
+        [
+            'mark_count', 'graded_count', 'marks_sum', 'attendance_count', 'attendance_percentage_sum',
+            'present_sum', 'absent_sum', 'total_class_sum', 'grade_counts', 'ungraded_count', 'updated_at',
+        ],
+    )
+
+
+def refresh_student_attendance(keys):
+    # Same locking as refresh_exam_summaries(); there can be a row per
+    # student of a mark sheet, so the new figures are written with one
+    # upsert rather than a bulk_update
+    StudentAttendance.objects.bulk_create(
+        [StudentAttendance(student_id=st, subject_id=s, session_id=ss) for st, s, ss in keys],
+        ignore_conflicts=True,
+    )
+    students = defaultdict(set)
+    for student_id, subject_id, session_id in keys:
+        students[(subject_id, session_id)].add(student_id)
+    condition = Q()
+    for (subject_id, session_id), student_ids in students.items():
+        condition |= Q(subject_id=subject_id, session_id=session_id, student_id__in=student_ids)
+    locked = {
+        (student_id, subject_id, session_id): pk
+        for pk, student_id, subject_id, session_id in StudentAttendance.objects.select_for_update().filter(
+            condition
+        ).values_list('pk', 'student_id', 'subject_id', 'session_id')
+    }
+
+    rows = ExamMark.objects.filter(condition).order_by().values(
+        'student_id', 'subject_id', 'session_id'
+    ).annotate(marks=Count('id'), **attendance_aggregates())
+    now = timezone.now()
+    rollups = [
+        StudentAttendance(
+            student_id=row['student_id'], subject_id=row['subject_id'], session_id=row['session_id'],
+            mark_count=row['marks'], updated_at=now, **{field: row[field] or 0 for field in ATTENDANCE_FIELDS},
+        )
+        for row in rows
+    ]
+
+    empty = set(locked) - {(rollup.student_id, rollup.subject_id, rollup.session_id) for rollup in rollups}
+    if empty:
+        StudentAttendance.objects.filter(pk__in=[locked[key] for key in empty]).delete()
+    StudentAttendance.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=['student', 'subject', 'session'],
+        update_fields=['mark_count', *ATTENDANCE_FIELDS, 'updated_at'],
+    )
+
+
+def combine_summaries(summaries):
+    """Report statistics over several ExamSummary rows, as the marks report returns them"""
+    total = graded = attendance = 0
+    marks_sum = Decimal('0')
+    percentage_sum = 0.0
+    grades = defaultdict(int)
+    ungraded = False
+    for summary in summaries:
+        total += summary.mark_count
+        graded += summary.graded_count
+        marks_sum += summary.marks_sum
+        attendance += summary.attendance_count
+        percentage_sum += summary.attendance_percentage_sum
+        ungraded = ungraded or summary.ungraded_count > 0
+        for grade, count in summary.grade_counts.items():
+            grades[grade] += count
+
+    # Same shape as values('grade').annotate(count=Count('grade')): the
+    # ungraded group is listed first with a count of 0
+    distribution = [{'grade': None, 'count': 0}] if ungraded else []
+    distribution += [{'grade': grade, 'count': grades[grade]} for grade in sorted(grades)]
+    return {
+        'total_records': total,
+        'average_marks': marks_sum / graded if graded else None,
+        'average_attendance': percentage_sum / attendance if attendance else None,
+        'grade_distribution': distribution,
+    }
@@ -1,7 +1,71 @@
+from operator import itemgetter
+
+from django.db.models import Case, F, FloatField, When
+from django.db.models.functions import Cast
 from rest_framework import serializers
-from .models import ExamMark, ExamType
+from .archive import archived_session_ids
+from .models import MARK_KEY_FIELDS, SHEET_EXTENSIONS, ExamMark, ExamType, MarkImport, MarkImportError, StudentResult, existing_mark_keys
 from students.models import Student
-from academics.models import Subject, Session
+from academics.models import Subject
+from college_project.sparse import SparseFieldsMixin
+
+
+DUPLICATE_MARK = "Marks already exist for this student-subject-exam combination on this date"
+
+DUPLICATE_IN_PAYLOAD = "Duplicate entry for this student-subject-exam combination in the submitted marks"
+
+ARCHIVED_SESSION = "The marks of this session are archived and read-only"
+
+
+def mark_key(data, instance=None):
+    """Unique key of validated mark data; fields missing from a partial update come from the instance"""
+    key = []
+    for field in MARK_KEY_FIELDS:
+        value = data[field] if field in data else getattr(instance, ExamMark._meta.get_field(field).attname)
+        key.append(getattr(value, 'pk', value))
+    return tuple(key)
+
+
+def validate_attendance(total_class, present, absent):
+    """Reject attendance where present + absent exceeds the classes held"""
+    if present + absent > total_class:
+        raise serializers.ValidationError(
+            "Present + Absent cannot exceed total classes"
+        )
+
+
+class MarkStudentSerializer(serializers.ModelSerializer):
+    """The student of a mark, for ?expand=student"""
+    group = serializers.CharField(source='get_group_display', read_only=True)
+    
+    class Meta:
+        model = Student
+        fields = ['id', 'name', 'roll_number', 'group']
+
+
+class MarkSubjectSerializer(serializers.ModelSerializer):
+    """The subject of a mark, for ?expand=subject"""
+    
+    class Meta:
+        model = Subject
+        fields = ['id', 'name', 'code']
+
+
+class MarkExamTypeSerializer(serializers.ModelSerializer):
+    """The exam type of a mark, for ?expand=exam_type"""
+    
+    class Meta:
+        model = ExamType
+        fields = ['id', 'name']
+
+
+# ?expand= of the mark serializers: the relation, its serializer and the
+# columns it reads (the same as the values() fast path reads for it)
+MARK_EXPANSIONS = {
+    'exam_type': (MarkExamTypeSerializer, ('exam_type', 'exam_type__name')),
+    'student': (MarkStudentSerializer, ('student', 'student__name', 'student__roll_number', 'student__group')),
+    'subject': (MarkSubjectSerializer, ('subject', 'subject__name', 'subject__code')),
+}
 
 
 class ExamMarkListSerializer(serializers.ModelSerializer):
@@ -12,6 +76,7 @@ class ExamMarkListSerializer(serializers.ModelSerializer):
     student_group = serializers.CharField(source='student.get_group_display', read_only=True)
     subject_name = serializers.CharField(source='subject.name', read_only=True)
     subject_code = serializers.CharField(source='subject.code', read_only=True)
+    total_marks = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
     attendance_percentage = serializers.SerializerMethodField()
     
     class Meta:
@@ -28,11 +93,147 @@ class ExamMarkListSerializer(serializers.ModelSerializer):
         if obj.total_class > 0:
             return round((obj.present / obj.total_class) * 100, 2)
         return 0
+    
+    # Columns read by the values() fast path
+    VALUES = (
+        'id', 'exam_type', 'exam_type__name', 'exam_date', 'student', 'student__name',
+        'student__roll_number', 'student__group', 'student_roll', 'subject', 'subject__name',
+        'subject__code', 'cq_marks', 'mct_marks', 'lab_marks', 'total_marks', 'grade',
+        'total_class', 'present', 'absent', 'session',
+    )
+    
+    # Columns of the fields that do not read the column of their name;
+    # attendance_percentage is annotated
+    FIELD_VALUES = {
+        'exam_type_name': ('exam_type__name',),
+        'student_name': ('student__name',),
+        'student_roll': ('student__roll_number',),
+        'student_group': ('student__group',),
+        'subject_name': ('subject__name',),
+        'subject_code': ('subject__code',),
+        'attendance_percentage': (),
+    }
+    
+    # Read whatever the fields: the list order, for the cursor (see exams.pagination.position_of)
+    POSITION_VALUES = ('id', 'exam_date', 'student_roll')
+    
+    @classmethod
+    def values_queryset(cls, queryset, fields=None, expand=()):
+        """
+        The marks as values() dicts of exactly the listed columns, in one
+        joined query; with ?fields= / ?expand= names (see
+        college_project.sparse), of the columns those fields read
+        """
+        if fields is None and not expand:
+            columns, ratio = cls.VALUES, True
+        else:
+            names = [name for name in cls.Meta.fields if fields is None or name in fields]
+            columns = dict.fromkeys(cls.POSITION_VALUES)
+            for name in names:
+                if name in expand and name in MARK_EXPANSIONS:
+                    columns.update(dict.fromkeys(MARK_EXPANSIONS[name][1]))
+                else:
+                    columns.update(dict.fromkeys(cls.FIELD_VALUES.get(name, (name,))))
+            ratio = 'attendance_percentage' in names
+        values = queryset.prefetch_related(None).values(*columns)
+        if not ratio:
+            return values
+        return values.annotate(
+            attendance_ratio=Case(
+                When(total_class__gt=0, then=Cast('present', FloatField()) / F('total_class')),
+                output_field=FloatField(),
+            )
+        )
+    
+    @classmethod
+    def rows(cls, values, fields=None, expand=()):
+        """
+        Serialize values_queryset() dicts into exactly what serializing the
+        marks one instance at a time returns, narrowed to fields and
+        expanded as in values_queryset()
+        """
+        if fields is not None or expand:
+            yield from cls.sparse_rows(values, fields, expand)
+            return
+        fields = cls().fields
+        exam_date = fields['exam_date'].to_representation
+        decimals = [(name, fields[name].to_representation) for name in ('cq_marks', 'mct_marks', 'lab_marks', 'total_marks')]
+        groups = dict(Student.GROUP_CHOICES)
+        for row in values:
+            data = {
+                'id': row['id'],
+                'exam_type': row['exam_type'],
+                'exam_type_name': row['exam_type__name'],
+                'exam_date': exam_date(row['exam_date']),
+                'student': row['student'],
+                'student_name': row['student__name'],
+                'student_roll': row['student__roll_number'],
+                'student_group': groups.get(row['student__group'], row['student__group']),
+                'subject': row['subject'],
+                'subject_name': row['subject__name'],
+                'subject_code': row['subject__code'],
+            }
+            for name, to_representation in decimals:
+                data[name] = None if row[name] is None else to_representation(row[name])
+            # The ratio comes from SQL; scaling and rounding here keeps the
+            # float identical to get_attendance_percentage()
+            ratio = row['attendance_ratio']
+            data.update({
+                'grade': row['grade'],
+                'total_class': row['total_class'],
+                'present': row['present'],
+                'absent': row['absent'],
+                'attendance_percentage': round(ratio * 100, 2) if ratio is not None else 0,
+                'session': row['session'],
+            })
+            yield data
+    
+    @classmethod
+    def sparse_rows(cls, values, fields, expand):
+        """rows() of the requested fields only, each built by its own getter"""
+        serializer_fields = cls().fields
+        exam_date = serializer_fields['exam_date'].to_representation
+        groups = dict(Student.GROUP_CHOICES)
+        
+        def decimal(name):
+            to_representation = serializer_fields[name].to_representation
+            return lambda row: None if row[name] is None else to_representation(row[name])
+        
+        def attendance(row):
+            ratio = row['attendance_ratio']
+            return round(ratio * 100, 2) if ratio is not None else 0
+        
+        getters = {
+            'exam_type_name': itemgetter('exam_type__name'),
+            'exam_date': lambda row: exam_date(row['exam_date']),
+            'student_name': itemgetter('student__name'),
+            'student_roll': itemgetter('student__roll_number'),
+            'student_group': lambda row: groups.get(row['student__group'], row['student__group']),
+            'subject_name': itemgetter('subject__name'),
+            'subject_code': itemgetter('subject__code'),
+            'attendance_percentage': attendance,
+            **{name: decimal(name) for name in ('cq_marks', 'mct_marks', 'lab_marks', 'total_marks')},
+        }
+        expanded = {
+            'exam_type': lambda row: {'id': row['exam_type'], 'name': row['exam_type__name']},
+            'student': lambda row: {
+                'id': row['student'], 'name': row['student__name'], 'roll_number': row['student__roll_number'],
+                'group': groups.get(row['student__group'], row['student__group']),
+            },
+            'subject': lambda row: {'id': row['subject'], 'name': row['subject__name'], 'code': row['subject__code']},
+        }
+        selected = [
+            (name, expanded[name] if name in expand and name in expanded else getters.get(name, itemgetter(name)))
+            for name in cls.Meta.fields if fields is None or name in fields
+        ]
+        for row in values:
+            yield {name: get(row) for name, get in selected}
 
 
-class ExamMarkDetailSerializer(serializers.ModelSerializer):
+class ExamMarkDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Detailed serializer for exam marks with all information"""
     exam_type_name = serializers.CharField(source='exam_type.name', read_only=True)
+    total_marks = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
     student_details = serializers.SerializerMethodField()
     subject_details = serializers.SerializerMethodField()
     attendance_summary = serializers.SerializerMethodField()
@@ -48,6 +249,17 @@ class ExamMarkDetailSerializer(serializers.ModelSerializer):
             'remarks', 'created_at', 'updated_at'
         ]
         read_only_fields = ['total_marks', 'grade', 'created_at', 'updated_at']
+        # Columns of each field, for ?fields= (see college_project.sparse)
+        reads = {
+            'exam_type_name': ('exam_type__name',),
+            'student_details': (
+                'student__name', 'student__roll_number', 'student__email', 'student__group', 'student__class_name__name',
+            ),
+            'subject_details': ('subject__name', 'subject__code', 'subject__group', 'subject__category'),
+            'marks_summary': ('cq_marks', 'mct_marks', 'lab_marks', 'total_marks'),
+            'attendance_summary': ('total_class', 'present', 'absent'),
+        }
+        expandable = MARK_EXPANSIONS
     
     def get_student_details(self, obj):
         """Return detailed student information"""
@@ -93,9 +305,46 @@ class ExamMarkDetailSerializer(serializers.ModelSerializer):
         }
 
 
+class ExamMarkCreateUpdateListSerializer(serializers.ListSerializer):
+    """
+    many=True creation: the unique keys of the whole payload are looked up
+    in one query and compared in memory, which also catches a key
+    repeated within the payload
+    """
+    
+    def to_internal_value(self, data):
+        self.child.check_duplicates = False
+        try:
+            marks = super().to_internal_value(data)
+        finally:
+            self.child.check_duplicates = True
+        
+        keys = [mark_key(mark) for mark in marks]
+        existing = existing_mark_keys(keys)
+        archived = archived_session_ids({mark['session'].pk for mark in marks})
+        seen = set()
+        errors = []
+        for key, mark in zip(keys, marks):
+            if mark['session'].pk in archived:
+                errors.append({'session': [ARCHIVED_SESSION]})
+            elif key in existing:
+                errors.append({'non_field_errors': [DUPLICATE_MARK]})
+            elif key in seen:
+                errors.append({'non_field_errors': [DUPLICATE_IN_PAYLOAD]})
+            else:
+                errors.append({})
+            seen.add(key)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return marks
+
+
 class ExamMarkCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer for creating/updating exam marks"""
     
+    # Cleared while a list serializer checks the keys and sessions of a whole payload
+    check_duplicates = True
+    
     class Meta:
         model = ExamMark
         fields = [
@@ -103,37 +352,104 @@ class ExamMarkCreateUpdateSerializer(serializers.ModelSerializer):
             'cq_marks', 'mct_marks', 'lab_marks',
             'total_class', 'present', 'absent', 'remarks'
         ]
+        list_serializer_class = ExamMarkCreateUpdateListSerializer
+        # The unique key is checked in validate(), which does it in a single
+        # query, instead of by a UniqueTogetherValidator on top of it
+        validators = []
     
     def validate(self, data):
         """Validate marks and attendance data"""
         # Validate attendance
-        total_class = data.get('total_class', 10)
-        present = data.get('present', 0)
-        absent = data.get('absent', 0)
-        
-        if present + absent > total_class:
-            raise serializers.ValidationError(
-                "Present + Absent cannot exceed total classes"
-            )
+        validate_attendance(
+            data.get('total_class', 10),
+            data.get('present', 0),
+            data.get('absent', 0)
+        )
         
         # Check for duplicate entry
-        exam_type = data.get('exam_type')
-        exam_date = data.get('exam_date')
-        student = data.get('student')
-        subject = data.get('subject')
-        session = data.get('session')
-        
-        # Skip this check on update
-        if self.instance is None:
-            if ExamMark.objects.filter(
-                exam_type=exam_type,
-                exam_date=exam_date,
-                student=student,
-                subject=subject,
-                session=session
-            ).exists():
-                raise serializers.ValidationError(
-                    "Marks already exist for this student-subject-exam combination on this date"
-                )
+        if self.check_duplicates:
+            session = data.get('session', getattr(self.instance, 'session', None))
+            if session is not None and archived_session_ids([session.pk]):
+                raise serializers.ValidationError({'session': ARCHIVED_SESSION})
+            key = mark_key(data, self.instance)
+            # An update only needs checking when it moves the mark to another key
+            if self.instance is None or key != mark_key({}, self.instance):
+                exclude_pk = self.instance.pk if self.instance is not None else None
+                if existing_mark_keys([key], exclude_pk=exclude_pk):
+                    raise serializers.ValidationError(DUPLICATE_MARK)
         
         return data
+
+
+class ExamMarkBulkRowSerializer(serializers.ModelSerializer):
+    """
+    Field-level validation for one row of a bulk mark sheet.
+    Related objects are taken as plain ids and resolved in bulk by
+    exams.bulk, so validating a row never touches the database.
+    """
+    id = serializers.IntegerField(required=False)
+    exam_type = serializers.IntegerField()
+    student = serializers.IntegerField()
+    subject = serializers.IntegerField()
+    session = serializers.IntegerField()
+    
+    class Meta:
+        model = ExamMark
+        fields = [
+            'id', 'exam_type', 'exam_date', 'student', 'subject', 'session',
+            'cq_marks', 'mct_marks', 'lab_marks',
+            'total_class', 'present', 'absent', 'remarks'
+        ]
+        validators = []
+
+
+class StudentResultSerializer(serializers.ModelSerializer):
+    """Serializer for computed student results"""
+    student_name = serializers.CharField(source='student.name', read_only=True)
+    student_roll = serializers.CharField(source='student.roll_number', read_only=True)
+    exam_type_name = serializers.CharField(source='exam_type.name', read_only=True)
+    
+    class Meta:
+        model = StudentResult
+        fields = [
+            'id', 'session', 'exam_type', 'exam_type_name', 'student', 'student_name', 'student_roll',
+            'student_class', 'student_group', 'gpa', 'gpa_without_optional', 'grade', 'total_marks',
+            'subject_count', 'failed_subjects', 'subjects', 'merit_rank', 'class_rank', 'group_rank', 'computed_at'
+        ]
+
+
+class MarkImportSerializer(serializers.ModelSerializer):
+    """Upload of a mark sheet, and the progress of its import"""
+    progress = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = MarkImport
+        fields = [
+            'id', 'file', 'session', 'exam_type', 'exam_date', 'status', 'progress',
+            'total_rows', 'processed_rows', 'saved_rows', 'failed_rows', 'message',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = [
+            'status', 'total_rows', 'processed_rows', 'saved_rows', 'failed_rows', 'message',
+            'created_at', 'started_at', 'finished_at'
+        ]
+    
+    def validate_session(self, value):
+        """Sheets cannot be imported into an archived session"""
+        if archived_session_ids([value.pk]):
+            raise serializers.ValidationError(ARCHIVED_SESSION)
+        return value
+    
+    def validate_file(self, value):
+        """Only CSV and XLSX sheets can be imported"""
+        if not value.name.lower().endswith(SHEET_EXTENSIONS):
+            raise serializers.ValidationError(f"Upload a {' or '.join(SHEET_EXTENSIONS)} file")
+        return value
+
+
+class MarkImportErrorSerializer(serializers.ModelSerializer):
+    """One row error of a mark import"""
+    
+    class Meta:
+        model = MarkImportError
+        fields = ['row', 'field', 'message']
@@ -0,0 +1,82 @@
+from django.db.models import Q
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from students.models import Student
+from . import grading, results, rollups
+from .models import (
+    ROLLUP_KEY_FIELDS, STUDENT_COPIES, ExamMark, ExamMarkTombstone, GradingScale, StudentResult, attendance_key,
+    key_values, result_key, rollup_key,
+)
+
+
+@receiver([post_save, post_delete], sender=GradingScale)
+def grading_scale_changed(sender, **kwargs):
+    """Reload grading scales after any band changes"""
+    grading.invalidate()
+
+
+@receiver(post_save, sender=ExamMark)
+def exam_mark_saved(sender, instance, raw=False, **kwargs):
+    """
+    Refresh the rollups and result of the exam the mark is in (and the one
+    it left). A mark moving to another exam, student or session leaves a
+    tombstone with its old key and scope for the feeds and frames it left.
+    """
+    if raw:
+        return
+    marks = [key_values(instance), getattr(instance, '_loaded_keys', {})]
+    if marks[1] and marks[1] != marks[0]:
+        ExamMarkTombstone.objects.create(mark_id=instance.pk, **instance._loaded_scope, **marks[1])
+    rollups.refresh({rollup_key(mark) for mark in marks}, {attendance_key(mark) for mark in marks})
+    results.refresh_on_commit({result_key(mark) for mark in marks})
+
+
+@receiver(post_delete, sender=ExamMark)
+def exam_mark_deleted(sender, instance, **kwargs):
+    """Refresh what the mark counted in, and leave a tombstone for the change feed"""
+    mark = key_values(instance)
+    ExamMarkTombstone.objects.create(
+        mark_id=instance.pk, student_class_id=instance.student_class_id, student_group=instance.student_group, **mark
+    )
+    rollups.refresh({rollup_key(mark)}, {attendance_key(mark)})
+    results.refresh_on_commit({result_key(mark)})
+
+
+@receiver(post_save, sender=Student)
+def student_saved(sender, instance, raw=False, **kwargs):
+    """
+    Copy a changed roll number, group or class onto the student's marks,
+    in one UPDATE inside Student.save()'s transaction, and onto their
+    results, whose exams are then ranked again. Marks changing class or
+    group leave tombstones for the scoped change feeds.
+    """
+    if raw:
+        return
+    copies = {field: getattr(instance, source) for field, source in STUDENT_COPIES.items()}
+    stale = Q()
+    for field, value in copies.items():
+        stale |= ~Q(**{field: value})
+    marks = ExamMark.objects.filter(student=instance)
+    # Marks leaving a class or group feed: tombstones with the old scope (see exams.changes)
+    moved = marks.filter(~Q(student_class_id=instance.class_name_id) | ~Q(student_group=instance.group))
+    ExamMarkTombstone.objects.bulk_create([
+        ExamMarkTombstone(
+            mark_id=mark_id, student_class_id=class_id, student_group=group, **dict(zip(ROLLUP_KEY_FIELDS, key))
+        )
+        for mark_id, class_id, group, *key in moved.values_list(
+            'pk', 'student_class_id', 'student_group', *ROLLUP_KEY_FIELDS
+        )
+    ])
+    marks.filter(stale).update(**copies, updated_at=Now())
+
+    partitions = {'student_class_id': instance.class_name_id, 'student_group': instance.group}
+    moved = StudentResult.objects.filter(student=instance).filter(
+        ~Q(student_class_id=partitions['student_class_id']) | ~Q(student_group=partitions['student_group'])
+    )
+    exams = set(moved.values_list('session_id', 'exam_type_id'))
+    if exams:
+        moved.update(**partitions)
+        for session_id, exam_type_id in exams:
+            results.rank_results(session_id, exam_type_id)
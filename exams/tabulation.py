@@ -0,0 +1,125 @@
+"""
+Tabulation sheets: one row per student and one column per subject for
+an exam of a session.
+
+The marks come from one grouped query (a student's total per subject,
+averaged when the subject was examined on more than one date), read in
+the order of exams_mark_result_idx. They are pivoted into one list per
+subject column, indexed by the student's row, so per-subject figures are
+computed over a column and rows are assembled with a single zip().
+Stored StudentResults, when the exam has been computed, add the GPA,
+grade and merit position of each row.
+
+The marks of an archived session are read from its archive file, with
+the same grouping done in Python.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Avg
+
+from academics.models import Subject
+from students.models import Student
+from .archive import open_session_archive
+from .models import ExamMark, StudentResult
+
+
+TWO_PLACES = Decimal('0.01')
+
+# Per-student columns after the subjects, in sheet order
+RESULT_COLUMNS = ('gpa', 'grade', 'merit_rank')
+
+NO_RESULT = dict.fromkeys(RESULT_COLUMNS)
+
+
+class TabulationSheet:
+    """The pivoted marks of one session/exam, optionally of one class or group"""
+
+    def __init__(self, session_id, exam_type_id, class_id=None, group=None):
+        filters = {'exam_type_id': exam_type_id}
+        if class_id:
+            filters['student_class_id'] = class_id
+        if group:
+            filters['student_group'] = group
+
+        session_archive = open_session_archive(session_id)
+        if session_archive is not None:
+            archived = session_archive.marks().filter(**filters)
+            cells = archived.subject_totals()
+            student_ids = set(archived.column('student_id'))
+        else:
+            marks = ExamMark.objects.filter(session_id=session_id, **filters)
+            cells = (
+                marks.filter(total_marks__isnull=False)
+                .order_by('student_id', 'subject_id')
+                .values_list('student_id', 'subject_id')
+                .annotate(total=Avg('total_marks'))
+            )
+            cells = [(student_id, subject_id, total) for student_id, subject_id, total in cells]
+            student_ids = marks.values('student_id')
+
+        self.subjects = list(
+            Subject.objects.filter(pk__in={subject_id for _, subject_id, _ in cells})
+            .order_by('code')
+            .values('id', 'code', 'name')
+        )
+        self.students = list(
+            Student.objects.filter(pk__in=student_ids)
+            .order_by('roll_number')
+            .values('id', 'roll_number', 'name')
+        )
+
+        row_of = {student['id']: row for row, student in enumerate(self.students)}
+        column_of = {subject['id']: column for column, subject in enumerate(self.subjects)}
+        self.columns = [[None] * len(self.students) for _ in self.subjects]
+        for student_id, subject_id, total in cells:
+            self.columns[column_of[subject_id]][row_of[student_id]] = (
+                Decimal(total).quantize(TWO_PLACES, ROUND_HALF_UP)
+            )
+
+        results = StudentResult.objects.filter(
+            session_id=session_id, exam_type_id=exam_type_id, student_id__in=student_ids
+        )
+        self.results = {
+            student_id: {'gpa': str(gpa), 'grade': grade, 'merit_rank': merit_rank}
+            for student_id, gpa, grade, merit_rank in results.order_by().values_list('student_id', *RESULT_COLUMNS)
+        }
+
+    def subject_summary(self):
+        """Number of marks, average and highest total of every subject column"""
+        summary = []
+        for subject, column in zip(self.subjects, self.columns):
+            totals = [total for total in column if total is not None]
+            summary.append({
+                'subject': subject['id'],
+                'code': subject['code'],
+                'count': len(totals),
+                'average': str((sum(totals) / len(totals)).quantize(TWO_PLACES, ROUND_HALF_UP)) if totals else None,
+                'highest': str(max(totals)) if totals else None,
+            })
+        return summary
+
+    def rows(self):
+        """One dict per student: marks in subject column order, their total and the stored result"""
+        marks_by_row = zip(*self.columns) if self.columns else [()] * len(self.students)
+        for student, marks in zip(self.students, marks_by_row):
+            entered = [total for total in marks if total is not None]
+            yield {
+                'student': student['id'],
+                'roll_number': student['roll_number'],
+                'name': student['name'],
+                'marks': [str(total) if total is not None else None for total in marks],
+                'total': str(sum(entered)) if entered else None,
+                **self.results.get(student['id'], NO_RESULT),
+            }
+
+    def fields(self):
+        """Column names of the flat (CSV/NDJSON) rows"""
+        return ['roll_number', 'name', *(subject['code'] for subject in self.subjects), 'total', *RESULT_COLUMNS]
+
+    def flat_rows(self):
+        """rows() with one key per subject code instead of the marks list"""
+        codes = [subject['code'] for subject in self.subjects]
+        for row in self.rows():
+            marks = row.pop('marks')
+            del row['student']
+            yield {'roll_number': row.pop('roll_number'), 'name': row.pop('name'), **dict(zip(codes, marks)), **row}
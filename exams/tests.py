@@ -1,3 +1,1341 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import itertools
+import json
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.signals import request_started
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.utils.encoders import JSONEncoder
+
+from academics.models import Class, Session, Subject
+from students.models import Student
+from . import analytics, grading, results
+from .imports import run_import
+from .models import (
+    ArchivedSession, ExamMark, ExamSummary, ExamType, GradingScale, MarkImport, StudentAttendance, StudentResult,
+)
+from .pagination import ExamMarkPagination
+from .serializers import (
+    ARCHIVED_SESSION, DUPLICATE_IN_PAYLOAD, DUPLICATE_MARK, ExamMarkCreateUpdateSerializer, ExamMarkListSerializer,
+)
+from .results import compute_results, student_result
+from .tabulation import TabulationSheet
+from .views import ExamMarkViewSet
+
+
+@skipUnless(connection.vendor == 'sqlite', "Reads SQLite's EXPLAIN QUERY PLAN output")
+class ExamMarkListQueryPlanTests(TestCase):
+    """
+    Every combination of the marks list filters must be answered from an
+    index in list order: no full table scan and no sort of the result.
+    """
+    PAGE_SIZE = 50
+    DATE_RANGE = {'start_date': '2025-02-01', 'end_date': '2025-04-30'}
+    # Without an equality filter the list index is walked in order
+    ORDERED_WALKS = {frozenset()}
+
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Plan', code='plan')
+        sessions = [Session.objects.create(name=f'Plan {year}') for year in (2024, 2025)]
+        exam_types = [ExamType.objects.create(name=name) for name in ('CT-Exam', 'Mid-Term', 'Pre-Test')]
+        subjects = [Subject.objects.create(name=f'Subject {i}', code=f'plan-{i}') for i in range(5)]
+        students = [
+            Student.objects.create(
+                name=f'Student {i}', roll_number=f'plan-{i:03d}', class_name=class_obj,
+                session=sessions[i % 2], group=Student.GROUP_CHOICES[i % 3][0],
+            )
+            for i in range(30)
+        ]
+        ExamMark.objects.bulk_create([
+            ExamMark(
+                exam_type=exam_type, exam_date=date(2025, month, 10), student=student,
+                student_roll=student.roll_number, student_group=student.group, student_class=class_obj,
+                subject=subject, session=student.session,
+                cq_marks=Decimal(month * 5), total_class=10, present=month,
+            )
+            for exam_type, month in zip(exam_types, (1, 3, 5))
+            for student in students
+            for subject in subjects
+        ])
+        cls.filters = {
+            'exam_type': exam_types[0].pk,
+            'subject': subjects[0].pk,
+            'session': sessions[0].pk,
+            'student': students[0].pk,
+            'group': 'science',
+            'class_name': class_obj.pk,
+        }
+
+    def list_queryset(self, params):
+        request = Request(APIRequestFactory().get('/api/v1/exams/marks/', params))
+        view = ExamMarkViewSet(request=request, action='list', format_kwarg=None)
+        return ExamMarkListSerializer.values_queryset(view.get_queryset())
+
+    def assertIndexedInOrder(self, queryset, names):
+        plan = queryset[:self.PAGE_SIZE].explain()
+        self.assertNotIn('USE TEMP B-TREE', plan)
+        for line in plan.splitlines():
+            if ' SCAN ' not in f' {line} ':
+                continue
+            self.assertIn(frozenset(names), self.ORDERED_WALKS, plan)
+            self.assertTrue(line.endswith('SCAN exams_exammark USING INDEX exams_mark_list_idx'), plan)
+
+    def filter_combinations(self):
+        for size in range(len(self.filters) + 1):
+            for names in itertools.combinations(self.filters, size):
+                for dates in ({}, self.DATE_RANGE):
+                    yield names, {**{name: self.filters[name] for name in names}, **dates}
+
+    def test_filters_use_an_index_without_sorting(self):
+        for names, params in self.filter_combinations():
+            with self.subTest(**params):
+                self.assertIndexedInOrder(self.list_queryset(params), names)
+
+    def test_cursor_pages_use_an_index_without_sorting(self):
+        position = (date(2025, 3, 10), 'plan-014', 1)
+        for names, params in self.filter_combinations():
+            with self.subTest(**params):
+                marks = ExamMarkPagination().filter_after(self.list_queryset(params), position)
+                self.assertIndexedInOrder(marks, names)
+
+
+class ExamMarkPaginationTests(TestCase):
+    """Cursor pages and the count modes of ExamMarkPagination"""
+
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Page', code='page')
+        session = Session.objects.create(name='Page 2025')
+        exam_type = ExamType.objects.create(name='CT-Exam')
+        subjects = [Subject.objects.create(name=f'Subject {i}', code=f'page-{i}') for i in range(2)]
+        students = [
+            Student.objects.create(name=f'Student {i}', roll_number=f'page-{i}', class_name=class_obj, session=session, group='science')
+            for i in range(4)
+        ]
+        # Several marks share a date and a roll number, so pages split ties
+        for day in (1, 2, 3):
+            for student in students:
+                for subject in subjects[:1 + day % 2]:
+                    ExamMark.objects.create(
+                        exam_type=exam_type, exam_date=date(2025, 5, day), student=student, subject=subject, session=session,
+                    )
+        cls.ordered = list(ExamMark.objects.order_by('-exam_date', 'student_roll', 'id').values_list('id', flat=True))
+        cls.user = get_user_model().objects.create(username='page')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url='/api/v1/exams/marks/', status=200, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def ids(self, page):
+        return [row['id'] for row in page['results']]
+
+    def test_walk_next_and_previous(self):
+        self.assertEqual(len(self.ordered), 20)
+        page = self.get(cursor='', page_size=6)
+        self.assertIsNone(page['previous'])
+        pages = [self.ids(page)]
+        while page['next']:
+            page = self.get(page['next'])
+            pages.append(self.ids(page))
+        self.assertEqual([len(ids) for ids in pages], [6, 6, 6, 2])
+        self.assertEqual([pk for ids in pages for pk in ids], self.ordered)
+
+        backwards = []
+        while page['previous']:
+            page = self.get(page['previous'])
+            backwards.insert(0, self.ids(page))
+        self.assertEqual(backwards, pages[:-1])
+        # Forward again from a page reached backwards
+        self.assertEqual(self.ids(self.get(page['next'])), pages[1])
+
+    def test_invalid_cursor(self):
+        for value in (b'x', b'[1]', b'{"a": 1}', b'["before"]', b'["2025-05-01", "page-0"]', b'[null, "page-0", 1]'):
+            with self.subTest(value=value):
+                self.get(cursor=base64.urlsafe_b64encode(value).decode(), status=404)
+        self.get(cursor='%%%', status=404)
+
+    def test_count_modes(self):
+        self.assertEqual(self.get(cursor='', page_size=5)['count'], 20)
+        self.assertEqual(self.get(cursor='', page_size=5, count='exact')['count'], 20)
+        self.assertIsNone(self.get(cursor='', page_size=5, count='none')['count'])
+        self.assertEqual(self.get(page_size=5, count='none')['count'], 20)
+        self.assertEqual(self.get(page_size=5, count='bogus')['count'], 20)
+
+        # An estimate the summaries cannot answer is a cached COUNT(*)
+        self.assertEqual(self.get(cursor='', page_size=5, group='science', count='estimate')['count'], 20)
+        ExamMark.objects.filter(pk=self.ordered[0]).delete()
+        self.assertEqual(self.get(cursor='', page_size=5, group='science', count='estimate')['count'], 20)
+        self.assertEqual(self.get(cursor='', page_size=5, group='science', count='exact')['count'], 19)
+        # The summaries are kept current
+        self.assertEqual(self.get(cursor='', page_size=5, count='estimate')['count'], 19)
+
+
+class ExamMarkDuplicateValidationTests(TestCase):
+    """Unique key checks of ExamMarkCreateUpdateSerializer, one row or a whole payload at a time"""
+
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Dup', code='dup')
+        session = Session.objects.create(name='Dup 2025')
+        cls.students = [
+            Student.objects.create(name=f'Student {i}', roll_number=f'dup-{i}', class_name=class_obj, session=session)
+            for i in range(4)
+        ]
+        cls.base = {
+            'exam_type': ExamType.objects.create(name='CT-Exam').pk,
+            'exam_date': '2025-01-10',
+            'subject': Subject.objects.create(name='Physics', code='dup-phy').pk,
+            'session': session.pk,
+            'cq_marks': '40',
+        }
+        cls.existing = ExamMark.objects.create(**{
+            'exam_type_id': cls.base['exam_type'], 'exam_date': date(2025, 1, 10), 'student': cls.students[0],
+            'subject_id': cls.base['subject'], 'session_id': session.pk,
+        })
+
+    def row(self, student, **extra):
+        return {**self.base, 'student': student.pk, **extra}
+
+    def mark_queries(self, queries):
+        return [query for query in queries.captured_queries if 'FROM "exams_exammark"' in query['sql']]
+
+    def test_single_row_rejects_a_taken_key(self):
+        serializer = ExamMarkCreateUpdateSerializer(data=self.row(self.students[0]))
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors['non_field_errors'], [DUPLICATE_MARK])
+
+    def test_update_moving_onto_a_taken_key_is_rejected(self):
+        other = ExamMark.objects.create(
+            exam_type_id=self.base['exam_type'], exam_date=date(2025, 1, 10), student=self.students[1],
+            subject_id=self.base['subject'], session_id=self.base['session'],
+        )
+        serializer = ExamMarkCreateUpdateSerializer(other, data={'student': self.students[0].pk}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        serializer = ExamMarkCreateUpdateSerializer(other, data={'cq_marks': '12'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_payload_keys_are_checked_in_one_query(self):
+        payload = [self.row(self.students[0]), self.row(self.students[1]), self.row(self.students[2]), self.row(self.students[2])]
+        serializer = ExamMarkCreateUpdateSerializer(data=payload, many=True)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(serializer.is_valid())
+        self.assertEqual(len(self.mark_queries(queries)), 1)
+        self.assertEqual(serializer.errors, [
+            {'non_field_errors': [DUPLICATE_MARK]},
+            {},
+            {},
+            {'non_field_errors': [DUPLICATE_IN_PAYLOAD]},
+        ])
+
+    def test_valid_payload(self):
+        serializer = ExamMarkCreateUpdateSerializer(data=[self.row(student) for student in self.students[1:]], many=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertEqual(ExamMark.objects.count(), 4)
+
+    def test_update_rejects_a_list_body(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create(username='dup-list'))
+        for method in (client.put, client.patch):
+            response = method(f'/api/v1/exams/marks/{self.existing.pk}/', [self.row(self.students[3])], format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_bulk_update_with_an_unknown_id(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create(username='dup'))
+        response = client.post('/api/v1/exams/marks/bulk_update/', {'marks': [{'id': 0, 'cq_marks': '30'}]}, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['errors'], [{'id': 0, 'error': 'ExamMark not found'}])
+
+
+class BulkUpsertTests(TestCase):
+    """exams.bulk behind ExamMarkViewSet.bulk_update"""
+
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Upsert', code='upsert')
+        cls.session = Session.objects.create(name='Upsert 2025')
+        cls.exam_type = ExamType.objects.create(name='Mid-Term')
+        cls.subject = Subject.objects.create(name='Physics', code='upsert-phy')
+        cls.students = [
+            Student.objects.create(name=f'Student {i}', roll_number=f'upsert-{i}', class_name=class_obj, session=cls.session)
+            for i in range(3)
+        ]
+        cls.user = get_user_model().objects.create(username='upsert')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def row(self, student, **extra):
+        return {
+            'exam_type': self.exam_type.pk, 'exam_date': '2025-06-01', 'student': student.pk,
+            'subject': self.subject.pk, 'session': self.session.pk, **extra,
+        }
+
+    def post(self, *rows, status=200):
+        response = self.client.post('/api/v1/exams/marks/bulk_update/', {'marks': list(rows)}, format='json')
+        self.assertEqual(response.status_code, status, response.data)
+        return response.data
+
+    def mark(self, student):
+        return ExamMark.objects.get(student=student, exam_type=self.exam_type, subject=self.subject)
+
+    def test_inserts_then_updates_on_the_key(self):
+        body = self.post(self.row(self.students[0], cq_marks='50'), self.row(self.students[1], cq_marks='85'))
+        self.assertEqual(body, {'updated': 2, 'total': 2, 'errors': []})
+        mark = self.mark(self.students[0])
+        self.assertEqual((mark.total_marks, mark.grade, mark.student_roll), (Decimal('50'), 'B', 'upsert-0'))
+        # Results of a computed exam follow later sheets
+        compute_results(self.session.pk, self.exam_type.pk)
+
+        self.post(self.row(self.students[0], cq_marks='72', mct_marks='10', present=8))
+        mark = self.mark(self.students[0])
+        self.assertEqual((mark.total_marks, mark.grade, mark.present), (Decimal('82'), 'A+', 8))
+        self.assertEqual(ExamMark.objects.count(), 2)
+
+        summary = ExamSummary.objects.get(exam_type=self.exam_type, subject=self.subject, session=self.session)
+        self.assertEqual((summary.mark_count, summary.marks_sum, summary.grade_counts), (2, Decimal('167'), {'A+': 2}))
+        result = StudentResult.objects.get(session=self.session, exam_type=self.exam_type, student=self.students[0])
+        self.assertEqual((result.total_marks, result.grade, result.merit_rank), (Decimal('82'), 'A+', 2))
+
+    def test_partial_update_by_id(self):
+        self.post(self.row(self.students[0], cq_marks='50', remarks='steady'))
+        mark = self.mark(self.students[0])
+        self.post({'id': mark.pk, 'lab_marks': '20'})
+        mark.refresh_from_db()
+        self.assertEqual((mark.cq_marks, mark.lab_marks, mark.total_marks, mark.grade, mark.remarks), (
+            Decimal('50'), Decimal('20'), Decimal('70'), 'A', 'steady',
+        ))
+
+    def test_errors_are_reported_per_row(self):
+        body = self.post(
+            self.row(self.students[0], cq_marks='40'),
+            self.row(self.students[1], total_class=5, present=6),
+            {**self.row(self.students[2]), 'subject': 0},
+            status=207,
+        )
+        self.assertEqual((body['updated'], body['total']), (1, 3))
+        self.assertEqual(body['errors'], [
+            {'student_id': self.students[1].pk, 'errors': {'non_field_errors': [mock.ANY]}},
+            {'student_id': self.students[2].pk, 'errors': {'subject': [mock.ANY]}},
+        ])
+        self.assertEqual(list(ExamMark.objects.values_list('student', flat=True)), [self.students[0].pk])
+
+    def test_moving_onto_a_taken_key_fails_only_that_row(self):
+        self.post(self.row(self.students[0], cq_marks='40'), self.row(self.students[1], cq_marks='60'))
+        first, second = self.mark(self.students[0]), self.mark(self.students[1])
+        body = self.post(
+            {'id': first.pk, 'student': self.students[1].pk},
+            self.row(self.students[2], cq_marks='30'),
+            status=207,
+        )
+        self.assertEqual(body['updated'], 1)
+        self.assertEqual(body['errors'], [
+            {'student_id': self.students[1].pk, 'errors': {'non_field_errors': [DUPLICATE_MARK]}},
+        ])
+        first.refresh_from_db()
+        self.assertEqual((first.student_id, second.student_id), (self.students[0].pk, self.students[1].pk))
+
+    def test_swapping_keys_is_refused_per_row(self):
+        self.post(self.row(self.students[0], cq_marks='40'), self.row(self.students[1], cq_marks='60'))
+        first, second = self.mark(self.students[0]), self.mark(self.students[1])
+        body = self.post(
+            {'id': first.pk, 'student': self.students[1].pk},
+            {'id': second.pk, 'student': self.students[0].pk},
+            {'id': second.pk, 'cq_marks': '65'},
+            status=207,
+        )
+        self.assertEqual(body['updated'], 1)
+        self.assertEqual([error['errors'] for error in body['errors']], [{'non_field_errors': [DUPLICATE_MARK]}] * 2)
+        self.assertEqual(self.mark(self.students[1]).cq_marks, Decimal('65'))
+
+    def test_a_key_being_left_is_not_reused(self):
+        self.post(self.row(self.students[0], cq_marks='40'))
+        first = self.mark(self.students[0])
+        body = self.post(
+            {'id': first.pk, 'student': self.students[2].pk},
+            self.row(self.students[0], cq_marks='70'),
+            status=207,
+        )
+        self.assertEqual(body['errors'], [
+            {'student_id': self.students[0].pk, 'errors': {'non_field_errors': [DUPLICATE_IN_PAYLOAD]}},
+        ])
+        self.assertEqual(list(ExamMark.objects.values_list('pk', 'student', 'cq_marks')), [
+            (first.pk, self.students[2].pk, Decimal('40')),
+        ])
+
+
+class GradingScaleReloadTests(TestCase):
+    """Scales changed by another process are picked up on the next request or batch"""
+
+    def setUp(self):
+        grading.invalidate()
+        self.addCleanup(grading.invalidate)
+
+    def test_version_is_read_once_per_request(self):
+        session = Session.objects.create(name='Scale 2025')
+        self.assertEqual(grading.grade_for(Decimal('75'), session.pk), 'A')
+        # Another process adds a band and bumps the version
+        GradingScale.objects.bulk_create([GradingScale(session=session, grade='P', min_marks=0)])
+        cache.incr(grading.VERSION_CACHE_KEY)
+        with mock.patch('college_project.versioned.cache.get', wraps=cache.get) as cache_get:
+            self.assertEqual(grading.grade_for(Decimal('75'), session.pk), 'A')
+            request_started.send(sender=None)
+            for _ in range(3):
+                self.assertEqual(grading.grade_for(Decimal('75'), session.pk), 'P')
+        self.assertEqual(cache_get.call_count, 1)
+
+
+class TotalMarksColumnTests(TestCase):
+    """ExamMark.total_marks is generated by the database, and the grade follows it"""
+
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Total', code='total')
+        cls.session = Session.objects.create(name='Total 2025')
+        cls.exam_type = ExamType.objects.create(name='Test')
+        cls.subject = Subject.objects.create(name='Chemistry', code='total-chem')
+        cls.students = [
+            Student.objects.create(name=f'Student {i}', roll_number=f'total-{i}', class_name=class_obj, session=cls.session)
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        grading.invalidate()
+        self.addCleanup(grading.invalidate)
+
+    def mark(self, student, **marks):
+        return ExamMark(
+            exam_type=self.exam_type, exam_date=date(2025, 8, 1), student=student, subject=self.subject,
+            session=self.session, **marks,
+        )
+
+    def totals(self):
+        return list(ExamMark.objects.order_by('student_roll').values_list('total_marks', flat=True))
+
+    def test_computed_by_bulk_writes(self):
+        components = [
+            {'cq_marks': Decimal('30'), 'mct_marks': Decimal('25'), 'lab_marks': Decimal('20')},
+            {'cq_marks': Decimal('40.5')},
+            {'mct_marks': Decimal('0')},
+            {},
+        ]
+        ExamMark.objects.bulk_create([self.mark(student, **values) for student, values in zip(self.students, components)])
+        self.assertEqual(self.totals(), [Decimal('75'), Decimal('40.5'), Decimal('0'), None])
+
+        marks = list(ExamMark.objects.order_by('student_roll'))
+        marks[1].lab_marks = Decimal('9.5')
+        marks[3].cq_marks = Decimal('12')
+        ExamMark.objects.bulk_update(marks, ['cq_marks', 'lab_marks'])
+        ExamMark.objects.filter(pk=marks[0].pk).update(mct_marks=None)
+        self.assertEqual(self.totals(), [Decimal('50'), Decimal('50'), Decimal('0'), Decimal('12')])
+
+    def test_grade_follows_the_total(self):
+        marks = [
+            self.mark(self.students[0], cq_marks=Decimal('30'), mct_marks=Decimal('25'), lab_marks=Decimal('20')),
+            self.mark(self.students[1], cq_marks=Decimal('35')),
+            self.mark(self.students[2], cq_marks=Decimal('0')),
+            self.mark(self.students[3]),
+        ]
+        for mark in marks:
+            mark.save()
+        self.assertEqual([(mark.total_marks, mark.grade) for mark in marks], [
+            (Decimal('75'), 'A'), (Decimal('35'), 'F'), (Decimal('0'), None), (None, None),
+        ])
+        # The SQL CASE of regrade_marks agrees with save() on the generated column
+        scale = grading.get_scale(self.session.pk, self.exam_type.pk)
+        rows = ExamMark.objects.annotate(sql_grade=scale.case_expression()).values_list('grade', 'sql_grade')
+        self.assertTrue(all(grade == sql_grade for grade, sql_grade in rows))
+
+
+class RegradeMarksTests(TestCase):
+    """The regrade_marks command, after a session's grading scale changes"""
+
+    def setUp(self):
+        grading.invalidate()
+        self.addCleanup(grading.invalidate)
+
+    def test_regrades_marks_summaries_and_results(self):
+        class_obj = Class.objects.create(name='Regrade', code='regrade')
+        session = Session.objects.create(name='Regrade 2025')
+        exam_type = ExamType.objects.create(name='Final')
+        subject = Subject.objects.create(name='Physics', code='regrade-phy')
+        marks = [
+            ExamMark.objects.create(
+                exam_type=exam_type, exam_date=date(2025, 12, 1), subject=subject, session=session, cq_marks=Decimal(total),
+                student=Student.objects.create(name=f'Student {i}', roll_number=f'regrade-{i}', class_name=class_obj, session=session),
+            )
+            for i, total in enumerate([75, 45])
+        ]
+        compute_results(session.pk, exam_type.pk)
+        GradingScale.objects.bulk_create([
+            GradingScale(session=session, grade='A+', min_marks=70),
+            GradingScale(session=session, grade='F', min_marks=0),
+        ])
+
+        out = io.StringIO()
+        call_command('regrade_marks', '--session', 'Regrade 2025', '--chunk-size', '1', stdout=out)
+        self.assertIn('Regraded 2 of 2 marks', out.getvalue())
+        self.assertEqual([ExamMark.objects.get(pk=mark.pk).grade for mark in marks], ['A+', 'F'])
+        summary = ExamSummary.objects.get(exam_type=exam_type, subject=subject, session=session)
+        self.assertEqual(summary.grade_counts, {'A+': 1, 'F': 1})
+        results = StudentResult.objects.filter(session=session).order_by('student__roll_number')
+        self.assertEqual([(result.grade, result.gpa) for result in results], [('A+', Decimal('5.00')), ('F', Decimal('0.00'))])
+
+    def test_unknown_session(self):
+        with self.assertRaisesMessage(CommandError, "session 'Nowhere' does not exist"):
+            call_command('regrade_marks', '--session', 'Nowhere', stdout=io.StringIO())
+
+
+class StudentResultRuleTests(TestCase):
+    """GPA rules of exams.results on the default grading scale"""
+    OPTIONAL = {9}
+
+    def result(self, *totals):
+        return student_result(grading.DEFAULT, self.OPTIONAL, list(enumerate(totals, 1)))
+
+    def test_optional_points_above_the_base_are_added(self):
+        # A, A-, B with an A+ optional subject: (4 + 3.5 + 3 + 3) / 3
+        result = student_result(grading.DEFAULT, self.OPTIONAL, [(1, 75), (2, 62), (3, 55), (9, 90)])
+        self.assertEqual(result['gpa'], Decimal('4.50'))
+        self.assertEqual(result['gpa_without_optional'], Decimal('3.50'))
+        self.assertEqual(result['grade'], 'A')
+
+    def test_gpa_is_capped_at_the_best_point(self):
+        result = student_result(grading.DEFAULT, self.OPTIONAL, [(1, 90), (2, 85), (9, 95)])
+        self.assertEqual(result['gpa'], Decimal('5.00'))
+        self.assertEqual(result['grade'], 'A+')
+
+    def test_failing_a_regular_subject_fails_the_result(self):
+        result = self.result(90, 20, 70)
+        self.assertEqual((result['gpa'], result['grade'], result['failed_subjects']), (Decimal('0'), 'F', 1))
+
+    def test_failed_optional_subject_is_ignored(self):
+        result = student_result(grading.DEFAULT, self.OPTIONAL, [(1, 75), (9, 10)])
+        self.assertEqual((result['gpa'], result['failed_subjects']), (Decimal('4.00'), 0))
+
+    def test_no_graded_subject_has_no_result(self):
+        self.assertIsNone(self.result(0))
+
+
+class StudentResultRankTests(TestCase):
+    """Merit positions of exams.results, kept current by mark writes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.session = Session.objects.create(name='Rank 2025')
+        cls.exam_type = ExamType.objects.create(name='Year Final')
+        cls.classes = [Class.objects.create(name=f'Rank {i}', code=f'rank-{i}') for i in range(2)]
+        cls.subject = Subject.objects.create(name='Physics', code='rank-phy')
+        # (class, group, total): equal totals share a position
+        rows = [(0, 'science', 95), (1, 'science', 75), (0, None, 75), (1, 'business', 60), (0, 'science', 20)]
+        cls.students = []
+        for i, (class_index, group, total) in enumerate(rows):
+            student = Student.objects.create(
+                name=f'Student {i}', roll_number=f'rank-{i}', class_name=cls.classes[class_index],
+                session=cls.session, group=group,
+            )
+            ExamMark.objects.create(
+                exam_type=cls.exam_type, exam_date=date(2025, 11, 1), student=student,
+                subject=cls.subject, session=cls.session, cq_marks=Decimal(total),
+            )
+            cls.students.append(student)
+        compute_results(cls.session.pk, cls.exam_type.pk)
+
+    def ranks(self):
+        results = StudentResult.objects.filter(session=self.session, exam_type=self.exam_type)
+        return {
+            result.student_id: (result.merit_rank, result.class_rank, result.group_rank)
+            for result in results
+        }
+
+    def test_dense_ranks_per_session_class_and_group(self):
+        s = self.students
+        self.assertEqual(self.ranks(), {
+            s[0].pk: (1, 1, 1),
+            s[1].pk: (2, 1, 2),
+            s[2].pk: (2, 2, None),
+            s[3].pk: (3, 2, 1),
+            s[4].pk: (4, 3, 3),
+        })
+
+    def test_mark_write_reranks_the_exam(self):
+        marks = ExamMark.objects.filter(student__in=self.students[3:]).order_by('student__roll_number')
+        with (
+            mock.patch('exams.results.refresh', wraps=results.refresh) as refresh,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            for mark, total in zip(marks, ('60.5', '99')):
+                mark.cq_marks = Decimal(total)
+                mark.save()
+        # Once for the whole transaction
+        self.assertEqual(refresh.call_count, 1)
+        s = self.students
+        self.assertEqual(self.ranks(), {
+            s[4].pk: (1, 1, 1),
+            s[0].pk: (2, 2, 2),
+            s[1].pk: (3, 1, 3),
+            s[2].pk: (3, 3, None),
+            s[3].pk: (4, 2, 1),
+        })
+
+    def test_moving_class_reranks_the_class(self):
+        student = self.students[3]
+        student.class_name = self.classes[0]
+        student.save()
+        self.assertEqual(self.ranks()[student.pk], (3, 3, 1))
+        self.assertEqual(self.ranks()[self.students[4].pk], (4, 4, 3))
+
+    def test_roll_group_and_class_are_copied_and_reranked(self):
+        student = self.students[1]
+        mark = ExamMark.objects.get(student=student)
+        untouched = ExamMark.objects.get(student=self.students[0]).updated_at
+        student.roll_number, student.group, student.class_name = 'rank-9', 'business', self.classes[0]
+        student.save()
+        mark.refresh_from_db()
+        self.assertEqual((mark.student_roll, mark.student_group, mark.student_class_id), ('rank-9', 'business', self.classes[0].pk))
+        result = StudentResult.objects.get(student=student)
+        self.assertEqual((result.student_class_id, result.student_group), (self.classes[0].pk, 'business'))
+        s = self.students
+        self.assertEqual(self.ranks(), {
+            s[0].pk: (1, 1, 1),
+            s[1].pk: (2, 2, 1),
+            s[2].pk: (2, 2, None),
+            s[3].pk: (3, 1, 2),
+            s[4].pk: (4, 3, 2),
+        })
+        # Saving without a change rewrites no mark
+        student.save()
+        self.assertEqual(ExamMark.objects.get(pk=mark.pk).updated_at, mark.updated_at)
+        self.assertEqual(ExamMark.objects.get(student=self.students[0]).updated_at, untouched)
+
+    def test_merit_rejects_malformed_ids(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create(username='rank'))
+        params = {'session': self.session.pk, 'exam_type': self.exam_type.pk}
+        for param in ('session', 'exam_type', 'class_name'):
+            response = client.get('/api/v1/exams/results/merit/', {**params, param: 'x'})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(client.get('/api/v1/exams/results/', {'session': 'x'}).status_code, 400)
+        response = client.get('/api/v1/exams/results/merit/', {**params, 'class_name': self.classes[0].pk})
+        self.assertEqual(response.data['count'], 3)
+
+    @skipUnless(connection.vendor == 'sqlite', "Reads SQLite's EXPLAIN QUERY PLAN output")
+    def test_merit_lookups_use_an_index(self):
+        results = StudentResult.objects.filter(session=self.session, exam_type=self.exam_type)
+        lookups = {
+            'exams_result_merit_idx': results.filter(merit_rank__lte=10).order_by('merit_rank', 'student_id'),
+            'exams_result_class_idx': results.filter(student_class=self.classes[0], class_rank__lte=10).order_by('class_rank', 'student_id'),
+            'exams_result_group_idx': results.filter(student_group='science', group_rank__lte=10).order_by('group_rank', 'student_id'),
+        }
+        for index, queryset in lookups.items():
+            with self.subTest(index=index):
+                plan = queryset.explain()
+                self.assertIn(f'USING INDEX {index}', plan)
+                self.assertNotIn('USE TEMP B-TREE', plan)
+
+
+class TabulationSheetTests(TestCase):
+    """Students x subjects pivot of exams.tabulation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.session = Session.objects.create(name='Tab 2025')
+        cls.exam_type = ExamType.objects.create(name='Half Yearly')
+        class_obj = Class.objects.create(name='Tab', code='tab')
+        cls.subjects = [Subject.objects.create(name=f'Subject {code}', code=code) for code in ('tab-2', 'tab-1')]
+        cls.students = [
+            Student.objects.create(name=f'Student {i}', roll_number=f'tab-{i}', class_name=class_obj, session=cls.session)
+            for i in (2, 1)
+        ]
+        marks = [
+            (cls.students[0], cls.subjects[0], date(2025, 6, 1), '40'),
+            (cls.students[0], cls.subjects[0], date(2025, 6, 8), '50'),
+            (cls.students[0], cls.subjects[1], date(2025, 6, 1), '70'),
+            (cls.students[1], cls.subjects[1], date(2025, 6, 1), '33.5'),
+        ]
+        for student, subject, exam_date, cq_marks in marks:
+            ExamMark.objects.create(
+                exam_type=cls.exam_type, exam_date=exam_date, student=student, subject=subject,
+                session=cls.session, cq_marks=Decimal(cq_marks),
+            )
+
+    def test_pivot_in_roll_and_code_order(self):
+        # The first query checks whether the session is archived
+        with self.assertNumQueries(5):
+            sheet = TabulationSheet(self.session.pk, self.exam_type.pk)
+        self.assertEqual([subject['code'] for subject in sheet.subjects], ['tab-1', 'tab-2'])
+        rows = list(sheet.rows())
+        self.assertEqual([(row['roll_number'], row['marks'], row['total']) for row in rows], [
+            ('tab-1', ['33.50', None], '33.50'),
+            ('tab-2', ['70.00', '45.00'], '115.00'),
+        ])
+        self.assertEqual(sheet.subject_summary()[1], {
+            'subject': self.subjects[0].pk, 'code': 'tab-2', 'count': 1, 'average': '45.00', 'highest': '45.00',
+        })
+
+    def test_flat_rows_carry_the_stored_result(self):
+        compute_results(self.session.pk, self.exam_type.pk)
+        sheet = TabulationSheet(self.session.pk, self.exam_type.pk)
+        self.assertEqual(sheet.fields(), ['roll_number', 'name', 'tab-1', 'tab-2', 'total', 'gpa', 'grade', 'merit_rank'])
+        self.assertEqual(list(sheet.flat_rows())[1], {
+            'roll_number': 'tab-2', 'name': 'Student 2', 'tab-1': '70.00', 'tab-2': '45.00',
+            'total': '115.00', 'gpa': '3.00', 'grade': 'B', 'merit_rank': 1,
+        })
+
+    def test_endpoint_rejects_malformed_ids(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create(username='tab'))
+        params = {'session': self.session.pk, 'exam_type': self.exam_type.pk}
+        for param in ('session', 'exam_type', 'class_name'):
+            response = client.get('/api/v1/exams/marks/tabulation/', {**params, param: 'x'})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(client.get('/api/v1/exams/marks/tabulation/', params).data['count'], 2)
+
+
+class ExamSummaryRollupTests(TestCase):
+    """ExamSummary rows follow mark writes, and the report read from them matches the raw aggregates"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.class_obj = Class.objects.create(name='Summary', code='summary')
+        cls.session = Session.objects.create(name='Summary 2025')
+        cls.exam_types = [ExamType.objects.create(name=name) for name in ('CT-Exam', 'Mid-Term')]
+        cls.subjects = [Subject.objects.create(name=f'Subject {i}', code=f'summary-{i}') for i in range(2)]
+        cls.students = [
+            Student.objects.create(name=f'Student {i}', roll_number=f'summary-{i}', class_name=cls.class_obj, session=cls.session)
+            for i in range(4)
+        ]
+        for i, student in enumerate(cls.students):
+            for exam_type in cls.exam_types:
+                for subject in cls.subjects:
+                    ExamMark.objects.create(
+                        exam_type=exam_type, exam_date=date(2025, 9, 1), student=student, subject=subject,
+                        session=cls.session, cq_marks=Decimal(35 + 15 * i) if i < 3 else None,
+                        total_class=10 if i else 0, present=6 + i,
+                    )
+        cls.user = get_user_model().objects.create(username='summary')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def report(self, **params):
+        data = self.client.get('/api/v1/exams/marks/report/', params).data
+        return data['statistics'], data['grade_distribution']
+
+    def assertReportsMatch(self):
+        """The report from summaries equals the one aggregated from the marks (class_name forces that path)"""
+        exam_type, subject = self.exam_types[0].pk, self.subjects[0].pk
+        for params in ({}, {'session': self.session.pk}, {'exam_type_id': exam_type, 'subject': subject, 'session': self.session.pk}):
+            with self.subTest(**params):
+                self.assertEqual(self.report(**params), self.report(class_name=self.class_obj.pk, **params))
+
+    def summary(self):
+        return ExamSummary.objects.get(exam_type=self.exam_types[0], subject=self.subjects[0], session=self.session)
+
+    def test_report_from_summaries_matches_the_marks(self):
+        statistics, grades = self.report(exam_type_id=self.exam_types[0].pk, subject=self.subjects[0].pk)
+        self.assertEqual(statistics, {'total_records': 4, 'average_marks': Decimal('50.00'), 'average_attendance': 80.0})
+        self.assertEqual(grades, [
+            {'grade': None, 'count': 0}, {'grade': 'A-', 'count': 1}, {'grade': 'B', 'count': 1}, {'grade': 'F', 'count': 1},
+        ])
+        self.assertReportsMatch()
+
+    def test_summaries_follow_mark_writes(self):
+        summary = self.summary()
+        self.assertEqual((summary.mark_count, summary.graded_count, summary.marks_sum), (4, 3, Decimal('150')))
+
+        ExamMark.objects.create(
+            exam_type=self.exam_types[0], exam_date=date(2025, 9, 2), student=self.students[0], subject=self.subjects[0],
+            session=self.session, cq_marks=Decimal('90'), total_class=10, present=10,
+        )
+        summary = self.summary()
+        self.assertEqual((summary.mark_count, summary.marks_sum, summary.grade_counts['A+']), (5, Decimal('240'), 1))
+        self.assertReportsMatch()
+
+        mark = ExamMark.objects.get(student=self.students[3], exam_type=self.exam_types[0], subject=self.subjects[0])
+        mark.cq_marks = Decimal('70')
+        mark.save()
+        summary = self.summary()
+        self.assertEqual((summary.graded_count, summary.ungraded_count, summary.marks_sum), (5, 0, Decimal('310')))
+        self.assertReportsMatch()
+
+        ExamMark.objects.filter(student=self.students[0], exam_type=self.exam_types[0], subject=self.subjects[0]).delete()
+        summary = self.summary()
+        self.assertEqual((summary.mark_count, summary.marks_sum, summary.grade_counts.get('F')), (3, Decimal('185'), None))
+        self.assertReportsMatch()
+
+
+class StudentAttendanceRollupTests(TestCase):
+    """StudentAttendance rows follow every mark write"""
+
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Att', code='att')
+        cls.session = Session.objects.create(name='Att 2025')
+        cls.exam_types = [ExamType.objects.create(name=name) for name in ('CT-Exam', 'Mid-Term')]
+        cls.subjects = [Subject.objects.create(name=f'Subject {i}', code=f'att-{i}') for i in range(2)]
+        cls.student = Student.objects.create(name='Student', roll_number='att-1', class_name=class_obj, session=cls.session)
+
+    def mark(self, exam_type, subject, present, total_class=10):
+        return ExamMark.objects.create(
+            exam_type=exam_type, exam_date=date(2025, 3, 1), student=self.student, subject=subject,
+            session=self.session, total_class=total_class, present=present, absent=total_class - present,
+        )
+
+    def rollups(self):
+        return {
+            rollup.subject_id: (rollup.mark_count, rollup.attendance_count, rollup.present_sum, rollup.total_class_sum)
+            for rollup in StudentAttendance.objects.filter(student=self.student)
+        }
+
+    def test_writes_keep_the_rollups_current(self):
+        first = self.mark(self.exam_types[0], self.subjects[0], present=8)
+        self.mark(self.exam_types[1], self.subjects[0], present=5)
+        self.mark(self.exam_types[1], self.subjects[1], present=0, total_class=0)
+        self.assertEqual(self.rollups(), {self.subjects[0].pk: (2, 2, 13, 20), self.subjects[1].pk: (1, 0, 0, 0)})
+
+        first.subject = self.subjects[1]
+        first.save()
+        self.assertEqual(self.rollups(), {self.subjects[0].pk: (1, 1, 5, 10), self.subjects[1].pk: (2, 1, 8, 10)})
+
+        ExamMark.objects.filter(subject=self.subjects[0]).get().delete()
+        self.assertEqual(self.rollups(), {self.subjects[1].pk: (2, 1, 8, 10)})
+
+    def test_endpoint_reads_the_rollups_in_one_query(self):
+        self.mark(self.exam_types[0], self.subjects[0], present=8)
+        self.mark(self.exam_types[1], self.subjects[0], present=5)
+        self.mark(self.exam_types[0], self.subjects[1], present=10, total_class=20)
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create(username='att'))
+        # The two conditional GET validators, then the rollups
+        with self.assertNumQueries(3):
+            response = client.get(f'/api/v1/exams/attendance/{self.student.pk}/')
+        self.assertEqual(response.data['overall'], {
+            'marks': 3, 'classes_held': 40, 'present': 23, 'absent': 17,
+            'attendance_percentage': 57.5, 'average_attendance': 60.0,
+        })
+        self.assertEqual([row['subject_code'] for row in response.data['subjects']], ['att-0', 'att-1'])
+
+
+@override_settings(MARK_IMPORT_WORKERS=0, MEDIA_ROOT=tempfile.mkdtemp())
+class MarkImportTests(TestCase):
+    """Sheets are queued by the upload and imported by run_import()"""
+
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Imp', code='imp')
+        cls.session = Session.objects.create(name='Imp 2025')
+        cls.exam_type = ExamType.objects.create(name='CT-Exam')
+        Subject.objects.create(name='Physics', code='174')
+        Student.objects.create(name='Student', roll_number='2001', class_name=class_obj, session=cls.session)
+        cls.user = get_user_model().objects.create(username='imp')
+
+    def upload(self, name, content):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client, client.post('/api/v1/exams/imports/', {
+            'file': SimpleUploadedFile(name, content.encode()),
+            'session': self.session.pk, 'exam_type': self.exam_type.pk, 'exam_date': '2025-03-01',
+        }, format='multipart')
+
+    def test_rows_are_imported_and_bad_rows_reported(self):
+        client, response = self.upload('sheet.csv', (
+            'Roll Number,Subject Code,CQ Marks,MCT Marks,Lab Marks,Total Class,Present,Absent\n'
+            '2001,174,40,20,10,10,8,2\n'
+            '2002,174,40,20,10,10,8,2\n'
+            '2001,999,,,,,,\n'
+        ))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], MarkImport.PENDING)
+        self.assertFalse(ExamMark.objects.exists())
+
+        run_import(response.data['id'])
+        job = client.get(f"/api/v1/exams/imports/{response.data['id']}/").data
+        self.assertEqual(
+            [job[field] for field in ('status', 'progress', 'total_rows', 'saved_rows', 'failed_rows')],
+            [MarkImport.DONE, 100.0, 3, 1, 2],
+        )
+        mark = ExamMark.objects.get()
+        self.assertEqual((mark.student.roll_number, mark.total_marks, mark.exam_date), ('2001', Decimal('70.00'), date(2025, 3, 1)))
+
+        errors = client.get(f"/api/v1/exams/imports/{response.data['id']}/errors/").data['errors']
+        self.assertEqual([(error['row'], error['field']) for error in errors], [(3, 'roll_number'), (4, 'subject_code')])
+
+    def test_unreadable_sheets_fail_the_job(self):
+        _, response = self.upload('sheet.csv', 'name,marks\nStudent,70\n')
+        run_import(response.data['id'])
+        job = MarkImport.objects.get(pk=response.data['id'])
+        self.assertEqual((job.status, job.message), (MarkImport.FAILED, 'Missing column(s): roll_number, subject_code'))
+
+        _, response = self.upload('sheet.txt', 'roll_number,subject_code\n')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    """Polls of an unchanged marks list are answered with 304 from the table validators"""
+
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Cond', code='cond')
+        cls.session = Session.objects.create(name='Cond 2025')
+        cls.exam_type = ExamType.objects.create(name='CT-Exam')
+        cls.subject = Subject.objects.create(name='Physics', code='cond-174')
+        cls.student = Student.objects.create(name='Student', roll_number='cond-1', class_name=class_obj, session=cls.session)
+        cls.mark = ExamMark.objects.create(
+            exam_type=cls.exam_type, exam_date=date(2025, 3, 1), student=cls.student, subject=cls.subject,
+            session=cls.session, cq_marks=Decimal('40'),
+        )
+        cls.user = get_user_model().objects.create(username='cond')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/v1/exams/marks/?session={self.session.pk}'
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        # One aggregate per source table, then no list query at all
+        with self.assertNumQueries(6):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.mark.cq_marks = Decimal('45')
+        self.mark.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        self.student.name = 'Renamed'
+        self.student.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.data[0]['student_name']), (200, 'Renamed'))
+
+    def test_archiving_changes_the_etag(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.enterContext(override_settings(MARK_ARCHIVE_ROOT=root.name))
+        url = f'/api/v1/exams/marks/?exam_type={self.exam_type.pk}'
+        etag = self.client.get(url)['ETag']
+        call_command('archive_session', str(self.session.pk), stdout=io.StringIO())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, len(response.data)), (200, 0))
+
+        etag = response['ETag']
+        call_command('archive_session', str(self.session.pk), '--restore', stdout=io.StringIO())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, len(response.data)), (200, 1))
+
+
+@mock.patch('exams.changes.SETTLE', timedelta(0))
+class ChangeFeedTests(TestCase):
+    """The change feed sends each write once, and deletions as tombstones"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.classes = [Class.objects.create(name=f'Feed {i}', code=f'feed-{i}') for i in range(2)]
+        session = Session.objects.create(name='Feed 2025')
+        exam_type = ExamType.objects.create(name='CT-Exam')
+        subject = Subject.objects.create(name='Physics', code='feed-174')
+        cls.marks = [
+            ExamMark.objects.create(
+                exam_type=exam_type, exam_date=date(2025, 3, 1), subject=subject, session=session, cq_marks=Decimal('40'),
+                student=Student.objects.create(name=f'Student {i}', roll_number=f'feed-{i}', class_name=cls.classes[i % 2], session=session),
+            )
+            for i in range(4)
+        ]
+        cls.user = get_user_model().objects.create(username='feed')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, **params):
+        return self.client.get('/api/v1/exams/marks/changes/', params).data
+
+    def test_batches_then_incremental_changes(self):
+        first = self.sync(limit=3)
+        second = self.sync(cursor=first['cursor'], limit=3)
+        self.assertEqual((first['has_more'], second['has_more']), (True, False))
+        id_column = first['fields'].index('id')
+        self.assertEqual(
+            [row[id_column] for row in first['changes'] + second['changes']], [mark.pk for mark in self.marks]
+        )
+
+        updated, deleted = self.marks[1], self.marks[2].pk
+        updated.cq_marks = Decimal('45')
+        updated.save()
+        self.marks[2].delete()
+        batch = self.sync(cursor=second['cursor'])
+        self.assertEqual(([row[id_column] for row in batch['changes']], batch['deleted']), ([updated.pk], [deleted]))
+        self.assertEqual(self.sync(cursor=batch['cursor'])['changes'], [])
+
+    def test_class_scope(self):
+        class_id = self.classes[0].pk
+        cursor = self.sync(class_name=class_id)['cursor']
+        deleted = self.marks[0].pk
+        self.marks[0].delete()
+        self.marks[1].delete()
+        batch = self.sync(class_name=class_id, cursor=cursor)
+        self.assertEqual((batch['changes'], batch['deleted']), ([], [deleted]))
+
+    def test_moving_class_leaves_the_class_scope(self):
+        scopes = {'all': {}, 'old': {'class_name': self.classes[0].pk}, 'new': {'class_name': self.classes[1].pk}}
+        cursors = {scope: self.sync(**params)['cursor'] for scope, params in scopes.items()}
+        student = self.marks[2].student
+        student.class_name = self.classes[1]
+        student.save()
+        batches = {scope: self.sync(cursor=cursors[scope], **params) for scope, params in scopes.items()}
+        self.assertEqual({scope: (len(batch['changes']), batch['deleted']) for scope, batch in batches.items()}, {
+            'all': (1, []), 'old': (0, [self.marks[2].pk]), 'new': (1, []),
+        })
+
+    def test_malformed_cursor_and_scope(self):
+        cursor = base64.urlsafe_b64encode(b'[null]').decode()
+        for params in ({'cursor': cursor}, {'class_name': 'abc'}, {'session': '1x'}):
+            response = self.client.get('/api/v1/exams/marks/changes/', params)
+            self.assertEqual(response.status_code, 400)
+
+
+class ArchivedSessionTests(TestCase):
+    """Archived marks are served from their file as they were from ExamMark"""
+
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Arc', code='arc')
+        cls.session = Session.objects.create(name='Arc 2024')
+        cls.exam_type = ExamType.objects.create(name='Year Final')
+        subjects = [Subject.objects.create(name=f'Subject {i}', code=f'arc-{i}') for i in range(3)]
+        for i in range(6):
+            student = Student.objects.create(
+                name=f'Student {i}', roll_number=f'arc-{5 - i}', class_name=class_obj, session=cls.session, group='science',
+            )
+            for j, subject in enumerate(subjects):
+                ExamMark.objects.create(
+                    exam_type=cls.exam_type, exam_date=date(2024, 11, 1 + j % 2), student=student, subject=subject,
+                    session=cls.session, cq_marks=Decimal(f'{40 + i * 7 + j}.5') if i != 2 else None,
+                    lab_marks=10 * j or None, present=8 - j, absent=j, remarks='late' if i == j else None,
+                )
+        cls.user = get_user_model().objects.create(username='arc')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.enterContext(override_settings(MARK_ARCHIVE_ROOT=root.name))
+
+    def responses(self):
+        pages, url = [], f'/api/v1/exams/marks/?session={self.session.pk}&cursor=&page_size=4'
+        while url:
+            page = self.client.get(url).data
+            pages.append(page['results'])
+            url = page['next']
+        backwards, url = [], page['previous']
+        while url:
+            page = self.client.get(url).data
+            backwards.insert(0, page['results'])
+            url = page['previous']
+        mark_id = pages[1][2]['id']
+        return {
+            'pages': pages,
+            'backwards': backwards,
+            'filtered': self.client.get('/api/v1/exams/marks/', {
+                'session': self.session.pk, 'group': 'science', 'start_date': '2024-11-02', 'page_size': 5, 'page': 2,
+            }).data,
+            'report': self.client.get('/api/v1/exams/marks/report/', {'session': self.session.pk, 'student': pages[0][0]['student']}).data,
+            'detail': self.client.get(f'/api/v1/exams/marks/{mark_id}/').data,
+            'tabulation': self.client.get('/api/v1/exams/marks/tabulation/', {
+                'session': self.session.pk, 'exam_type': self.exam_type.pk,
+            }).data,
+        }
+
+    def test_archive_serve_and_restore(self):
+        live = self.responses()
+        call_command('archive_session', self.session.name, stdout=io.StringIO())
+        self.assertFalse(ExamMark.objects.filter(session=self.session).exists())
+        self.assertEqual(ArchivedSession.objects.get().mark_count, 18)
+        self.assertEqual(self.responses(), live)
+
+        call_command('archive_session', str(self.session.pk), '--restore', stdout=io.StringIO())
+        self.assertEqual(ExamMark.objects.filter(session=self.session).count(), 18)
+        self.assertEqual(self.responses(), live)
+
+    def test_archived_marks_are_read_only(self):
+        call_command('archive_session', str(self.session.pk), stdout=io.StringIO())
+        mark = {
+            'exam_type': self.exam_type.pk, 'exam_date': '2024-12-01', 'student': Student.objects.first().pk,
+            'subject': Subject.objects.first().pk, 'session': self.session.pk, 'cq_marks': '50',
+        }
+        response = self.client.post('/api/v1/exams/marks/', mark, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/v1/exams/marks/bulk_update/', {'marks': [mark]}, format='json')
+        self.assertEqual(response.data['errors'][0]['errors'], {'session': [ARCHIVED_SESSION]})
+        self.assertFalse(ExamMark.objects.exists())
+
+
+class SessionStatsTests(TestCase):
+    """exams.analytics answers from its in-memory frame, kept current by refreshes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Stat', code='stat')
+        cls.session = Session.objects.create(name='Stat 2025')
+        exam_type = ExamType.objects.create(name='Test')
+        cls.subjects = [Subject.objects.create(name=f'Subject {i}', code=f'stat-{i}') for i in range(2)]
+        cls.marks = [
+            ExamMark.objects.create(
+                exam_type=exam_type, exam_date=date(2025, 5, 1), subject=cls.subjects[i % 2], session=cls.session,
+                cq_marks=Decimal(cq_marks), total_class=10, present=i + 5,
+                student=Student.objects.create(name=f'Student {i}', roll_number=f'stat-{i}', class_name=class_obj, session=cls.session),
+            )
+            for i, cq_marks in enumerate(['10', '20', '30', '40', '50'])
+        ]
+        cls.user = get_user_model().objects.create(username='stat')
+
+    def setUp(self):
+        # Frames outlive the test transactions that are rolled back under them
+        analytics.reset()
+        self.addCleanup(analytics.reset)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def stats(self, **params):
+        return self.client.get('/api/v1/exams/marks/stats/', {'session': self.session.pk, **params})
+
+    def test_statistics_by_dimension(self):
+        data = self.stats(by='subject', percentiles='25,50', bins=4).data
+        self.assertEqual(data['histogram_edges'], [10.0, 20.0, 30.0, 40.0, 50.0])
+        self.assertEqual(data['overall'], {
+            'count': 5, 'mean': 30.0, 'median': 30.0, 'stddev': 14.14, 'min': 10.0, 'max': 50.0,
+            'percentiles': {'25': 20.0, '50': 30.0}, 'histogram': [1, 1, 1, 2],
+        })
+        self.assertEqual(
+            [(group['label'], group['count'], group['mean']) for group in data['groups']],
+            [('stat-0 Subject 0', 3, 30.0), ('stat-1 Subject 1', 2, 30.0)],
+        )
+        attendance = self.stats(metric='attendance', subject=self.subjects[1].pk).data['overall']
+        self.assertEqual((attendance['count'], attendance['mean']), (2, 70.0))
+        self.assertEqual(self.stats(metric='grade').status_code, 400)
+
+    def test_refreshed_from_changed_rows(self):
+        self.stats()
+        self.marks[0].cq_marks = Decimal('60')
+        self.marks[0].save()
+        self.marks[4].delete()
+        # Session, archive check, changed marks, tombstones
+        with self.assertNumQueries(4):
+            overall = self.stats().data['overall']
+        self.assertEqual((overall['count'], overall['min'], overall['max'], overall['mean']), (4, 20.0, 60.0, 37.5))
+
+    def test_class_move_keeps_the_mark(self):
+        self.stats()
+        student = self.marks[1].student
+        student.class_name = Class.objects.create(name='Stat B', code='stat-b')
+        student.save()
+        self.assertEqual(self.stats(by='class_name').data['overall']['count'], 5)
+        self.assertEqual(self.stats(class_name=student.class_name_id).data['overall']['count'], 1)
+
+    def test_mark_moved_to_another_session_leaves_the_frame(self):
+        self.stats()
+        other = Session.objects.create(name='Stat 2026')
+        self.marks[4].session = other
+        self.marks[4].save()
+        overall = self.stats().data['overall']
+        self.assertEqual((overall['count'], overall['max']), (4, 40.0))
+        self.assertEqual(self.client.get('/api/v1/exams/marks/stats/', {'session': other.pk}).data['overall']['count'], 1)
+
+    def test_bulk_move_to_another_session_leaves_the_frame(self):
+        self.stats()
+        other = Session.objects.create(name='Stat 2026')
+        response = self.client.post(
+            '/api/v1/exams/marks/bulk_update/', {'marks': [{'id': self.marks[4].pk, 'session': other.pk}]}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stats().data['overall']['count'], 4)
+
+    def test_lowest_value_falls_in_the_first_bin(self):
+        self.marks[4].delete()
+        # 66.666...%, 70%, 80% and 100% attendance
+        for mark, (total_class, present) in zip(self.marks, [(3, 2), (10, 7), (10, 8), (10, 10)]):
+            mark.total_class, mark.present = total_class, present
+            mark.save()
+        self.assertEqual(self.stats(metric='attendance', bins=4).data['overall']['histogram'], [2, 1, 0, 1])
+
+
+class MarkExportTests(TestCase):
+    """?format=csv|ndjson on the marks list and report stream the list rows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Export', code='export')
+        cls.session = Session.objects.create(name='Export 2025')
+        cls.exam_type = ExamType.objects.create(name='CT-Exam')
+        cls.subjects = [Subject.objects.create(name=f'Subject {i}', code=f'export-{i}') for i in range(2)]
+        for i in range(3):
+            student = Student.objects.create(
+                name=f'Student, {i}', roll_number=f'export-{i}', class_name=class_obj, session=cls.session, group='science',
+            )
+            for subject in cls.subjects:
+                ExamMark.objects.create(
+                    exam_type=cls.exam_type, exam_date=date(2025, 4, 1), student=student, subject=subject,
+                    session=cls.session, cq_marks=Decimal(50 + i), present=8, remarks='line one\nline two' if i else None,
+                )
+        cls.user = get_user_model().objects.create(username='export')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def listed(self, **params):
+        return self.client.get('/api/v1/exams/marks/', params).json()
+
+    def test_ndjson_rows_match_the_list(self):
+        response, content = self.export('/api/v1/exams/marks/', format='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="exam-marks.ndjson"')
+        self.assertEqual([json.loads(line) for line in content.splitlines()], self.listed())
+
+    def test_csv_rows_match_the_list(self):
+        response, content = self.export('/api/v1/exams/marks/', format='csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="exam-marks.csv"')
+        reader = csv.DictReader(io.StringIO(content))
+        self.assertEqual(reader.fieldnames, ExamMarkListSerializer.Meta.fields)
+        listed = [{name: '' if value is None else str(value) for name, value in row.items()} for row in self.listed()]
+        self.assertEqual(list(reader), listed)
+
+    def test_filters_and_fields(self):
+        subject = self.subjects[1].pk
+        _, content = self.export('/api/v1/exams/marks/', format='csv', subject=subject, fields='student_roll,cq_marks')
+        self.assertEqual(content.splitlines(), [
+            'student_roll,cq_marks', 'export-0,50.00', 'export-1,51.00', 'export-2,52.00',
+        ])
+        response, content = self.export(
+            '/api/v1/exams/marks/report/', format='ndjson', session=self.session.pk, subject=subject,
+        )
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="exam-marks-report.ndjson"')
+        self.assertEqual([json.loads(line) for line in content.splitlines()], self.listed(subject=subject))
+        _, content = self.export('/api/v1/exams/marks/', format='ndjson', session=Session.objects.create(name='Empty').pk)
+        self.assertEqual(content, '')
+
+
+class ExamMarkListRowsTests(TestCase):
+    """The values() fast path of ExamMarkListSerializer renders what the serializer does"""
+
+    @classmethod
+    def setUpTestData(cls):
+        classes = [Class.objects.create(name=f'Rows {i}', code=f'rows-{i}') for i in range(2)]
+        session = Session.objects.create(name='Rows 2025')
+        exam_types = [ExamType.objects.create(name=name) for name in ('CT-Exam', 'Year Final')]
+        subjects = [Subject.objects.create(name=f'Subject {i}', code=f'rows-{i}') for i in range(2)]
+        groups = [group for group, _ in Student.GROUP_CHOICES] + [None]
+        components = [
+            {'cq_marks': Decimal('45.5'), 'mct_marks': Decimal('20'), 'lab_marks': Decimal('12.25')},
+            {'cq_marks': Decimal('0')},
+            {'mct_marks': Decimal('33.3')},
+            {},
+        ]
+        for i, group in enumerate(groups):
+            student = Student.objects.create(
+                name=f'Student {i}', roll_number=f'rows-{i}', class_name=classes[i % 2], session=session, group=group,
+            )
+            for j, subject in enumerate(subjects):
+                ExamMark.objects.create(
+                    exam_type=exam_types[j], exam_date=date(2025, 2, 1 + i), student=student, subject=subject,
+                    session=session, total_class=10 - i, present=i, absent=10 - 2 * i, remarks='absent once' if j else None,
+                    **components[(i + j) % len(components)],
+                )
+
+    def test_rows_match_the_serializer(self):
+        marks = ExamMark.objects.order_by('-exam_date', 'student_roll', 'id')
+        serialized = ExamMarkListSerializer(marks.select_related('exam_type', 'student', 'subject', 'session'), many=True).data
+        fast = list(ExamMarkListSerializer.rows(ExamMarkListSerializer.values_queryset(marks)))
+        self.assertEqual(json.dumps(fast, cls=JSONEncoder), json.dumps(serialized, cls=JSONEncoder))
+
+
+class SparseFieldsTests(TestCase):
+    """?fields= and ?expand= of the marks list and detail"""
+
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Sparse', code='sparse')
+        session = Session.objects.create(name='Sparse 2025')
+        exam_type = ExamType.objects.create(name='CT-Exam')
+        subjects = [Subject.objects.create(name=f'Subject {i}', code=f'sparse-{i}') for i in range(2)]
+        for i in range(4):
+            student = Student.objects.create(
+                name=f'Student {i}', roll_number=f'sparse-{i}', class_name=class_obj, session=session, group='science',
+            )
+            for subject in subjects:
+                ExamMark.objects.create(
+                    exam_type=exam_type, exam_date=date(2025, 3, 1), student=student, subject=subject,
+                    session=session, cq_marks=Decimal(40 + i), present=7 + i % 2,
+                )
+        cls.user = get_user_model().objects.create(username='sparse')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_every_field_named_matches_the_full_list(self):
+        full = self.get('/api/v1/exams/marks/')
+        self.assertEqual(self.get('/api/v1/exams/marks/', fields=','.join(full[0])), full)
+
+    def test_list_fields_and_cursor(self):
+        page = self.get('/api/v1/exams/marks/', fields='student_roll,total_marks', cursor='', page_size=5)
+        self.assertEqual(page['results'][0], {'student_roll': 'sparse-0', 'total_marks': '40.00'})
+        rows = page['results'] + self.client.get(page['next']).json()['results']
+        self.assertEqual(len(rows), 8)
+
+    def test_list_expand(self):
+        row = self.get('/api/v1/exams/marks/', fields='id,student,subject_code', expand='student')[0]
+        self.assertEqual(set(row), {'id', 'student', 'subject_code'})
+        self.assertEqual(row['student'], {
+            'id': Student.objects.get(roll_number='sparse-0').pk, 'name': 'Student 0', 'roll_number': 'sparse-0', 'group': 'Science',
+        })
+
+    def test_detail(self):
+        mark = ExamMark.objects.order_by('pk').first()
+        url = f'/api/v1/exams/marks/{mark.pk}/'
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(url)['student_details']['class'], 'Sparse')
+        with CaptureQueriesContext(connection) as queries:
+            body = self.get(url, fields='id,total_marks,subject', expand='subject')
+        self.assertEqual(body, {'id': mark.pk, 'subject': {'id': mark.subject_id, 'name': 'Subject 0', 'code': 'sparse-0'}, 'total_marks': '40.00'})
+        self.assertNotIn('students_student', queries[0]['sql'])
@@ -4,7 +4,10 @@ from . import views
 
 router = DefaultRouter()
 router.register(r'marks', views.ExamMarkViewSet, basename='exammark')
+router.register(r'results', views.StudentResultViewSet, basename='studentresult')
+router.register(r'imports', views.MarkImportViewSet, basename='markimport')
 
 urlpatterns = [
+    path('attendance/<int:student_id>/', views.StudentAttendanceView.as_view(), name='student_attendance'),
     path('', include(router.urls)),
 ]
@@ -1,24 +1,60 @@
+from django.http import Http404
 from django.shortcuts import render
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Cast
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
-from .models import ExamMark, ExamType
+from . import analytics, archive, changes, imports
+from .models import ArchivedSession, ExamMark, ExamSummary, ExamType, MarkImport, StudentAttendance, StudentResult
+from .bulk import bulk_upsert_marks
+from .pagination import ORDERING, ExamMarkPagination
+from .results import compute_results
+from .tabulation import TabulationSheet
+from .rollups import attendance_figures, average_attendance, combine_summaries
 from .serializers import (
     ExamMarkListSerializer, ExamMarkDetailSerializer,
-    ExamMarkCreateUpdateSerializer
+    ExamMarkCreateUpdateSerializer, MarkImportErrorSerializer, MarkImportSerializer, StudentResultSerializer
 )
 from students.models import Student
 from academics.models import Subject, Session
+from college_project.conditional import conditional_get
+from college_project.sparse import requested_expansions, requested_fields, sparse_queryset
+from college_project.streaming import CHUNK_SIZE, RENDERER_CLASSES, export_format, streaming_response
+
+
+def mark_list_sources(view):
+    """
+    Tables the marks list reads. Every mark write refreshes the
+    ExamSummary of its exam, so the summaries stand in for the marks;
+    the copies a student's save writes onto their marks show in Student.
+    Archiving or restoring a session moves its marks without touching
+    the summaries, and shows in ArchivedSession.
+    """
+    params = view.request.query_params
+    summaries = ExamSummary.objects.filter(**{
+        field: params[param] for param, field in view.SUMMARY_FILTERS.items() if params.get(param)
+    })
+    return [summaries, ArchivedSession, Student, Subject, ExamType, Session]
+
+
+def student_attendance_sources(view):
+    rollups = StudentAttendance.objects.filter(student_id=view.kwargs['student_id'])
+    if view.request.query_params.get('session'):
+        rollups = rollups.filter(session_id=view.request.query_params['session'])
+    return [rollups, Subject]
 
 
 class ExamMarkViewSet(viewsets.ModelViewSet):
     """ViewSet for managing exam marks with filtering and bulk operations"""
-    queryset = ExamMark.objects.prefetch_related('student', 'subject', 'session').all()
+    queryset = ExamMark.objects.select_related('exam_type', 'student', 'subject', 'session').all()
     serializer_class = ExamMarkListSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERER_CLASSES
+    pagination_class = ExamMarkPagination
     
     def get_serializer_class(self):
         """Return appropriate serializer based on action"""
@@ -28,6 +64,17 @@ class ExamMarkViewSet(viewsets.ModelViewSet):
             return ExamMarkCreateUpdateSerializer
         return ExamMarkListSerializer
     
+    def get_serializer(self, *args, **kwargs):
+        """A list body creates several marks at once (updates take one mark)"""
+        if self.action == 'create' and isinstance(kwargs.get('data'), list):
+            kwargs['many'] = True
+        return super().get_serializer(*args, **kwargs)
+    
+    def perform_create(self, serializer):
+        """Marks posted together are saved together"""
+        with transaction.atomic():
+            serializer.save()
+    
     def get_queryset(self):
         """Filter exam marks based on query parameters"""
         queryset = super().get_queryset()
@@ -50,7 +97,12 @@ class ExamMarkViewSet(viewsets.ModelViewSet):
         # Filter by student group
         group = self.request.query_params.get('group', None)
         if group:
-            queryset = queryset.filter(student__group=group)
+            queryset = queryset.filter(student_group=group)
+        
+        # Filter by student class
+        class_id = self.request.query_params.get('class_name', None)
+        if class_id:
+            queryset = queryset.filter(student_class_id=class_id)
         
         # Filter by student
         student_id = self.request.query_params.get('student', None)
@@ -65,7 +117,78 @@ class ExamMarkViewSet(viewsets.ModelViewSet):
         if end_date:
             queryset = queryset.filter(exam_date__lte=end_date)
         
-        return queryset.order_by('-exam_date', 'student__roll_number')
+        if self.action == 'retrieve':
+            # student_details reads the student's class
+            queryset = sparse_queryset(queryset.select_related('student__class_name'), ExamMarkDetailSerializer, self.request)
+        return queryset.order_by(*ORDERING)
+    
+    def get_archived_marks(self):
+        """
+        The requested marks, read from the archive file, when ?session=
+        names an archived session; None otherwise
+        """
+        session_id = self.request.query_params.get('session', None)
+        session_archive = archive.open_session_archive(session_id) if session_id else None
+        if session_archive is None:
+            return None
+        return session_archive.marks().filter_params(self.request.query_params)
+    
+    def get_marks(self):
+        """get_queryset(), or the archived marks it stands for"""
+        archived = self.get_archived_marks()
+        return archived if archived is not None else self.filter_queryset(self.get_queryset())
+    
+    def get_object(self):
+        """A mark by id; marks of archived sessions are found in their archive for reading"""
+        try:
+            return super().get_object()
+        except Http404:
+            if self.action != 'retrieve' or not str(self.kwargs['pk']).isdigit():
+                raise
+            mark = archive.find_archived_mark(int(self.kwargs['pk']))
+            if mark is None:
+                raise
+            return mark
+    
+    @staticmethod
+    def mark_values(marks, fields=None, expand=()):
+        """values_queryset() of marks; archived marks already come in that shape"""
+        if isinstance(marks, archive.ArchivedMarks):
+            return marks
+        return ExamMarkListSerializer.values_queryset(marks, fields, expand)
+    
+    def mark_rows(self, marks):
+        """List rows of marks, with the ?fields= and ?expand= of the request"""
+        fields, expand = requested_fields(self.request), requested_expansions(self.request)
+        return ExamMarkListSerializer.rows(self.mark_values(marks, fields, expand), fields, expand)
+    
+    @conditional_get(mark_list_sources)
+    def list(self, request, *args, **kwargs):
+        """List exam marks; ?format=csv|ndjson streams every matching mark"""
+        marks = self.get_marks()
+        fmt = export_format(request)
+        if fmt:
+            return self.export(marks, fmt, 'exam-marks')
+        
+        fields, expand = requested_fields(request), requested_expansions(request)
+        values = self.mark_values(marks, fields, expand)
+        page = self.paginate_queryset(values)
+        if page is not None:
+            return self.get_paginated_response(list(ExamMarkListSerializer.rows(page, fields, expand)))
+        return Response(list(ExamMarkListSerializer.rows(values, fields, expand)))
+    
+    def export(self, marks, fmt, filename):
+        """
+        Stream marks in list format, reading them in chunks from a
+        server-side cursor (or the archive). ?fields= applies, ?expand=
+        does not: columns stay flat.
+        """
+        fields = requested_fields(self.request)
+        values = self.mark_values(marks, fields)
+        if not isinstance(values, archive.ArchivedMarks):
+            values = values.iterator(chunk_size=CHUNK_SIZE)
+        columns = [name for name in ExamMarkListSerializer.Meta.fields if fields is None or name in fields]
+        return streaming_response(ExamMarkListSerializer.rows(values, fields), fmt, filename, fields=columns)
     
     @action(detail=False, methods=['get'])
     def by_exam_type(self, request):
@@ -77,8 +200,8 @@ class ExamMarkViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        marks = self.get_queryset().filter(exam_type_id=exam_type_id)
-        serializer = self.get_serializer(marks, many=True)
+        marks = self.get_marks().filter(exam_type_id=exam_type_id)
+        rows = list(self.mark_rows(marks))
         
         try:
             exam_type = ExamType.objects.get(id=exam_type_id)
@@ -88,8 +211,8 @@ class ExamMarkViewSet(viewsets.ModelViewSet):
         
         return Response({
             'exam_type': exam_name,
-            'count': marks.count(),
-            'marks': serializer.data
+            'count': len(rows),
+            'marks': rows
         })
     
     @action(detail=False, methods=['get'])
@@ -100,7 +223,11 @@ class ExamMarkViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def bulk_update(self, request):
-        """Bulk update marks for multiple students"""
+        """
+        Bulk create/update marks for multiple students.
+        Rows with an id update that mark, other rows are upserted on the
+        exam/date/student/subject/session key (see exams.bulk).
+        """
         marks_data = request.data.get('marks', [])
         
         if not marks_data:
@@ -109,35 +236,7 @@ class ExamMarkViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        updated_count = 0
-        errors = []
-        
-        for mark_data in marks_data:
-            try:
-                mark_id = mark_data.get('id')
-                if mark_id:
-                    # Update existing
-                    mark = ExamMark.objects.get(id=mark_id)
-                    serializer = ExamMarkCreateUpdateSerializer(
-                        mark, data=mark_data, partial=True
-                    )
-                else:
-                    # Create new
-                    serializer = ExamMarkCreateUpdateSerializer(data=mark_data)
-                
-                if serializer.is_valid():
-                    serializer.save()
-                    updated_count += 1
-                else:
-                    errors.append({
-                        'student_id': mark_data.get('student'),
-                        'errors': serializer.errors
-                    })
-            except ExamMark.DoesNotExist:
-                errors.append({
-                    'id': mark_id,
-                    'error': 'ExamMark not found'
-                })
+        updated_count, errors = bulk_upsert_marks(marks_data)
         
         return Response({
             'updated': updated_count,
@@ -147,12 +246,12 @@ class ExamMarkViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def report(self, request):
-        """Generate report for exam marks"""
+        """Generate report for exam marks (?format=csv|ndjson streams the marks)"""
         exam_type_id = request.query_params.get('exam_type_id', None)
         subject_id = request.query_params.get('subject', None)
         session_id = request.query_params.get('session', None)
         
-        marks = self.get_queryset()
+        marks = self.get_marks()
         
         if exam_type_id:
             marks = marks.filter(exam_type_id=exam_type_id)
@@ -161,17 +260,13 @@ class ExamMarkViewSet(viewsets.ModelViewSet):
         if session_id:
             marks = marks.filter(session_id=session_id)
         
-        # Calculate statistics
-        total_records = marks.count()
-        avg_total_marks = marks.filter(total_marks__isnull=False).aggregate(
-            avg=models.Avg('total_marks')
-        )['avg']
-        avg_attendance = marks.filter(total_class__gt=0).aggregate(
-            avg=models.Avg(models.F('present') * 100 / models.F('total_class'), output_field=models.FloatField())
-        )['avg']
+        # Exports carry the marks only; statistics stay in the JSON report
+        fmt = export_format(request)
+        if fmt:
+            return self.export(marks, fmt, 'exam-marks-report')
         
-        # Get grade distribution
-        grade_counts = marks.values('grade').annotate(count=models.Count('grade')).order_by('grade')
+        # Calculate statistics
+        stats = self.report_statistics(marks)
         
         return Response({
             'filters': {
@@ -180,10 +275,334 @@ class ExamMarkViewSet(viewsets.ModelViewSet):
                 'session_id': session_id,
             },
             'statistics': {
-                'total_records': total_records,
-                'average_marks': round(avg_total_marks, 2) if avg_total_marks else 0,
-                'average_attendance': round(avg_attendance, 2) if avg_attendance else 0,
+                'total_records': stats['total_records'],
+                'average_marks': round(stats['average_marks'], 2) if stats['average_marks'] else 0,
+                'average_attendance': round(stats['average_attendance'], 2) if stats['average_attendance'] else 0,
             },
-            'grade_distribution': list(grade_counts),
-            'marks': ExamMarkListSerializer(marks, many=True).data
+            'grade_distribution': stats['grade_distribution'],
+            'marks': list(self.mark_rows(marks))
+        })
+    
+    @action(detail=False, methods=['get'])
+    def tabulation(self, request):
+        """
+        Tabulation sheet of an exam: one row per student, one column per
+        subject (?format=csv|ndjson streams the rows)
+        """
+        session_id = request.query_params.get('session', None)
+        exam_type_id = request.query_params.get('exam_type', None)
+        if not session_id or not exam_type_id:
+            return Response(
+                {'error': 'session and exam_type are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        class_id = request.query_params.get('class_name', None)
+        for param, value in (('session', session_id), ('exam_type', exam_type_id), ('class_name', class_id)):
+            if value and not value.isdigit():
+                return Response({'error': f'{param} must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        sheet = TabulationSheet(
+            session_id, exam_type_id,
+            class_id=class_id,
+            group=request.query_params.get('group', None),
+        )
+        fmt = export_format(request)
+        if fmt:
+            return streaming_response(sheet.flat_rows(), fmt, 'tabulation-sheet', fields=sheet.fields())
+        
+        return Response({
+            'session': session_id,
+            'exam_type': exam_type_id,
+            'subjects': sheet.subjects,
+            'subject_summary': sheet.subject_summary(),
+            'count': len(sheet.students),
+            'rows': list(sheet.rows()),
+        })
+    
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Statistics of a session's marks (mean, median, standard deviation,
+        percentiles, histogram) of ?metric= overall and per ?by= dimension,
+        computed in memory by exams.analytics
+        """
+        session_id = request.query_params.get('session', None)
+        if not session_id or not session_id.isdigit():
+            return Response(
+                {'error': 'session parameter is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not Session.objects.filter(pk=session_id).exists():
+            return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            return Response(analytics.session_stats(int(session_id), request.query_params))
+        except analytics.StatsError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Change feed: marks written and deleted after ?cursor= (from the
+        beginning without one), ?limit= rows per batch. Follow the returned
+        cursor while has_more is true, then poll with it.
+        """
+        limit = request.query_params.get('limit', None)
+        if limit is not None and (not limit.isdigit() or not 1 <= int(limit) <= changes.MAX_BATCH_SIZE):
+            return Response(
+                {'error': f'limit must be between 1 and {changes.MAX_BATCH_SIZE}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            batch = changes.read_changes(
+                request.query_params, request.query_params.get('cursor', None), int(limit or changes.BATCH_SIZE)
+            )
+        except (changes.InvalidCursor, changes.InvalidScope) as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(batch)
+    
+    # get_queryset filters that ExamSummary rows cannot answer
+    RAW_FILTERS = ('group', 'class_name', 'student', 'start_date', 'end_date')
+    
+    # Query parameters ExamSummary rows can answer, and their field
+    SUMMARY_FILTERS = {'exam_type': 'exam_type_id', 'subject': 'subject_id', 'session': 'session_id'}
+    
+    def get_summaries(self, extra_filters=None):
+        """ExamSummary rows covering the requested marks, None if a filter needs the raw marks"""
+        params = self.request.query_params
+        if any(params.get(name) for name in self.RAW_FILTERS):
+            return None
+        summaries = ExamSummary.objects.all()
+        for param, field in {**self.SUMMARY_FILTERS, **(extra_filters or {})}.items():
+            if params.get(param):
+                summaries = summaries.filter(**{field: params[param]})
+        return summaries
+    
+    def estimate_count(self):
+        """Number of listed marks taken from the rollups, None when they cannot tell"""
+        summaries = self.get_summaries()
+        if summaries is None:
+            return None
+        return summaries.aggregate(total=models.Sum('mark_count'))['total'] or 0
+    
+    # Query parameters StudentAttendance rows can answer, and their field;
+    # any other filter needs the raw marks
+    ATTENDANCE_FILTERS = {'student': 'student_id', 'subject': 'subject_id', 'session': 'session_id'}
+    
+    def get_student_attendance(self):
+        """StudentAttendance rows covering the attendance of one student's requested marks, or None"""
+        params = self.request.query_params
+        if not params.get('student'):
+            return None
+        if any(params.get(name) for name in params if name not in self.ATTENDANCE_FILTERS and name != 'format'):
+            return None
+        rollups = StudentAttendance.objects.all()
+        for param, field in self.ATTENDANCE_FILTERS.items():
+            if params.get(param):
+                rollups = rollups.filter(**{field: params[param]})
+        return rollups
+    
+    def report_statistics(self, marks):
+        """
+        Report statistics. While only exam type/subject/session filters are
+        applied they are read from the matching ExamSummary rows (a single
+        row when all three are given); other filters aggregate the marks,
+        except for the attendance of one student, which is read from the
+        StudentAttendance rows. Archived marks are aggregated in Python.
+        """
+        summaries = self.get_summaries({'exam_type_id': 'exam_type_id'})
+        if summaries is not None:
+            return combine_summaries(summaries)
+        if isinstance(marks, archive.ArchivedMarks):
+            return marks.statistics()
+        
+        marks = marks.order_by()
+        rollups = self.get_student_attendance()
+        if rollups is not None:
+            attendance = average_attendance(list(rollups))
+        else:
+            attendance = marks.filter(total_class__gt=0).aggregate(
+                avg=models.Avg(Cast('present', models.FloatField()) * 100 / models.F('total_class'))
+            )['avg']
+        return {
+            'total_records': marks.count(),
+            'average_marks': marks.filter(total_marks__isnull=False).aggregate(avg=models.Avg('total_marks'))['avg'],
+            'average_attendance': attendance,
+            'grade_distribution': list(marks.values('grade').annotate(count=models.Count('grade')).order_by('grade')),
+        }
+
+
+class StudentResultViewSet(viewsets.ReadOnlyModelViewSet):
+    """Computed GPA results per student, session and exam type"""
+    queryset = StudentResult.objects.select_related('student', 'exam_type').all()
+    serializer_class = StudentResultSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        """Filter results by session, exam type or student"""
+        queryset = super().get_queryset()
+        for param in ('session', 'exam_type', 'student'):
+            value = self.request.query_params.get(param, None)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({param: ['Must be an id.']})
+                queryset = queryset.filter(**{f'{param}_id': value})
+        return queryset
+    
+    @action(detail=False, methods=['get'])
+    def merit(self, request):
+        """
+        Merit list of a session/exam, or of one class (?class_name=) or
+        group (?group=) in it, from the stored ranks. ?top=N keeps the
+        first N positions (students sharing a position all included).
+        """
+        session_id = request.query_params.get('session', None)
+        exam_type_id = request.query_params.get('exam_type', None)
+        if not session_id or not exam_type_id:
+            return Response(
+                {'error': 'session and exam_type are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        class_id = request.query_params.get('class_name', None)
+        for param, value in (('session', session_id), ('exam_type', exam_type_id), ('class_name', class_id)):
+            if value and not value.isdigit():
+                return Response({'error': f'{param} must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = StudentResult.objects.select_related('student', 'exam_type').filter(
+            session_id=session_id, exam_type_id=exam_type_id
+        )
+        group = request.query_params.get('group', None)
+        if class_id:
+            scope, rank = 'class', 'class_rank'
+            results = results.filter(student_class_id=class_id)
+        elif group:
+            scope, rank = 'group', 'group_rank'
+            results = results.filter(student_group=group)
+        else:
+            scope, rank = 'session', 'merit_rank'
+        
+        top = request.query_params.get('top', None)
+        if top:
+            if not top.isdigit() or int(top) < 1:
+                return Response(
+                    {'error': 'top must be a positive integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            results = results.filter(**{f'{rank}__lte': int(top)})
+        
+        serializer = self.get_serializer(results.order_by(rank, 'student_id'), many=True)
+        return Response({
+            'scope': scope,
+            'rank_field': rank,
+            'count': len(serializer.data),
+            'results': serializer.data
+        })
+    
+    @action(detail=False, methods=['post'])
+    def compute(self, request):
+        """Compute the results of every student of a session for one exam type"""
+        session_id = request.data.get('session') or request.query_params.get('session')
+        exam_type_id = request.data.get('exam_type') or request.query_params.get('exam_type')
+        if not session_id or not exam_type_id:
+            return Response(
+                {'error': 'session and exam_type are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            session = Session.objects.get(pk=session_id)
+            exam_type = ExamType.objects.get(pk=exam_type_id)
+        except (Session.DoesNotExist, ExamType.DoesNotExist, ValueError):
+            return Response(
+                {'error': 'Session or exam type not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if archive.archived_session_ids([session.pk]):
+            return Response(
+                {'error': 'The marks of this session are archived; its stored results are final'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        computed = compute_results(session.pk, exam_type.pk)
+        return Response({
+            'session': session.name,
+            'exam_type': exam_type.name,
+            'computed': computed,
+        })
+
+
+class StudentAttendanceView(APIView):
+    """
+    Attendance of one student, overall and per subject (?session= to
+    limit it to a session), read from the StudentAttendance rollups
+    """
+    permission_classes = [IsAuthenticated]
+    
+    @conditional_get(student_attendance_sources)
+    def get(self, request, student_id):
+        rollups = StudentAttendance.objects.select_related('subject').filter(student_id=student_id)
+        session_id = request.query_params.get('session', None)
+        if session_id:
+            rollups = rollups.filter(session_id=session_id)
+        rollups = list(rollups.order_by('session_id', 'subject__code'))
+        
+        if not rollups and not Student.objects.filter(pk=student_id).exists():
+            return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'student': student_id,
+            'session': session_id,
+            'overall': attendance_figures(rollups),
+            'subjects': [
+                {
+                    'subject': rollup.subject_id,
+                    'subject_name': rollup.subject.name,
+                    'subject_code': rollup.subject.code,
+                    'session': rollup.session_id,
+                    **attendance_figures([rollup]),
+                }
+                for rollup in rollups
+            ],
+        })
+
+
+class MarkImportViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Upload a CSV/XLSX mark sheet for background import, then poll the job
+    for its progress and row errors
+    """
+    queryset = MarkImport.objects.select_related('session', 'exam_type').all()
+    serializer_class = MarkImportSerializer
+    permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERER_CLASSES
+    
+    def create(self, request, *args, **kwargs):
+        """Store the sheet and queue it; answers 202 with the job before any row is read"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            job = serializer.save(uploaded_by=request.user)
+            imports.enqueue(job)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def errors(self, request, pk=None):
+        """Row errors of an import in sheet order (?format=csv|ndjson streams them)"""
+        job = self.get_object()
+        row_errors = job.row_errors.order_by('row', 'id')
+        fields = MarkImportErrorSerializer.Meta.fields
+        
+        fmt = export_format(request)
+        if fmt:
+            return streaming_response(
+                row_errors.values(*fields).iterator(chunk_size=CHUNK_SIZE), fmt, f'mark-import-{job.pk}-errors', fields
+            )
+        
+        return Response({
+            'id': job.pk,
+            'status': job.status,
+            'failed_rows': job.failed_rows,
+            'count': row_errors.count(),
+            'errors': MarkImportErrorSerializer(row_errors, many=True).data
         })
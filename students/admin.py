@@ -1,9 +1,11 @@
 from django.contrib import admin
+from dashboard.search import STUDENT, IndexedSearchMixin
 from django.utils.html import format_html
 from .models import Student
 
 @admin.register(Student)
-class StudentAdmin(admin.ModelAdmin):
+class StudentAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    search_type = STUDENT
     list_display = ('name', 'roll_number', 'get_user', 'group', 'get_subjects_display', 'class_name', 'session')
     search_fields = ('name', 'roll_number', 'email', 'user__username')
     list_filter = ('class_name', 'session', 'group')
@@ -35,13 +37,11 @@ class StudentAdmin(admin.ModelAdmin):
     get_user.short_description = 'User Account'
     
     def get_subjects_display(self, obj):
-        """Display all subjects with || separator"""
-        subjects = obj.subjects.all()
-        if subjects:
-            subject_names = [s.name for s in subjects]
+        """Display all subjects with || separator, from the column stored on the student"""
+        if obj.subjects_display:
             return format_html(
                 '<div style="max-width: 400px; word-wrap: break-word; white-space: normal;">{}</div>',
-                ' || '.join(subject_names)
+                obj.subjects_display
             )
         return '-'
     get_subjects_display.short_description = 'Subjects'
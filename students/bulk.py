@@ -0,0 +1,127 @@
+"""
+Set-based enrollment of students in subjects.
+
+The students (a queryset: by roll numbers or by class/session/group)
+are enrolled in every subject of a list at once: their ids and the
+pairs already in the Student.subjects through table are read in one
+query each, and only the missing rows are inserted, in batches, with
+bulk_create(ignore_conflicts=True). Unenrolling is a single DELETE on
+the through table. Neither sends m2m_changed, so the enrollment index
+(students.enrollment) is updated here, after the transaction commits.
+
+Each student also stores their subject names, codes and count
+(SUBJECT_COLUMNS), so that lists and reports read no enrollments.
+refresh_subject_columns() recomputes them for a set of students; it is
+called here and by the handlers of students.signals.
+"""
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from academics.models import Subject
+from . import enrollment
+from .models import SUBJECT_COLUMNS, SUBJECT_SEPARATOR, Student
+
+
+BATCH_SIZE = 2000
+
+Enrollment = Student.subjects.through
+
+# The order of Student.subjects.all(), followed from the through table
+SUBJECT_ORDER = [
+    f'-subject__{name[1:]}' if name.startswith('-') else f'subject__{name}' for name in Subject._meta.ordering
+]
+
+
+def selected_students(rolls=None, class_name=None, session=None, group=None):
+    """Students by roll number, or by class, session and group (ids)"""
+    students = Student.objects.order_by()
+    if rolls is not None:
+        students = students.filter(roll_number__in=rolls)
+    for field, value in (('class_name_id', class_name), ('session_id', session), ('group', group)):
+        if value is not None:
+            students = students.filter(**{field: value})
+    return students
+
+
+def refresh_subject_columns(student_ids):
+    """
+    Recompute the stored subject names, codes and count of students from
+    their enrollments: one query of the through table and one of the
+    students per batch, then one UPDATE per distinct set of subjects among
+    the rows that changed (a cohort enrolled together shares one). Returns
+    {student id: values} of those rows.
+    """
+    student_ids = sorted(set(student_ids))
+    refreshed = {}
+    now = timezone.now()
+    for start in range(0, len(student_ids), BATCH_SIZE):
+        batch = student_ids[start:start + BATCH_SIZE]
+        names, codes = defaultdict(list), defaultdict(list)
+        rows = Enrollment.objects.filter(student_id__in=batch).order_by('student_id', *SUBJECT_ORDER)
+        for student_id, name, code in rows.values_list('student_id', 'subject__name', 'subject__code'):
+            names[student_id].append(name)
+            codes[student_id].append(code)
+
+        changed = defaultdict(list)
+        for student_id, *stored in Student.objects.filter(pk__in=batch).order_by().values_list('pk', *SUBJECT_COLUMNS):
+            values = (
+                SUBJECT_SEPARATOR.join(names[student_id]),
+                SUBJECT_SEPARATOR.join(codes[student_id]),
+                len(names[student_id]),
+            )
+            if values != tuple(stored):
+                changed[values].append(student_id)
+        for values, pks in changed.items():
+            columns = dict(zip(SUBJECT_COLUMNS, values), updated_at=now)
+            Student.objects.filter(pk__in=pks).update(**columns)
+            refreshed.update(dict.fromkeys(pks, columns))
+    return refreshed
+
+
+def _update_index(student_ids, subject_ids, enrolled):
+    def change(index):
+        index.enroll(student_ids, subject_ids, enrolled)
+    transaction.on_commit(partial(enrollment.update, change))
+
+
+def enroll(students, subject_ids):
+    """Enroll every student of a queryset in every subject of subject_ids"""
+    subject_ids = sorted(set(subject_ids))
+    with transaction.atomic():
+        student_ids = list(students.values_list('pk', flat=True))
+        existing = set(
+            Enrollment.objects.filter(student__in=students.values('pk'), subject_id__in=subject_ids)
+            .values_list('student_id', 'subject_id')
+        )
+        missing = [
+            Enrollment(student_id=student_id, subject_id=subject_id)
+            for student_id in student_ids
+            for subject_id in subject_ids
+            if (student_id, subject_id) not in existing
+        ]
+        # A pair enrolled meanwhile by someone else is skipped, not an error
+        Enrollment.objects.bulk_create(missing, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        if missing:
+            refresh_subject_columns({row.student_id for row in missing})
+        _update_index(student_ids, subject_ids, enrolled=True)
+    return {
+        'students': len(student_ids),
+        'subjects': len(subject_ids),
+        'enrolled': len(missing),
+        'already_enrolled': len(existing),
+    }
+
+
+def unenroll(students, subject_ids):
+    """Remove every student of a queryset from every subject of subject_ids"""
+    subject_ids = sorted(set(subject_ids))
+    with transaction.atomic():
+        student_ids = list(students.values_list('pk', flat=True))
+        removed, _ = Enrollment.objects.filter(student__in=students.values('pk'), subject_id__in=subject_ids).delete()
+        if removed:
+            refresh_subject_columns(student_ids)
+        _update_index(student_ids, subject_ids, enrolled=False)
+    return {'students': len(student_ids), 'subjects': len(subject_ids), 'unenrolled': removed}
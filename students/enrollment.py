@@ -0,0 +1,214 @@
+"""
+In-memory index of subject enrollments.
+
+Every student gets a dense position, and each subject, session, class
+and group a bitmap over those positions: a Python int whose bit n is set
+when the student at position n belongs to it. A subject combination is
+then answered with a few big-integer AND/OR/AND NOT operations and a
+bit count, instead of stacked joins on the Student.subjects through
+table.
+
+The index is built once per process from the through table and the
+students, then kept current by the signal handlers of students.signals
+as enrollments and students change (after their transaction commits).
+As in exams.grading, a version key in the shared cache tells the other
+processes to rebuild theirs on their next request or batch (see
+college_project.versioned). Writes that send no signals (bulk_create of
+students or of through rows, raw SQL) must call invalidate() themselves.
+"""
+from college_project.versioned import VersionedLocal
+from .models import Student
+
+
+VERSION_CACHE_KEY = 'students:enrollment_index_version'
+
+
+class EnrollmentError(ValueError):
+    """The parameters of an enrollment query are not usable"""
+
+
+def positions(bits):
+    """Positions of the set bits of an int, in increasing order"""
+    text = bin(bits)[:1:-1]
+    position = text.find('1')
+    while position != -1:
+        yield position
+        position = text.find('1', position + 1)
+
+
+class EnrollmentIndex:
+    """Bitmaps of subjects, sessions, classes and groups over student positions"""
+
+    def __init__(self):
+        self.pks = []  # position -> student id
+        self.students = {}  # student id -> (position, session id, class id, group)
+        self.alive = 0
+        self.subjects = {}
+        self.sessions = {}
+        self.classes = {}
+        self.groups = {}
+
+    def load(self):
+        """Read every student and enrollment, in two queries"""
+        for pk, session_id, class_id, group in Student.objects.order_by('pk').values_list(
+            'pk', 'session_id', 'class_name_id', 'group'
+        ):
+            self.put_student(pk, session_id, class_id, group)
+        bits = {}
+        through = Student.subjects.through.objects.order_by()
+        for student_id, subject_id in through.values_list('student_id', 'subject_id').iterator(chunk_size=5000):
+            student = self.students.get(student_id)
+            if student is not None:
+                bits[subject_id] = bits.get(subject_id, 0) | 1 << student[0]
+        self.subjects = bits
+
+    @staticmethod
+    def _move(bitmaps, old, new, bit):
+        """Move a student's bit from the bitmap of old to the one of new"""
+        if old == new:
+            return
+        if old is not None and old in bitmaps:
+            bitmaps[old] &= ~bit
+        if new is not None:
+            bitmaps[new] = bitmaps.get(new, 0) | bit
+
+    def put_student(self, pk, session_id, class_id, group):
+        """Add a student, or move them to another session, class or group"""
+        student = self.students.get(pk)
+        if student is None:
+            position = len(self.pks)
+            self.pks.append(pk)
+            self.alive |= 1 << position
+            student = (position, None, None, None)
+        position, old_session, old_class, old_group = student
+        bit = 1 << position
+        self._move(self.sessions, old_session, session_id, bit)
+        self._move(self.classes, old_class, class_id, bit)
+        self._move(self.groups, old_group, group, bit)
+        self.students[pk] = (position, session_id, class_id, group)
+
+    def drop_student(self, pk):
+        """Forget a deleted student; their position is not reused"""
+        student = self.students.pop(pk, None)
+        if student is None:
+            return
+        keep = ~(1 << student[0])
+        self.alive &= keep
+        for bitmaps in (self.subjects, self.sessions, self.classes, self.groups):
+            for key in bitmaps:
+                bitmaps[key] &= keep
+
+    def enroll(self, student_ids, subject_ids, enrolled=True):
+        """Set (or clear) the bits of students in subjects"""
+        bits = 0
+        for pk in student_ids:
+            student = self.students.get(pk)
+            if student is None:
+                # Created without a post_save (bulk_create)
+                row = Student.objects.filter(pk=pk).values_list('session_id', 'class_name_id', 'group').first()
+                if row is None:
+                    continue
+                self.put_student(pk, *row)
+                student = self.students[pk]
+            bits |= 1 << student[0]
+        for subject_id in subject_ids:
+            current = self.subjects.get(subject_id, 0)
+            self.subjects[subject_id] = current | bits if enrolled else current & ~bits
+
+    def unenroll_all(self, student_ids):
+        """Clear the bits of students in every subject"""
+        bits = 0
+        for pk in student_ids:
+            if pk in self.students:
+                bits |= 1 << self.students[pk][0]
+        for subject_id in self.subjects:
+            self.subjects[subject_id] &= ~bits
+
+    def drop_subject(self, subject_id):
+        self.subjects.pop(subject_id, None)
+
+    def select(self, all_of=(), any_of=(), none_of=(), session=None, class_name=None, group=None):
+        """Bitmap of the students taking every subject of all_of, at least one of any_of and none of none_of"""
+        bits = self.alive
+        for bitmaps, key in ((self.sessions, session), (self.classes, class_name), (self.groups, group)):
+            if key is not None:
+                bits &= bitmaps.get(key, 0)
+        for subject_id in all_of:
+            bits &= self.subjects.get(subject_id, 0)
+        if any_of:
+            either = 0
+            for subject_id in any_of:
+                either |= self.subjects.get(subject_id, 0)
+            bits &= either
+        for subject_id in none_of:
+            bits &= ~self.subjects.get(subject_id, 0)
+        return bits
+
+    def student_ids(self, bits):
+        """Ids of the students of a bitmap"""
+        return [self.pks[position] for position in positions(bits)]
+
+    def subject_counts(self, bits):
+        """{subject id: students of the bitmap taking it} for the subjects any of them take"""
+        counts = {subject_id: (bits & subject_bits).bit_count() for subject_id, subject_bits in self.subjects.items()}
+        return {subject_id: count for subject_id, count in sorted(counts.items()) if count}
+
+
+def _build():
+    index = EnrollmentIndex()
+    index.load()
+    return index
+
+
+_index = VersionedLocal(VERSION_CACHE_KEY, _build)
+
+
+def get_index():
+    """The enrollment index of this process, built on first use or after another process changed it"""
+    return _index.get()
+
+
+def update(change):
+    """
+    Apply change(index) to this process's index, if built, and have the
+    other processes rebuild theirs
+    """
+    _index.update(change)
+
+
+def invalidate():
+    """Forget the index here and in every process sharing the cache"""
+    _index.invalidate()
+
+
+def _ids(params, name):
+    values = [value.strip() for value in params.get(name, '').split(',') if value.strip()]
+    if not all(value.isdigit() for value in values):
+        raise EnrollmentError(f'{name} must be comma-separated subject ids')
+    return [int(value) for value in values]
+
+
+def query(params):
+    """
+    Students matching the query parameters of the enrollment endpoint:
+    all / any / none (subject ids) and session, class_name, group
+    """
+    all_of, any_of, none_of = _ids(params, 'all'), _ids(params, 'any'), _ids(params, 'none')
+    scope = {}
+    for name in ('session', 'class_name'):
+        value = params.get(name, None)
+        if value:
+            if not value.isdigit():
+                raise EnrollmentError(f'{name} must be an id')
+            scope[name] = int(value)
+    if params.get('group'):
+        scope['group'] = params['group']
+
+    index = get_index()
+    bits = index.select(all_of, any_of, none_of, **scope)
+    result = {'count': bits.bit_count()}
+    if params.get('subject_counts') in ('1', 'true'):
+        result['subject_counts'] = index.subject_counts(bits)
+    if params.get('count_only') not in ('1', 'true'):
+        result['students'] = index.student_ids(bits)
+    return result
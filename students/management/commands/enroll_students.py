@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from academics.models import Class, Session, Subject
+from college_project.commands import lookup
+from students import bulk
+from students.models import Student
+
+
+class Command(BaseCommand):
+    help = (
+        "Enroll students (by roll number, or every student of a class/session/group) in subjects by code, "
+        "inserting only the missing enrollments (--remove unenrolls them)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('subjects', nargs='+', help="Subject codes")
+        parser.add_argument('--rolls', help="Comma-separated roll numbers")
+        parser.add_argument('--class', dest='class_name', help="Only students of this class (id or name)")
+        parser.add_argument('--session', help="Only students of this session (id or name)")
+        parser.add_argument('--group', choices=[value for value, _ in Student.GROUP_CHOICES])
+        parser.add_argument('--remove', action='store_true', help="Unenroll the students instead")
+
+    def handle(self, *args, **options):
+        if not any(options[name] for name in ('rolls', 'class_name', 'session', 'group')):
+            raise CommandError("Give --rolls or at least one of --class, --session and --group")
+
+        codes = options['subjects']
+        subjects = dict(Subject.objects.filter(code__in=codes).values_list('code', 'pk'))
+        missing = sorted(set(codes) - set(subjects))
+        if missing:
+            raise CommandError(f"Unknown subject codes: {', '.join(missing)}")
+        rolls = [roll.strip() for roll in options['rolls'].split(',') if roll.strip()] if options['rolls'] else None
+        if rolls:
+            found = set(Student.objects.filter(roll_number__in=rolls).values_list('roll_number', flat=True))
+            unknown = sorted(set(rolls) - found)
+            if unknown:
+                raise CommandError(f"Unknown roll numbers: {', '.join(unknown)}")
+        students = bulk.selected_students(
+            rolls=rolls,
+            class_name=lookup(Class, options['class_name']).pk if options['class_name'] else None,
+            session=lookup(Session, options['session']).pk if options['session'] else None,
+            group=options['group'],
+        )
+
+        started = time.monotonic()
+        if options['remove']:
+            result = bulk.unenroll(students, subjects.values())
+            done = f"Removed {result['unenrolled']} enrollments"
+        else:
+            result = bulk.enroll(students, subjects.values())
+            done = f"Added {result['enrolled']} enrollments ({result['already_enrolled']} already there)"
+        self.stdout.write(self.style.SUCCESS(
+            f"{done} of {result['students']} students in {result['subjects']} subjects "
+            f"in {time.monotonic() - started:.2f}s"
+        ))
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:59
+
+from django.db import migrations, models
+
+
+def fill_subject_columns(apps, schema_editor):
+    """Store the subject names, codes and count of the existing students, in the order of Subject.Meta.ordering"""
+    Student = apps.get_model('students', 'Student')
+    Enrollment = Student.subjects.through
+    subjects = {}
+    rows = Enrollment.objects.order_by('student_id', 'subject__group', 'subject__category', 'subject__name')
+    for student_id, name, code in rows.values_list('student_id', 'subject__name', 'subject__code').iterator(chunk_size=5000):
+        subjects.setdefault(student_id, []).append((name, code))
+    students = []
+    for student_id, enrolled in subjects.items():
+        names, codes = zip(*enrolled)
+        students.append(Student(
+            pk=student_id, subjects_display=' || '.join(names), subject_codes_display=' || '.join(codes),
+            subject_count=len(names),
+        ))
+    Student.objects.bulk_update(students, ['subjects_display', 'subject_codes_display', 'subject_count'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_alter_subject_group'),
+        ('students', '0005_student_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='subject_codes_display',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text='Subject codes, || separated', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='subject_count',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='subjects_display',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Subject names, || separated'),
+        ),
+        migrations.RunPython(fill_subject_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 21:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0006_student_subject_columns'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='student',
+            name='subject_codes_display',
+            field=models.TextField(blank=True, db_index=True, default='', editable=False, help_text='Subject codes, || separated'),
+        ),
+    ]
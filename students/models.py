@@ -1,7 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from academics.models import Session, Class, Subject
 from accounts.models import User
 
+# Columns kept from the enrollments (see students.bulk), whatever a save writes
+SUBJECT_COLUMNS = ('subjects_display', 'subject_codes_display', 'subject_count')
+SUBJECT_SEPARATOR = ' || '
+
 class Student(models.Model):
     GROUP_CHOICES = [
         ('science', 'Science'),
@@ -16,6 +20,10 @@ class Student(models.Model):
     session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='students')
     group = models.CharField(max_length=20, choices=GROUP_CHOICES, blank=True, null=True)
     subjects = models.ManyToManyField(Subject, related_name='student_enrollments', blank=True)
+    # Copies of the enrolled subjects, kept by students.bulk.refresh_subject_columns
+    subjects_display = models.TextField(blank=True, default='', editable=False, help_text="Subject names, || separated")
+    subject_codes_display = models.TextField(blank=True, default='', editable=False, db_index=True, help_text="Subject codes, || separated")
+    subject_count = models.PositiveSmallIntegerField(default=0, editable=False, db_index=True)
     email = models.EmailField(blank=True, null=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
     address = models.TextField(blank=True, null=True)
@@ -29,16 +37,21 @@ class Student(models.Model):
     def __str__(self):
         return f"{self.name} - {self.roll_number}"
     
+    def save(self, *args, **kwargs):
+        """Saved atomically with the copies the exams app keeps on the student's marks"""
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+    
     def get_subjects_display(self):
         """Return all subject names with || separator"""
-        subjects = self.subjects.all()
-        if not subjects:
-            return '-'
-        return ' || '.join([s.name for s in subjects])
+        return self.subjects_display or '-'
     
     def get_subject_codes_display(self):
         """Return all subject codes with || separator"""
-        subjects = self.subjects.all()
-        if not subjects:
-            return '-'
-        return ' || '.join([s.code for s in subjects])
+        return self.subject_codes_display or '-'
+    
+    def get_subject_names(self):
+        return self.subjects_display.split(SUBJECT_SEPARATOR) if self.subjects_display else []
+    
+    def get_subject_codes(self):
+        return self.subject_codes_display.split(SUBJECT_SEPARATOR) if self.subject_codes_display else []
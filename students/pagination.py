@@ -0,0 +1,62 @@
+"""
+Pagination of the student list.
+
+Page numbers (?page=, ?page_size=) count the filtered students once per
+page. Passing ?cursor= (empty for the first page) switches to keyset
+pagination on the roll number, which is unique and indexed: a page is a
+range read however deep it is, and no count is taken.
+"""
+import base64
+import binascii
+import json
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# Cursor page size when neither settings nor ?page_size= give one
+CURSOR_PAGE_SIZE = 100
+
+
+class StudentPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor_page = self.cursor_query_param in request.query_params
+        if not self.cursor_page:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request) or CURSOR_PAGE_SIZE
+        queryset = queryset.order_by('roll_number')
+        roll_number = self.decode_cursor(request.query_params[self.cursor_query_param])
+        if roll_number is not None:
+            queryset = queryset.filter(roll_number__gt=roll_number)
+        students = list(queryset[:page_size + 1])
+        self.next_roll_number = students[page_size - 1].roll_number if len(students) > page_size else None
+        return students[:page_size]
+
+    def encode_cursor(self, roll_number):
+        return base64.urlsafe_b64encode(json.dumps(roll_number).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """Roll number of the last student of the previous page, None for the first page"""
+        if not cursor:
+            return None
+        try:
+            return str(json.loads(base64.urlsafe_b64decode(cursor.encode())))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound('Invalid cursor')
+
+    def get_paginated_response(self, data):
+        if not self.cursor_page:
+            return super().get_paginated_response(data)
+        next_link = None
+        if self.next_roll_number is not None:
+            url = self.request.build_absolute_uri()
+            next_link = replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_roll_number))
+        return Response({'next': next_link, 'results': data})
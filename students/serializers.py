@@ -1,44 +1,84 @@
 from rest_framework import serializers
+from .bulk import selected_students
 from .models import Student
+from academics.models import Class, Session, Subject
 from academics.serializers import SubjectSerializer
+from college_project.sparse import SparseFieldsMixin
 
-class StudentListSerializer(serializers.ModelSerializer):
+# Columns and prefetches of the student fields, for ?fields= (see college_project.sparse)
+STUDENT_READS = {
+    'class_name': ('class_name__name',),
+    'session': ('session__name',),
+    'subjects': (),
+}
+STUDENT_PREFETCH = {'subjects': ('subjects',)}
+
+class StudentListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class_name = serializers.CharField(source='class_name.name', read_only=True)
     session = serializers.CharField(source='session.name', read_only=True)
     group = serializers.CharField(source='get_group_display', read_only=True)
     subjects = SubjectSerializer(many=True, read_only=True)
-    subjects_display = serializers.SerializerMethodField()
-    subject_count = serializers.SerializerMethodField()
+    subjects_display = serializers.CharField(source='get_subjects_display', read_only=True)
     
     class Meta:
         model = Student
         fields = ['id', 'name', 'roll_number', 'class_name', 'session', 'group', 'email', 'subjects', 'subjects_display', 'subject_count']
-    
-    def get_subjects_display(self, obj):
-        """Return subjects with || separator"""
-        subjects = obj.subjects.all()
-        if not subjects:
-            return '-'
-        return ' || '.join([s.name for s in subjects])
-    
-    def get_subject_count(self, obj):
-        return obj.subjects.count()
+        reads = STUDENT_READS
+        prefetch = STUDENT_PREFETCH
 
-class StudentDetailSerializer(serializers.ModelSerializer):
+class StudentDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class_name = serializers.CharField(source='class_name.name', read_only=True)
     session = serializers.CharField(source='session.name', read_only=True)
     group = serializers.CharField(source='get_group_display', read_only=True)
     subjects = SubjectSerializer(many=True, read_only=True)
-    subjects_display = serializers.SerializerMethodField()
+    subjects_display = serializers.CharField(source='get_subjects_display', read_only=True)
     
     class Meta:
         model = Student
         fields = ['id', 'name', 'roll_number', 'class_name', 'session', 'group', 'email', 'address', 'date_of_birth', 'subjects', 'subjects_display', 'created_at']
-    
-    def get_subjects_display(self, obj):
-        """Return subjects with || separator"""
-        subjects = obj.subjects.all()
-        if not subjects:
-            return '-'
-        return ' || '.join([s.name for s in subjects])
+        reads = STUDENT_READS
+        prefetch = STUDENT_PREFETCH
+
 
+class BulkEnrollmentSerializer(serializers.Serializer):
+    """
+    Students (by roll numbers, or by class/session/group) and the subjects
+    (by code) to enroll them in or remove them from, resolved in one
+    query per table
+    """
+    action = serializers.ChoiceField(choices=['enroll', 'unenroll'], default='enroll')
+    rolls = serializers.ListField(child=serializers.CharField(), required=False, allow_empty=False)
+    class_name = serializers.PrimaryKeyRelatedField(queryset=Class.objects.all(), required=False)
+    session = serializers.PrimaryKeyRelatedField(queryset=Session.objects.all(), required=False)
+    group = serializers.ChoiceField(choices=Student.GROUP_CHOICES, required=False)
+    subjects = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+    
+    def validate_rolls(self, value):
+        found = set(Student.objects.filter(roll_number__in=value).values_list('roll_number', flat=True))
+        missing = sorted(set(value) - found)
+        if missing:
+            raise serializers.ValidationError(f"Unknown roll numbers: {', '.join(missing)}")
+        return value
+    
+    def validate_subjects(self, value):
+        """Subject codes -> ids"""
+        found = dict(Subject.objects.filter(code__in=value).values_list('code', 'pk'))
+        missing = sorted(set(value) - set(found))
+        if missing:
+            raise serializers.ValidationError(f"Unknown subject codes: {', '.join(missing)}")
+        return list(found.values())
+    
+    def validate(self, data):
+        if not any(name in data for name in ('rolls', 'class_name', 'session', 'group')):
+            raise serializers.ValidationError("Give rolls or at least one of class_name, session and group")
+        return data
+    
+    def students(self):
+        """The selected students, as a queryset"""
+        data = self.validated_data
+        return selected_students(
+            rolls=data.get('rolls'),
+            class_name=getattr(data.get('class_name'), 'pk', None),
+            session=getattr(data.get('session'), 'pk', None),
+            group=data.get('group'),
+        )
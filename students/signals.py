@@ -0,0 +1,87 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from academics.models import Subject
+from . import enrollment
+from .bulk import refresh_subject_columns
+from .models import Student
+
+
+def _on_commit(change):
+    """Apply a change to the enrollment index once the transaction commits"""
+    transaction.on_commit(partial(enrollment.update, change))
+
+
+@receiver(m2m_changed, sender=Student.subjects.through)
+def enrollments_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Set or clear the subject bits of the students enrolled or unenrolled,
+    and recompute their stored subject columns
+    """
+    if action in ('post_add', 'post_remove'):
+        students, subjects = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+        enrolled = action == 'post_add'
+        _on_commit(lambda index: index.enroll(students, subjects, enrolled))
+        _refresh_columns(instance, reverse, students)
+    elif action == 'pre_clear' and reverse:
+        # The students are only known before the clear
+        students = instance._cleared_students = list(instance.student_enrollments.values_list('pk', flat=True))
+        _on_commit(lambda index: index.enroll(students, [instance.pk], enrolled=False))
+    elif action == 'post_clear' and reverse:
+        _refresh_columns(instance, reverse, instance.__dict__.pop('_cleared_students', []))
+    elif action == 'post_clear':
+        _on_commit(lambda index: index.unenroll_all([instance.pk]))
+        _refresh_columns(instance, reverse, [instance.pk])
+
+
+def _refresh_columns(instance, reverse, student_ids):
+    refreshed = refresh_subject_columns(student_ids)
+    if not reverse and instance.pk in refreshed:
+        # Keep the student being changed current
+        for column, value in refreshed[instance.pk].items():
+            setattr(instance, column, value)
+
+
+@receiver(post_save, sender=Student)
+def student_saved(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Place the student in the bitmaps of their session, class and group,
+    and correct the subject columns an instance read before its
+    enrollments last changed (or built by hand) has just written back
+    """
+    if raw:
+        return
+    if not created:
+        _refresh_columns(instance, False, [instance.pk])
+    row = (instance.pk, instance.session_id, instance.class_name_id, instance.group)
+    _on_commit(lambda index: index.put_student(*row))
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    _on_commit(lambda index: index.drop_student(pk))
+
+
+@receiver(post_save, sender=Subject)
+def subject_saved(sender, instance, created=False, raw=False, **kwargs):
+    """A renamed subject changes the stored subject columns of its students"""
+    if created or raw:
+        return
+    refresh_subject_columns(instance.student_enrollments.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Subject)
+def subject_deleting(sender, instance, **kwargs):
+    # Its enrollments go without m2m_changed
+    instance._enrolled_students = list(instance.student_enrollments.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Subject)
+def subject_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    _on_commit(lambda index: index.drop_subject(pk))
+    refresh_subject_columns(instance.__dict__.pop('_enrolled_students', []))
@@ -1,3 +1,277 @@
-from django.test import TestCase
+import io
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from academics.models import Class, Session, Subject
+from college_project.versioned import check_shared_cache
+from . import enrollment
+from .models import Student
+
+
+class StudentListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.classes = [Class.objects.create(name=f'List {i}', code=f'list-{i}') for i in range(2)]
+        cls.session = Session.objects.create(name='List 2025')
+        cls.subjects = [Subject.objects.create(name=f'Subject {i}', code=f'list-{i}') for i in range(3)]
+        for i in range(40):
+            student = Student.objects.create(
+                name=f'Student {i}', roll_number=f'list-{i:03d}', class_name=cls.classes[i % 2],
+                session=cls.session, group=Student.GROUP_CHOICES[i % 3][0],
+            )
+            student.subjects.set(cls.subjects[:i % 3 + 1])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, **params):
+        response = self.client.get('/api/v1/students/list/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        counts = []
+        for page_size in (5, 40):
+            with CaptureQueriesContext(connection) as queries:
+                body = self.get(page_size=page_size)
+            self.assertEqual(len(body['results']), page_size)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(self.get()), 40)
+        self.assertEqual(len(queries), counts[0] - 1)  # no count query
+
+    def test_subject_count(self):
+        rows = {row['roll_number']: row for row in self.get()}
+        self.assertEqual(rows['list-004']['subject_count'], 2)
+        self.assertEqual(rows['list-004']['subjects_display'], 'Subject 0 || Subject 1')
+
+    def test_filters(self):
+        rows = self.get(class_name=self.classes[1].pk, group='science')
+        self.assertEqual([row['roll_number'] for row in rows], [f'list-{i:03d}' for i in range(3, 40, 6)])
+        rows = self.get(subject=self.subjects[2].pk, session=self.session.pk)
+        self.assertEqual([row['roll_number'] for row in rows], [f'list-{i:03d}' for i in range(2, 40, 3)])
+
+        response = self.client.get('/api/v1/students/list/', {'class_name': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pages(self):
+        body = self.get(cursor='', page_size=15)
+        seen = [row['roll_number'] for row in body['results']]
+        while body['next']:
+            body = self.client.get(body['next']).json()
+            seen.extend(row['roll_number'] for row in body['results'])
+        self.assertEqual(seen, [f'list-{i:03d}' for i in range(40)])
+        self.assertNotIn('count', body)
+
+    def test_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.get(fields='roll_number,class_name')
+        self.assertEqual(rows[1], {'roll_number': 'list-001', 'class_name': 'List 1'})
+        # No subjects prefetch
+        self.assertFalse(any('academics_subject"."name' in query['sql'] for query in queries))
+
+
+class EnrollmentIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Bits', code='bits')
+        cls.sessions = [Session.objects.create(name=f'Bits {year}') for year in (2024, 2025)]
+        cls.physics, cls.math, cls.biology = [
+            Subject.objects.create(name=name, code=f'bits-{name}') for name in ('Physics', 'Math', 'Biology')
+        ]
+        combinations = [(cls.physics, cls.math), (cls.physics, cls.math, cls.biology), (cls.physics,), (cls.math, cls.biology)]
+        cls.students = []
+        for i, subjects in enumerate(combinations * 2):
+            student = Student.objects.create(
+                name=f'Student {i}', roll_number=f'bits-{i}', class_name=class_obj, session=cls.sessions[i // 4],
+            )
+            student.subjects.set(subjects)
+            cls.students.append(student)
+
+    def setUp(self):
+        enrollment.invalidate()
+        self.addCleanup(enrollment.invalidate)
+
+    def get(self, **params):
+        response = self.client.get('/api/v1/students/enrollment/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def expected(self, students):
+        return sorted(student.pk for student in students)
+
+    def test_subject_combinations(self):
+        body = self.get(session=self.sessions[1].pk, all=f'{self.physics.pk},{self.math.pk}', none=self.biology.pk)
+        self.assertEqual(body, {'count': 1, 'students': [self.students[4].pk]})
+        body = self.get(any=f'{self.physics.pk},{self.biology.pk}', count_only='true', subject_counts='true')
+        self.assertEqual(body, {'count': 8, 'subject_counts': {str(self.physics.pk): 6, str(self.math.pk): 6, str(self.biology.pk): 4}})
+        self.assertEqual(self.client.get('/api/v1/students/enrollment/', {'all': 'physics'}).status_code, 400)
+
+    def test_follows_enrollment_changes(self):
+        enrollment.get_index()
+        student = self.students[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            student.subjects.add(self.biology)
+            self.biology.student_enrollments.remove(self.students[1])
+        self.assertEqual(self.get(all=self.biology.pk)['students'], self.expected(
+            [self.students[i] for i in (2, 3, 5, 7)]
+        ))
+        with self.captureOnCommitCallbacks(execute=True):
+            student.subjects.clear()
+            student.session = self.sessions[1]
+            student.save()
+            self.students[3].delete()
+        self.assertEqual(self.get(session=self.sessions[1].pk, none=self.math.pk)['students'], self.expected(
+            [student, self.students[6]]
+        ))
+        self.assertEqual(self.get(all=self.biology.pk)['count'], 2)
+
+    def test_rebuilt_after_another_process_changes_it(self):
+        self.get(all=self.biology.pk)
+        # Another process enrolls a student and bumps the shared version
+        Student.subjects.through.objects.create(student=self.students[0], subject=self.biology)
+        cache.incr(enrollment.VERSION_CACHE_KEY)
+        self.assertIn(self.students[0].pk, self.get(all=self.biology.pk)['students'])
+
+    def test_deploy_check_wants_a_shared_cache(self):
+        self.assertEqual([error.id for error in check_shared_cache()], ['college_project.W001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache'}}):
+            self.assertEqual(check_shared_cache(), [])
+
+
+class BulkEnrollmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.classes = [Class.objects.create(name=f'Cohort {i}', code=f'cohort-{i}') for i in range(2)]
+        session = Session.objects.create(name='Cohort 2025')
+        cls.subjects = [Subject.objects.create(name=f'Subject {i}', code=f'c{i}') for i in range(3)]
+        cls.students = [
+            Student.objects.create(name=f'Student {i}', roll_number=f'cohort-{i}', class_name=cls.classes[i % 2], session=session)
+            for i in range(10)
+        ]
+        cls.students[0].subjects.add(cls.subjects[0])
+        cls.user = get_user_model().objects.create(username='cohort')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        enrollment.invalidate()
+        self.addCleanup(enrollment.invalidate)
+
+    def post(self, data, status=200):
+        response = self.client.post('/api/v1/students/enrollment/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def enrolled(self, subject):
+        return set(subject.student_enrollments.values_list('roll_number', flat=True))
+
+    def test_enroll_and_unenroll(self):
+        cohort = {f'cohort-{i}' for i in range(0, 10, 2)}
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            body = self.post({'class_name': self.classes[0].pk, 'subjects': ['c0', 'c1']})
+        self.assertEqual(body, {'students': 5, 'subjects': 2, 'enrolled': 9, 'already_enrolled': 1})
+        self.assertLess(len(queries), 15)
+        self.assertEqual(self.enrolled(self.subjects[0]), cohort)
+        self.assertEqual(self.enrolled(self.subjects[1]), cohort)
+        self.assertEqual(Student.objects.get(roll_number='cohort-2').subject_codes_display, 'c0 || c1')
+        self.assertEqual(enrollment.query({'all': f'{self.subjects[0].pk},{self.subjects[1].pk}'})['count'], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            body = self.post({'action': 'unenroll', 'rolls': ['cohort-0', 'cohort-1'], 'subjects': ['c0', 'c1', 'c2']})
+        self.assertEqual(body, {'students': 2, 'subjects': 3, 'unenrolled': 2})
+        self.assertEqual(self.enrolled(self.subjects[0]), cohort - {'cohort-0'})
+        self.assertEqual(enrollment.query({'all': str(self.subjects[0].pk)})['count'], 4)
+
+    def test_rejects_unknown_and_unscoped_requests(self):
+        body = self.post({'rolls': ['cohort-1', 'nobody'], 'subjects': ['c0', 'c9']}, status=400)
+        self.assertEqual(set(body), {'rolls', 'subjects'})
+        self.post({'subjects': ['c0']}, status=400)
+        self.assertEqual(self.enrolled(self.subjects[0]), {'cohort-0'})
+
+    def test_command(self):
+        call_command('enroll_students', 'c2', '--class', 'Cohort 1', stdout=io.StringIO())
+        self.assertEqual(self.enrolled(self.subjects[2]), {f'cohort-{i}' for i in range(1, 10, 2)})
+        call_command('enroll_students', 'c2', '--rolls', 'cohort-1,cohort-3', '--remove', stdout=io.StringIO())
+        self.assertEqual(len(self.enrolled(self.subjects[2])), 3)
+
+
+class SubjectColumnsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        class_obj = Class.objects.create(name='Stored', code='stored')
+        session = Session.objects.create(name='Stored 2025')
+        cls.physics, cls.math, cls.biology = [
+            Subject.objects.create(name=name, code=code) for name, code in (('Physics', '174'), ('Math', '265'), ('Biology', '178'))
+        ]
+        cls.students = [
+            Student.objects.create(name=f'Student {i}', roll_number=f'stored-{i}', class_name=class_obj, session=session)
+            for i in range(3)
+        ]
+
+    def columns(self, student):
+        student.refresh_from_db()
+        return student.subjects_display, student.subject_codes_display, student.subject_count
+
+    def test_follow_enrollments_and_subjects(self):
+        first, second, third = self.students
+        first.subjects.add(self.physics, self.math)
+        self.assertEqual((first.subjects_display, first.subject_count), ('Math || Physics', 2))
+        self.assertEqual(self.columns(first), ('Math || Physics', '265 || 174', 2))
+
+        self.biology.student_enrollments.add(first, second)
+        self.math.name = 'Higher Math'
+        self.math.save()
+        self.assertEqual(self.columns(first), ('Biology || Higher Math || Physics', '178 || 265 || 174', 3))
+
+        stale = Student.objects.get(pk=second.pk)
+        self.biology.student_enrollments.clear()
+        stale.email = 'second@college.edu'
+        stale.save()
+        self.assertEqual(self.columns(second), ('', '', 0))
+        self.assertEqual(second.get_subjects_display(), '-')
+
+        self.physics.delete()
+        third.subjects.add(self.math)
+        self.assertEqual(self.columns(first), ('Higher Math', '265', 1))
+        self.assertEqual(list(Student.objects.filter(subject_codes_display='265').order_by('pk')), [first, third])
+
+    def test_saves_cannot_overwrite_them(self):
+        first = self.students[0]
+        first.subjects.add(self.physics)
+        built = Student(
+            pk=first.pk, name='Rebuilt', roll_number=first.roll_number, class_name_id=first.class_name_id,
+            session_id=first.session_id, created_at=first.created_at,
+        )
+        built.save()
+        self.assertEqual(self.columns(first), ('Physics', '174', 1))
+        self.assertEqual(built.subject_codes_display, '174')
+
+        # A deleted row can be saved back
+        second = self.students[1]
+        second.delete()
+        second.save()
+        self.assertEqual(self.columns(second), ('', '', 0))
+
+    def test_report_and_admin_read_no_enrollments(self):
+        self.students[0].subjects.set([self.physics, self.biology])
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.client.get('/api/v1/students/report/').json()['results']
+        self.assertEqual(len(queries), 1)
+        row = next(row for row in rows if row['roll_number'] == 'stored-0')
+        self.assertEqual(row['subjects'], ['Biology', 'Physics'])
+        self.assertEqual((row['codes_display'], row['total_subjects']), ('178 || 174', 2))
+
+        self.client.force_login(get_user_model().objects.create_superuser('stored', 'stored@college.edu', 'pw'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/students/student/')
+        self.assertContains(response, 'Biology || Physics')
+        self.assertFalse(any('students_student_subjects' in query['sql'] for query in queries))
@@ -5,4 +5,6 @@ urlpatterns = [
     path('list/', views.StudentListView.as_view(), name='student_list'),
     path('<int:pk>/', views.StudentDetailView.as_view(), name='student_detail'),
     path('report/', views.StudentReportView.as_view(), name='student_report'),
+    path('enrollment/', views.StudentEnrollmentView.as_view(), name='student_enrollment'),
+    path('enrollment/bulk/', views.BulkEnrollmentView.as_view(), name='student_bulk_enrollment'),
 ]
@@ -1,20 +1,90 @@
+from django.core.exceptions import ValidationError
 from django.shortcuts import render
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from academics.models import Class, Session, Subject
+from . import bulk, enrollment
 from .models import Student
-from .serializers import StudentListSerializer, StudentDetailSerializer
+from .pagination import StudentPagination
+from .serializers import BulkEnrollmentSerializer, StudentListSerializer, StudentDetailSerializer
+from college_project.conditional import conditional_get
+from college_project.sparse import sparse_queryset
+from college_project.streaming import CHUNK_SIZE, RENDERER_CLASSES, export_format, streaming_response
 
 class StudentListView(APIView):
+    """
+    Students with their class, session and subjects, filtered by
+    ?class_name=, ?session=, ?group= and ?subject=. Paged with ?page= /
+    ?page_size= or ?cursor= (see students.pagination); every page costs
+    the same few queries whatever its size. ?fields= narrows the students
+    and their query (see college_project.sparse).
+    """
+    
+    # Query parameters and the Student field they filter
+    FILTERS = {'class_name': 'class_name_id', 'session': 'session_id', 'group': 'group', 'subject': 'subjects'}
+    
+    @conditional_get([Student, Student.subjects.through, Subject, Class, Session])
+    def get(self, request):
+        students = Student.objects.select_related('class_name', 'session').prefetch_related('subjects').order_by('roll_number')
+        try:
+            for param, field in self.FILTERS.items():
+                value = request.query_params.get(param, None)
+                if value:
+                    students = students.filter(**{field: value})
+        except (ValueError, ValidationError):
+            return Response({'error': 'class_name, session and subject must be ids'}, status=400)
+        # The roll number orders the students and gives the cursor
+        students = sparse_queryset(students, StudentListSerializer, request, keep=('roll_number',))
+        
+        context = {'request': request}
+        paginator = StudentPagination()
+        page = paginator.paginate_queryset(students, request, view=self)
+        if page is not None:
+            return paginator.get_paginated_response(StudentListSerializer(page, many=True, context=context).data)
+        return Response(StudentListSerializer(students, many=True, context=context).data)
+
+class StudentEnrollmentView(APIView):
+    """
+    Students by subject combination, answered from the in-memory
+    enrollment bitmaps (see students.enrollment): ?all=, ?any= and ?none=
+    take comma-separated subject ids, ?session=, ?class_name= and ?group=
+    narrow the students. ?count_only=true leaves out the ids and
+    ?subject_counts=true adds how many of them take each subject.
+    """
+    
     def get(self, request):
-        students = Student.objects.prefetch_related('subjects').all()
-        serializer = StudentListSerializer(students, many=True)
-        return Response(serializer.data)
+        try:
+            return Response(enrollment.query(request.query_params))
+        except enrollment.EnrollmentError as exc:
+            return Response({'error': str(exc)}, status=400)
+
+class BulkEnrollmentView(APIView):
+    """
+    Enroll students in subjects, or remove them (action=unenroll), in a
+    few set-based queries (see students.bulk)
+    
+    Expected JSON format:
+    {
+        "action": "enroll",
+        "class_name": 1, "session": 2, "group": "science",  (or "rolls": [...])
+        "subjects": ["174", "175", "265"]
+    }
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = BulkEnrollmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        change = bulk.enroll if serializer.validated_data['action'] == 'enroll' else bulk.unenroll
+        return Response(change(serializer.students(), serializer.validated_data['subjects']))
 
 class StudentDetailView(APIView):
     def get(self, request, pk):
         try:
-            student = Student.objects.prefetch_related('subjects').get(pk=pk)
-            serializer = StudentDetailSerializer(student)
+            students = Student.objects.select_related('class_name', 'session').prefetch_related('subjects')
+            student = sparse_queryset(students, StudentDetailSerializer, request).get(pk=pk)
+            serializer = StudentDetailSerializer(student, context={'request': request})
             return Response(serializer.data)
         except Student.DoesNotExist:
             return Response({'error': 'Student not found'}, status=404)
@@ -23,38 +93,46 @@ class StudentReportView(APIView):
     """
     Returns students with all their subjects in a single row format
     Format: name, roll_number, group, subjects (|| separated)
+    ?format=csv|ndjson streams the rows instead of building the whole list
     """
+    renderer_classes = RENDERER_CLASSES
+    
+    FIELDS = [
+        'id', 'name', 'roll_number', 'group', 'class_name', 'session',
+        'subjects', 'subjects_display', 'subject_codes', 'codes_display',
+        'total_subjects', 'email', 'phone',
+    ]
+    
     def get(self, request):
-        students = Student.objects.prefetch_related('subjects').all()
-        data = []
+        # The subjects are read from the columns stored on each student
+        students = Student.objects.select_related('class_name', 'session')
+        
+        fmt = export_format(request)
+        if fmt:
+            rows = (self.report_row(student) for student in students.iterator(chunk_size=CHUNK_SIZE))
+            return streaming_response(rows, fmt, 'student-report', fields=self.FIELDS)
         
-        for student in students:
-            subjects = student.subjects.all()
-            subject_list = [s.name for s in subjects]
-            subject_codes = [s.code for s in subjects]
-            
-            # Join with || separator
-            subjects_display = ' || '.join(subject_list) if subject_list else '-'
-            codes_display = ' || '.join(subject_codes) if subject_codes else '-'
-            
-            data.append({
-                'id': student.id,
-                'name': student.name,
-                'roll_number': student.roll_number,
-                'group': student.get_group_display() or '-',
-                'class_name': student.class_name.name,
-                'session': student.session.name,
-                'subjects': subject_list,
-                'subjects_display': subjects_display,
-                'subject_codes': subject_codes,
-                'codes_display': codes_display,
-                'total_subjects': len(subject_list),
-                'email': student.email,
-                'phone': student.phone,
-            })
+        data = [self.report_row(student) for student in students]
         
         return Response({
             'count': len(data),
             'results': data
         })
-
+    
+    def report_row(self, student):
+        """One report row for a student"""
+        return {
+            'id': student.id,
+            'name': student.name,
+            'roll_number': student.roll_number,
+            'group': student.get_group_display() or '-',
+            'class_name': student.class_name.name,
+            'session': student.session.name,
+            'subjects': student.get_subject_names(),
+            'subjects_display': student.get_subjects_display(),
+            'subject_codes': student.get_subject_codes(),
+            'codes_display': student.get_subject_codes_display(),
+            'total_subjects': student.subject_count,
+            'email': student.email,
+            'phone': student.phone,
+        }
@@ -1,10 +1,12 @@
 from django.contrib import admin
+from dashboard.search import TEACHER, IndexedSearchMixin
 from .models import Teacher
 
 @admin.register(Teacher)
-class TeacherAdmin(admin.ModelAdmin):
+class TeacherAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    search_type = TEACHER
     list_display = ('name', 'get_user', 'subject', 'phone', 'post')
-    search_fields = ('name', 'subject', 'user__username')
+    search_fields = ('name', 'subject__name', 'user__username')
     list_filter = ('subject', 'post')
     ordering = ('name',)
     readonly_fields = ('created_at', 'updated_at')